@@ -27,7 +27,11 @@ def translate():
         # Handle 'vi' -> 'vi'
         
         translator = GoogleTranslator(source=source, target=target)
-        result = translator.translate(q)
+        # q may be a list (one request per chunk): answer with a list in the same order
+        if isinstance(q, list):
+            result = translator.translate_batch(q)
+        else:
+            result = translator.translate(q)
         
         return jsonify({
             'translatedText': result
@@ -36,7 +40,7 @@ def translate():
         print(f"Translation error: {e}")
         # Fallback
         return jsonify({
-            'translatedText': f"[Fallback] {q}"
+            'translatedText': [f"[Fallback] {t}" for t in q] if isinstance(q, list) else f"[Fallback] {q}"
         }), 200
 
 @app.route('/languages', methods=['GET'])
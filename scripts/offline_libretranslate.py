@@ -0,0 +1,218 @@
+"""
+Offline stand-in for the LibreTranslate API.
+
+Serves /translate, /detect and /languages like LibreTranslate without any
+network access: translations are deterministic pseudo-text derived from a hash
+of the input, so the same request always gets the same answer. Latency and
+error rates are configurable, which makes it usable for load tests and
+benchmarks of the full translation flow on an isolated machine.
+
+Runs under uvicorn (ASGI) with any number of workers:
+
+    python scripts/offline_libretranslate.py --workers 4 --latency-ms 80 --latency-dist lognormal --error-rate 0.01
+
+Settings can also be given as environment variables (LT_LATENCY_MS, LT_LATENCY_JITTER_MS,
+LT_LATENCY_PER_CHAR_MS, LT_LATENCY_DIST, LT_ERROR_RATE, LT_RATE_LIMIT_RATE, LT_SEED).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+from typing import List, Optional, Union
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+LATENCY_MS = float(os.environ.get("LT_LATENCY_MS", "0"))  # Base latency per request
+LATENCY_JITTER_MS = float(os.environ.get("LT_LATENCY_JITTER_MS", "0"))  # Spread of the distribution
+LATENCY_PER_CHAR_MS = float(os.environ.get("LT_LATENCY_PER_CHAR_MS", "0"))  # Added per input character
+LATENCY_DIST = os.environ.get("LT_LATENCY_DIST", "fixed")  # fixed, uniform, normal or lognormal
+ERROR_RATE = float(os.environ.get("LT_ERROR_RATE", "0"))  # Fraction of requests failing with 500
+RATE_LIMIT_RATE = float(os.environ.get("LT_RATE_LIMIT_RATE", "0"))  # Fraction rejected with 429
+SEED = os.environ.get("LT_SEED")  # Seed for latency/error sampling (translations are always deterministic)
+
+LANGUAGES = [
+    {"code": "en", "name": "English"},
+    {"code": "vi", "name": "Vietnamese"},
+    {"code": "zh", "name": "Chinese"},
+    {"code": "ja", "name": "Japanese"},
+    {"code": "ko", "name": "Korean"}
+]
+LANGUAGE_CODES = {lang["code"] for lang in LANGUAGES}
+
+# Syllables used to build pseudo-translations per target language
+SYLLABLES = {
+    "vi": ["anh", "em", "không", "được", "người", "những", "một", "đã", "này", "cho", "với", "của",
+           "là", "có", "rất", "thì", "đi", "về", "nói", "biết", "hôm", "nay", "trời", "đẹp"],
+    "en": ["the", "and", "you", "we", "know", "this", "that", "what", "go", "time", "now", "here",
+           "right", "think", "well", "come", "see", "good", "just", "can", "tell", "back", "way", "day"],
+    "zh": ["我", "你", "他", "的", "是", "不", "了", "在", "有", "这", "个", "们", "来", "去", "说", "好"],
+    "ja": ["わたし", "あなた", "これ", "それ", "です", "ます", "ない", "する", "いる", "ある", "こと", "もの"],
+    "ko": ["나", "너", "우리", "이", "그", "것", "하다", "있다", "없다", "오늘", "정말", "아주"]
+}
+OUTPUT_RATIO = {"vi": 0.9, "en": 0.8, "zh": 1.0, "ja": 0.6, "ko": 0.7}  # Words per input character
+
+app = FastAPI(title="Offline LibreTranslate")
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+rng = random.Random(SEED)
+
+
+class TranslateRequest(BaseModel):
+    q: Union[str, List[str]] = ""
+    source: str = "auto"
+    target: str = "en"
+    format: str = "text"
+    api_key: Optional[str] = None
+
+
+class DetectRequest(BaseModel):
+    q: str = ""
+    api_key: Optional[str] = None
+
+
+def detect_language(text: str) -> str:
+    """Script-based guess, enough to fill detectedLanguage deterministically."""
+    for c in text:
+        code = ord(c)
+        if 0x3040 <= code <= 0x30FF:
+            return "ja"
+        if 0xAC00 <= code <= 0xD7AF:
+            return "ko"
+        if 0x4E00 <= code <= 0x9FFF:
+            return "zh"
+    if any(ord(c) > 0x7F and c.isalpha() for c in text):
+        return "vi"
+    return "en"
+
+
+def pseudo_translate(text: str, source: str, target: str) -> str:
+    """Deterministic pseudo-translation with a length proportional to the input."""
+    if not text.strip():
+        return text
+    words = SYLLABLES.get(target, SYLLABLES["en"])
+    count = max(1, round(len(text.strip()) * OUTPUT_RATIO.get(target, 0.8)))
+    digest = b""
+    counter = 0
+    while len(digest) < count:
+        digest += hashlib.sha256(f"{source}|{target}|{counter}|{text}".encode("utf-8")).digest()
+        counter += 1
+    separator = "" if target in ("zh", "ja") else " "
+    result = separator.join(words[b % len(words)] for b in digest[:count])
+    # Keep sentence-final punctuation so downstream formatting looks realistic
+    if text.rstrip()[-1] in "。.！!？?":
+        result += {"。": ".", "！": "!", "？": "?"}.get(text.rstrip()[-1], text.rstrip()[-1])
+    return result[0].upper() + result[1:] if separator else result
+
+
+def sample_latency(chars: int) -> float:
+    """Seconds to wait for a request with this many input characters."""
+    if LATENCY_DIST == "uniform":
+        base = rng.uniform(LATENCY_MS - LATENCY_JITTER_MS, LATENCY_MS + LATENCY_JITTER_MS)
+    elif LATENCY_DIST == "normal":
+        base = rng.gauss(LATENCY_MS, LATENCY_JITTER_MS)
+    elif LATENCY_DIST == "lognormal" and LATENCY_MS > 0:
+        # Median LATENCY_MS with a long tail; jitter is the spread as a fraction of the median
+        sigma = LATENCY_JITTER_MS / LATENCY_MS if LATENCY_JITTER_MS else 0.5
+        base = rng.lognormvariate(0, sigma) * LATENCY_MS
+    else:
+        base = LATENCY_MS
+    return max(0.0, base + LATENCY_PER_CHAR_MS * chars) / 1000
+
+
+def error(message: str, status_code: int) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+async def simulate(chars: int) -> Optional[JSONResponse]:
+    """Apply the configured latency; returns an error response for sampled failures."""
+    delay = sample_latency(chars)
+    if delay:
+        await asyncio.sleep(delay)
+    roll = rng.random()
+    if roll < RATE_LIMIT_RATE:
+        return error("Slowdown: too many requests", 429)
+    if roll < RATE_LIMIT_RATE + ERROR_RATE:
+        return error("Simulated translation failure", 500)
+    return None
+
+
+@app.post("/translate")
+async def translate(request: TranslateRequest):
+    texts = request.q if isinstance(request.q, list) else [request.q]
+    if not any(t.strip() for t in texts):
+        return error("Invalid request: missing q parameter", 400)
+    if request.target not in LANGUAGE_CODES:
+        return error(f"{request.target} is not supported", 400)
+    if request.source != "auto" and request.source not in LANGUAGE_CODES:
+        return error(f"{request.source} is not supported", 400)
+
+    failure = await simulate(sum(len(t) for t in texts))
+    if failure:
+        return failure
+
+    sources = [detect_language(t) if request.source == "auto" else request.source for t in texts]
+    translated = [pseudo_translate(t, s, request.target) for t, s in zip(texts, sources)]
+    response = {"translatedText": translated if isinstance(request.q, list) else translated[0]}
+    if request.source == "auto":
+        detected = [{"confidence": 90.0, "language": s} for s in sources]
+        response["detectedLanguage"] = detected if isinstance(request.q, list) else detected[0]
+    return response
+
+
+@app.post("/detect")
+async def detect(request: DetectRequest):
+    if not request.q.strip():
+        return error("Invalid request: missing q parameter", 400)
+    return [{"confidence": 90.0, "language": detect_language(request.q)}]
+
+
+@app.get("/languages")
+async def languages():
+    codes = [lang["code"] for lang in LANGUAGES]
+    return [{**lang, "targets": codes} for lang in LANGUAGES]
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Offline deterministic LibreTranslate stand-in")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS, help="Base latency per request")
+    parser.add_argument("--latency-jitter-ms", type=float, default=LATENCY_JITTER_MS, help="Spread of the latency distribution")
+    parser.add_argument("--latency-per-char-ms", type=float, default=LATENCY_PER_CHAR_MS, help="Extra latency per input character")
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "normal", "lognormal"], default=LATENCY_DIST)
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE, help="Fraction of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=RATE_LIMIT_RATE, help="Fraction of requests rejected with 429")
+    parser.add_argument("--seed", default=SEED, help="Seed for latency/error sampling")
+    args = parser.parse_args()
+
+    # Worker processes import this module fresh: pass the settings through the environment
+    os.environ.update({
+        "LT_LATENCY_MS": str(args.latency_ms),
+        "LT_LATENCY_JITTER_MS": str(args.latency_jitter_ms),
+        "LT_LATENCY_PER_CHAR_MS": str(args.latency_per_char_ms),
+        "LT_LATENCY_DIST": args.latency_dist,
+        "LT_ERROR_RATE": str(args.error_rate),
+        "LT_RATE_LIMIT_RATE": str(args.rate_limit_rate)
+    })
+    if args.seed is not None:
+        os.environ["LT_SEED"] = str(args.seed)
+
+    print(f"Starting offline LibreTranslate stand-in on port {args.port} ({args.workers} workers)...")
+    print(f"Latency: {args.latency_dist} {args.latency_ms} ms (+/- {args.latency_jitter_ms} ms, "
+          f"+{args.latency_per_char_ms} ms/char), errors: {args.error_rate}, rate limited: {args.rate_limit_rate}")
+    uvicorn.run("offline_libretranslate:app", host=args.host, port=args.port, workers=args.workers,
+                app_dir=os.path.dirname(os.path.abspath(__file__)), log_level="warning")
@@ -0,0 +1,219 @@
+"""
+Admission control for the translation endpoints.
+
+Bounds the amount of work waiting for a decode slot (queue depth and an
+in-flight token budget) and rejects the excess early with a Retry-After hint,
+instead of letting latency grow until clients time out and retry.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class Overloaded(Exception):
+    """Raised when a request is rejected by admission control."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """Raised when queued work is dropped because its deadline passed."""
+
+
+class CancellableBatch:
+    """
+    Translates a list of lines in sub-batches so that work can stop between
+    sub-batches once the client is gone. run() executes in a worker thread,
+    cancel() is called from the event loop.
+
+    A sub-batch holds up to sub_batch_size lines, or, with sizes (e.g.
+    estimated tokens per line), lines totalling up to sub_batch_size. Callers
+    pass the model's decode batch so sub-batching doesn't shrink decode calls.
+    """
+
+    def __init__(self, func: Callable, texts: List[str], sub_batch_size: int, on_cancel: Callable[[int], None],
+                 sizes: Optional[List[int]] = None):
+        self.func = func
+        self.texts = texts
+        self.sub_batch_size = max(1, sub_batch_size)
+        self.sizes = sizes
+        self.on_cancel = on_cancel
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def run(self) -> Optional[List[str]]:
+        """Translate all lines, or return None if cancelled before finishing."""
+        with self._lock:
+            if self._cancel_event.is_set():
+                return None
+            self._started = True
+
+        translated = []
+        for start, end in self.sub_batches():
+            if self._cancel_event.is_set():
+                self.on_cancel(len(self.texts) - start)
+                return None
+            translated.extend(self.func(self.texts[start:end]))
+        return translated
+
+    def sub_batches(self) -> List[Tuple[int, int]]:
+        """(start, end) line ranges of the sub-batches."""
+        if self.sizes is None:
+            return [(i, min(i + self.sub_batch_size, len(self.texts)))
+                    for i in range(0, len(self.texts), self.sub_batch_size)]
+        ranges = []
+        start, total = 0, 0
+        for i, size in enumerate(self.sizes):
+            if i > start and total + size > self.sub_batch_size:
+                ranges.append((start, i))
+                start, total = i, 0
+            total += size
+        if start < len(self.texts):
+            ranges.append((start, len(self.texts)))
+        return ranges
+
+    def cancel(self):
+        """Stop at the next sub-batch boundary; lines never started are counted here."""
+        with self._lock:
+            self._cancel_event.set()
+            if not self._started:
+                self.on_cancel(len(self.texts))
+
+
+def estimate_tokens(texts: List[str]) -> int:
+    """Cheap token estimate (character count) used for the in-flight budget."""
+    return sum(len(t) for t in texts)
+
+
+class AdmissionController:
+    def __init__(self, max_queue_depth: int, max_inflight_tokens: int, max_concurrency: int):
+        """
+        Args:
+            max_queue_depth: Max admitted requests (waiting + decoding) at once
+            max_inflight_tokens: Max estimated tokens across admitted requests
+            max_concurrency: Number of decode calls allowed to run in parallel
+        """
+        self.max_queue_depth = max_queue_depth
+        self.max_inflight_tokens = max_inflight_tokens
+        self.max_concurrency = max(1, max_concurrency)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+
+        self.waiting = 0
+        self.running = 0
+        self.inflight_tokens = 0
+        self.avg_service_time = 0.0  # EWMA of decode time in seconds
+
+        self.stats = {
+            "admitted": 0,
+            "rejected_queue_depth": 0,
+            "rejected_tokens": 0,
+            "deadline_expired": 0,
+            "rejected_jobs": 0,
+            "cancelled_requests": 0,
+            "cancelled_lines": 0
+        }
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog is expected to drain."""
+        backlog = self.waiting + self.running
+        estimate = self.avg_service_time * backlog / self.max_concurrency
+        return max(1, math.ceil(estimate))
+
+    def admit(self, tokens: int):
+        """Reserve room for a request or raise Overloaded."""
+        if self.waiting + self.running >= self.max_queue_depth:
+            self.stats["rejected_queue_depth"] += 1
+            raise Overloaded("Too many queued requests", self.retry_after())
+        # A single oversized request is still admitted when nothing else is in flight
+        if self.inflight_tokens and self.inflight_tokens + tokens > self.max_inflight_tokens:
+            self.stats["rejected_tokens"] += 1
+            raise Overloaded("Too much text in flight", self.retry_after())
+        self.stats["admitted"] += 1
+
+    async def run(self, func: Callable, *args, tokens: int = 0, deadline: Optional[float] = None):
+        """
+        Admit a request, wait for a decode slot and run func(*args) in a worker thread.
+
+        Args:
+            tokens: Estimated size of the request (see estimate_tokens)
+            deadline: time.monotonic() value after which queued work is dropped
+        """
+        self.admit(tokens)
+        self.inflight_tokens += tokens
+        try:
+            return await self._run_in_slot(func, *args, deadline=deadline)
+        finally:
+            self.inflight_tokens -= tokens
+
+    async def run_background(self, func: Callable, *args):
+        """Run background work (e.g. queued jobs) in a decode slot without admission checks."""
+        return await self._run_in_slot(func, *args, deadline=None)
+
+    async def _run_in_slot(self, func: Callable, *args, deadline: Optional[float]):
+        self.waiting += 1
+        try:
+            if deadline is None:
+                await self._slots.acquire()
+            else:
+                try:
+                    await asyncio.wait_for(self._slots.acquire(), timeout=max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    self.stats["deadline_expired"] += 1
+                    raise DeadlineExceeded("Request deadline exceeded while queued")
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        future = None
+        deferred = False
+        try:
+            if deadline is not None and time.monotonic() >= deadline:
+                self.stats["deadline_expired"] += 1
+                raise DeadlineExceeded("Request deadline exceeded while queued")
+            start_time = time.monotonic()
+            future = asyncio.ensure_future(asyncio.to_thread(func, *args))
+            result = await asyncio.shield(future)
+            elapsed = time.monotonic() - start_time
+            self.avg_service_time = elapsed if not self.avg_service_time else 0.8 * self.avg_service_time + 0.2 * elapsed
+            return result
+        except asyncio.CancelledError:
+            if future is not None and not future.done():
+                # A decode thread can't be interrupted: keep the slot until it returns
+                future.add_done_callback(self._release_after_thread)
+                deferred = True
+            raise
+        finally:
+            if not deferred:
+                self._release_slot()
+
+    def _release_slot(self):
+        self.running -= 1
+        self._slots.release()
+
+    def _release_after_thread(self, future: asyncio.Future):
+        if not future.cancelled():
+            future.exception()  # Mark as retrieved; the caller is gone
+        self._release_slot()
+
+    def record_cancel(self, lines: int):
+        """Count lines dropped because the client disconnected."""
+        self.stats["cancelled_lines"] += lines
+
+    def snapshot(self) -> Dict:
+        return {
+            "waiting": self.waiting,
+            "running": self.running,
+            "inflight_tokens": self.inflight_tokens,
+            "max_queue_depth": self.max_queue_depth,
+            "max_inflight_tokens": self.max_inflight_tokens,
+            "max_concurrency": self.max_concurrency,
+            "avg_service_time_ms": round(self.avg_service_time * 1000, 2),
+            **self.stats
+        }
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store for model artifacts.
+
+Every file of a model directory (weights, vocab.json, *.spm, configs) is stored
+once as a blob named by its SHA-256, and each directory gets a manifest that
+maps its relative file names to blob hashes. Model directories are made of hard
+links to the blobs, so identical files across models/, *_ct2 conversions,
+backups and versions/ take disk space and page cache only once, and loading a
+version reuses files that are already resident.
+
+Blobs are read-only copies: a model file is never chmodded through a link it
+shares with the store. Only directories under models/ and versions/ are
+stored. convert.py and export_onnx.py add their output to the store only
+when ARTIFACT_STORE=1, and leave the source model's files as they are.
+
+Usage:
+  python artifact_store.py ingest models/opus models/opus_ct2 versions/v1.0
+  python artifact_store.py ingest --all
+  python artifact_store.py status
+  python artifact_store.py verify
+  python artifact_store.py gc
+"""
+
+import os
+import sys
+import json
+import stat
+import shutil
+import hashlib
+import argparse
+import tempfile
+from typing import Dict, List, Optional
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_PATH = os.environ.get("ARTIFACT_STORE_PATH", os.path.join(SCRIPT_DIR, "artifacts"))
+AUTO_INGEST = os.environ.get("ARTIFACT_STORE", "0") == "1"  # Store conversions and exports as they are built
+MODEL_PARENTS = ("models", "versions")
+
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _copy(src: str, dest: str):
+    """Atomically place a private copy of src at dest."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=".tmp-")
+    os.close(fd)
+    shutil.copy2(src, tmp)
+    os.replace(tmp, dest)
+
+
+def _link_or_copy(src: str, dest: str) -> bool:
+    """Atomically place src at dest as a hard link (copy across filesystems). Returns True if linked."""
+    dest_dir = os.path.dirname(dest)
+    fd, tmp = tempfile.mkstemp(dir=dest_dir, prefix=".tmp-")
+    os.close(fd)
+    os.remove(tmp)
+    try:
+        os.link(src, tmp)
+        linked = True
+    except OSError:
+        shutil.copy2(src, tmp)
+        linked = False
+    os.replace(tmp, dest)
+    return linked
+
+
+class ArtifactStore:
+    def __init__(self, root: str = DEFAULT_STORE_PATH):
+        self.root = root
+        self.blobs_dir = os.path.join(root, "blobs")
+        self.manifests_dir = os.path.join(root, "manifests")
+
+    # Naming
+
+    @staticmethod
+    def name_for(path: str) -> str:
+        """Manifest name of a model directory: its path relative to the service dir."""
+        return os.path.relpath(os.path.abspath(path), SCRIPT_DIR).replace(os.sep, "/")
+
+    def _manifest_path(self, name: str) -> str:
+        return os.path.join(self.manifests_dir, name.replace("/", "__") + ".json")
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blobs_dir, digest[:2], digest)
+
+    # Manifests
+
+    def has(self, name: str) -> bool:
+        return os.path.exists(self._manifest_path(name))
+
+    def manifest(self, name: str) -> Optional[Dict]:
+        path = self._manifest_path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def manifests(self) -> List[Dict]:
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        result = []
+        for entry in sorted(os.listdir(self.manifests_dir)):
+            if entry.endswith(".json"):
+                with open(os.path.join(self.manifests_dir, entry), "r") as f:
+                    result.append(json.load(f))
+        return result
+
+    # Ingest / materialize
+
+    def _store_blob(self, src: str, digest: str) -> str:
+        blob = self.blob_path(digest)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            # A copy, not a link: making the blob read-only must not affect src
+            _copy(src, blob)
+            # Blobs are shared by every directory linking to them: never edit in place
+            os.chmod(blob, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        return blob
+
+    def ingest(self, src_dir: str, name: str = None, link_in_place: bool = True) -> Dict:
+        """
+        Store every file of src_dir and write its manifest.
+
+        With link_in_place, files in src_dir are replaced by hard links to
+        their (read-only) blobs so the directory itself stops holding
+        duplicate copies. Without it, src_dir is left untouched and writable.
+        """
+        if not is_managed(src_dir):
+            raise ValueError(f"{src_dir} is not under {' or '.join(MODEL_PARENTS)}/")
+        name = name or self.name_for(src_dir)
+        files = {}
+        for dirpath, dirnames, filenames in os.walk(src_dir):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for filename in sorted(filenames):
+                if filename.startswith("."):
+                    continue
+                path = os.path.join(dirpath, filename)
+                rel = os.path.relpath(path, src_dir).replace(os.sep, "/")
+                digest = hash_file(path)
+                blob = self._store_blob(path, digest)
+                if link_in_place and not os.path.samefile(path, blob):
+                    _link_or_copy(blob, path)
+                st = os.stat(path)
+                files[rel] = {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+        manifest = {"name": name, "files": files}
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        with open(self._manifest_path(name), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def materialize(self, name: str, dest_dir: str) -> List[str]:
+        """
+        Link the files of the manifest that are missing from dest_dir from
+        their blobs. Existing files are never replaced. Files linked to their
+        blob, or with the size and mtime the manifest recorded, are not read,
+        so this is cheap to call before every load.
+
+        Returns the relative names of files whose content no longer matches
+        the manifest (e.g. a retrained model written over it).
+        """
+        manifest = self.manifest(name)
+        if manifest is None:
+            raise KeyError(f"No manifest for {name}")
+        changed = []
+        for rel, entry in manifest["files"].items():
+            blob = self.blob_path(entry["sha256"])
+            dest = os.path.join(dest_dir, *rel.split("/"))
+            if os.path.exists(dest):
+                if os.path.exists(blob) and os.path.samefile(dest, blob):
+                    continue
+                st = os.stat(dest)
+                if (st.st_size, st.st_mtime_ns) == (entry["size"], entry.get("mtime_ns")):
+                    continue
+                if hash_file(dest) != entry["sha256"]:
+                    changed.append(rel)
+                continue
+            if not os.path.exists(blob):
+                raise FileNotFoundError(f"Blob {entry['sha256']} for {name}/{rel} is missing")
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            _link_or_copy(blob, dest)
+        return changed
+
+    def resolve(self, path: str) -> str:
+        """
+        Return path, materialized from the store first if it has a manifest.
+        A directory whose files changed since it was stored is ingested again
+        (without linking its files to the store), so the manifest follows the
+        files on disk rather than the reverse.
+        """
+        name = self.name_for(path)
+        if self.has(name) and self.materialize(name, path):
+            self.ingest(path, name, link_in_place=False)
+        return path
+
+    def detach(self, path: str):
+        """Replace a stored file by a private writable copy before editing it in place."""
+        if not os.path.exists(path) or os.stat(path).st_nlink < 2:
+            return
+        tmp = path + ".detach"
+        shutil.copyfile(path, tmp)
+        os.chmod(tmp, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+        os.replace(tmp, path)
+
+    # Maintenance
+
+    def _all_blobs(self) -> Dict[str, str]:
+        blobs = {}
+        if os.path.isdir(self.blobs_dir):
+            for prefix in os.listdir(self.blobs_dir):
+                prefix_dir = os.path.join(self.blobs_dir, prefix)
+                for digest in os.listdir(prefix_dir):
+                    blobs[digest] = os.path.join(prefix_dir, digest)
+        return blobs
+
+    def stats(self) -> Dict:
+        manifests = self.manifests()
+        logical = sum(e["size"] for m in manifests for e in m["files"].values())
+        blobs = self._all_blobs()
+        stored = sum(os.path.getsize(p) for p in blobs.values())
+        return {
+            "manifests": len(manifests),
+            "blobs": len(blobs),
+            "logical_mb": logical / (1024 ** 2),
+            "stored_mb": stored / (1024 ** 2),
+            "saved_mb": (logical - stored) / (1024 ** 2)
+        }
+
+    def verify(self) -> List[str]:
+        """Rehash every blob; returns the digests whose content no longer matches."""
+        return [digest for digest, path in self._all_blobs().items() if hash_file(path) != digest]
+
+    def gc(self) -> int:
+        """Delete blobs no manifest refers to. Returns the number removed."""
+        referenced = {e["sha256"] for m in self.manifests() for e in m["files"].values()}
+        removed = 0
+        for digest, path in self._all_blobs().items():
+            if digest not in referenced:
+                os.chmod(path, stat.S_IRUSR | stat.S_IWUSR)
+                os.remove(path)
+                removed += 1
+        return removed
+
+
+def is_managed(path: str) -> bool:
+    """Whether path is a model directory under models/ or versions/ of the service."""
+    parent = os.path.dirname(os.path.abspath(path))
+    return any(parent == os.path.join(SCRIPT_DIR, p) for p in MODEL_PARENTS)
+
+
+def auto_ingest(path: str, link_in_place: bool = True, store: "ArtifactStore" = None) -> Optional[Dict]:
+    """
+    Store a directory convert.py or export_onnx.py just built, when
+    ARTIFACT_STORE=1 and it is under models/ or versions/. Returns the
+    manifest, or None when it was not stored.
+    """
+    if not AUTO_INGEST or not is_managed(path):
+        return None
+    return (store or ArtifactStore()).ingest(path, link_in_place=link_in_place)
+
+
+def model_dirs() -> List[str]:
+    """Every model directory under models/ and versions/."""
+    dirs = []
+    for parent in MODEL_PARENTS:
+        parent_path = os.path.join(SCRIPT_DIR, parent)
+        if os.path.isdir(parent_path):
+            for entry in sorted(os.listdir(parent_path)):
+                full_path = os.path.join(parent_path, entry)
+                if os.path.isdir(full_path):
+                    dirs.append(full_path)
+    return dirs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Content-addressed model artifact store")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="Store directory")
+    sub = parser.add_subparsers(dest="command")
+
+    ingest_parser = sub.add_parser("ingest", help="Store model directories and link them to shared blobs")
+    ingest_parser.add_argument("paths", nargs="*", help="Model directories (e.g. models/opus_ct2)")
+    ingest_parser.add_argument("--all", action="store_true", help="Every directory in models/ and versions/")
+    sub.add_parser("status", help="Show manifests and space saved")
+    sub.add_parser("verify", help="Check blob hashes")
+    sub.add_parser("gc", help="Delete unreferenced blobs")
+
+    args = parser.parse_args()
+    store = ArtifactStore(args.store)
+
+    if args.command == "ingest":
+        paths = model_dirs() if args.all else args.paths
+        if not paths:
+            ingest_parser.print_help()
+            sys.exit(1)
+        for path in paths:
+            manifest = store.ingest(path)
+            print(f"✓ {manifest['name']}: {len(manifest['files'])} files")
+        s = store.stats()
+        print(f"\nStored {s['stored_mb']:.2f} MB for {s['logical_mb']:.2f} MB of model files (saved {s['saved_mb']:.2f} MB)")
+    elif args.command == "status":
+        for manifest in store.manifests():
+            size_mb = sum(e["size"] for e in manifest["files"].values()) / (1024 ** 2)
+            print(f"{manifest['name']:30} | {len(manifest['files']):3} files | {size_mb:.2f} MB")
+        s = store.stats()
+        print(f"\n{s['blobs']} blobs, {s['stored_mb']:.2f} MB stored, {s['saved_mb']:.2f} MB saved by deduplication")
+    elif args.command == "verify":
+        bad = store.verify()
+        if bad:
+            print(f"✗ {len(bad)} corrupted blobs: {', '.join(bad)}")
+            sys.exit(1)
+        print("✓ All blobs match their hashes")
+    elif args.command == "gc":
+        print(f"Removed {store.gc()} unreferenced blobs")
+    else:
+        parser.print_help()
+        sys.exit(1)
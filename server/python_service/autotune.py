@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Thread and batch-size autotuner for the CPU host.
+
+Sweeps CTranslate2 inter/intra thread splits with max_batch_size/batch_type,
+ONNX Runtime intra-op threads with batch sizes, and torch thread counts with
+generate() batch sizes for Transformers models (in the CPU mode the service
+will load them in),
+measures throughput and single-line latency, and writes a profile that
+main.py applies at startup. For Transformers models the profile also keeps
+how closely each hf_cpu.py mode agrees with fp32, so the service doesn't
+validate the CPU variant on every load. Thread splits are bounded by the physical core
+count so hyperthreaded hosts are not oversubscribed (the logical count is
+tried too, in case SMT helps on that host).
+
+Usage:
+  python autotune.py --model opus
+  python autotune.py --all-models --quick
+  python autotune.py --show
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime
+from typing import Dict, List
+
+import psutil
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_MODELS_PATH = os.path.join(SCRIPT_DIR, "models")
+DEFAULT_PROFILE_PATH = os.environ.get("TUNING_PROFILE_PATH", os.path.join(SCRIPT_DIR, "tuning_profile.json"))
+
+CT2_BATCH_OPTIONS = [("examples", 8), ("examples", 16), ("examples", 32), ("examples", 64),
+                     ("tokens", 256), ("tokens", 512), ("tokens", 1024), ("tokens", 2048)]
+HF_BATCH_SIZES = [8, 16, 32]
+WORKLOAD_LINES = 128
+LATENCY_ITERATIONS = 10
+LATENCY_TOLERANCE = 1.25  # Accept up to 25% worse p50 latency than the best setting for more throughput
+
+
+# Profile
+
+def load_profile(path: str = DEFAULT_PROFILE_PATH) -> Dict:
+    """Read a tuning profile; returns an empty profile if there is none or it can't be read."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read tuning profile {path}: {e}")
+        return {}
+
+
+def model_settings(profile: Dict, model_id: str) -> Dict:
+    """Tuned settings for one model ({} if it was never tuned)."""
+    return profile.get("models", {}).get(model_id, {})
+
+
+def save_profile(profile: Dict, path: str):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp, path)
+
+
+# Candidates
+
+def host_info() -> Dict:
+    logical = os.cpu_count() or 1
+    physical = psutil.cpu_count(logical=False) or logical
+    return {"logical_cpus": logical, "physical_cpus": physical}
+
+
+def thread_splits(physical: int, logical: int, quick: bool = False) -> List[tuple]:
+    """(inter_threads, intra_threads) pairs using up to the physical (and logical) core count."""
+    totals = [physical] if quick else sorted({physical, logical})
+    splits = []
+    for total in totals:
+        inter = 1
+        while inter <= total:
+            split = (inter, max(1, total // inter))
+            if split not in splits:
+                splits.append(split)
+            inter *= 2
+    return splits
+
+
+def torch_thread_counts(physical: int, logical: int, quick: bool = False) -> List[int]:
+    counts = {physical, max(1, physical // 2)} if quick else {1, max(1, physical // 2), physical, logical}
+    return sorted(counts)
+
+
+# Measurement
+
+def workload(lines: int = WORKLOAD_LINES) -> List[str]:
+    from benchmark import ModelBenchmark
+    sentences = ModelBenchmark.TEST_SENTENCES
+    return [sentences[i % len(sentences)] for i in range(lines)]
+
+
+def measure(translate, texts: List[str], latency_iterations: int) -> Dict:
+    """Throughput of one call over texts and p50 latency of single-line calls."""
+    translate(texts[:4])  # Warm-up
+    start = time.perf_counter()
+    translate(texts)
+    elapsed = time.perf_counter() - start
+    latencies = []
+    for i in range(latency_iterations):
+        start = time.perf_counter()
+        translate([texts[i % len(texts)]])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"lines_per_s": round(len(texts) / elapsed, 2), "p50_ms": round(statistics.median(latencies), 2)}
+
+
+def pick_best(results: List[Dict]) -> Dict:
+    """Highest throughput among settings whose latency is close to the best latency."""
+    best_latency = min(r["p50_ms"] for r in results)
+    eligible = [r for r in results if r["p50_ms"] <= best_latency * LATENCY_TOLERANCE]
+    return max(eligible, key=lambda r: r["lines_per_s"])
+
+
+def resolve_model_path(model_id: str, base_path: str) -> tuple:
+    """Same backend choice as main.py: *_ct2 when present (never for mBART), then *_onnx, else the HF model."""
+    from onnx_backend import is_onnx_model
+
+    ct2_path = os.path.join(base_path, f"{model_id}_ct2")
+    if os.path.exists(os.path.join(ct2_path, "model.bin")) and "mbart" not in model_id.lower():
+        return ct2_path, "ctranslate2"
+    onnx_path = os.path.join(base_path, f"{model_id}_onnx")
+    if is_onnx_model(onnx_path):
+        return onnx_path, "onnxruntime"
+    hf_path = os.path.join(base_path, model_id)
+    nested = os.path.join(hf_path, "final_model")
+    if os.path.isdir(nested):
+        hf_path = nested
+    if not os.path.isdir(hf_path):
+        raise FileNotFoundError(f"Model {model_id} not found in {base_path}")
+    return hf_path, "transformers"
+
+
+def tune_ct2(model_id: str, path: str, host: Dict, quick: bool) -> List[Dict]:
+    import ctranslate2
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(path, local_files_only=True)
+    texts = workload()
+    source = {t: tokenizer.convert_ids_to_tokens(tokenizer.encode(t)) for t in set(texts)}
+    batch_options = CT2_BATCH_OPTIONS[1::2] if quick else CT2_BATCH_OPTIONS
+
+    results = []
+    for inter, intra in thread_splits(host["physical_cpus"], host["logical_cpus"], quick):
+        translator = ctranslate2.Translator(path, device="cpu", inter_threads=inter,
+                                            intra_threads=intra, compute_type="auto")
+        for batch_type, max_batch_size in batch_options:
+            def translate(lines):
+                return translator.translate_batch([source[t] for t in lines], beam_size=1,
+                                                  max_batch_size=max_batch_size, batch_type=batch_type)
+            r = measure(translate, texts, LATENCY_ITERATIONS)
+            r.update({"inter_threads": inter, "intra_threads": intra,
+                      "batch_type": batch_type, "max_batch_size": max_batch_size})
+            print(f"  inter={inter:<2} intra={intra:<2} {batch_type:>8}={max_batch_size:<5} "
+                  f"{r['lines_per_s']:8.1f} lines/s  p50 {r['p50_ms']:7.1f} ms")
+            results.append(r)
+        del translator
+    return results
+
+
+def tune_onnx(model_id: str, path: str, host: Dict, quick: bool) -> List[Dict]:
+    from transformers import AutoTokenizer
+    from onnx_backend import OnnxTranslator
+
+    tokenizer = AutoTokenizer.from_pretrained(path, local_files_only=True)
+    texts = workload(WORKLOAD_LINES // 2)
+    source = {t: tokenizer.encode(t) for t in set(texts)}
+    batch_sizes = HF_BATCH_SIZES[1:] if quick else HF_BATCH_SIZES
+
+    results = []
+    for threads in torch_thread_counts(host["physical_cpus"], host["logical_cpus"], quick):
+        translator = OnnxTranslator(path, intra_threads=threads)
+        forced_bos_token_id = translator.metadata.get("forced_bos_token_id")
+        for batch_size in batch_sizes:
+            def translate(lines):
+                return translator.translate_batch([source[t] for t in lines], beam_size=1, max_length=128,
+                                                  forced_bos_token_id=forced_bos_token_id,
+                                                  max_batch_size=batch_size)
+            r = measure(translate, texts, LATENCY_ITERATIONS // 2)
+            r.update({"intra_threads": threads, "max_batch_size": batch_size})
+            print(f"  intra_threads={threads:<2} batch={batch_size:<3} "
+                  f"{r['lines_per_s']:8.1f} lines/s  p50 {r['p50_ms']:7.1f} ms")
+            results.append(r)
+        del translator
+    return results
+
+
+def service_cpu_mode(model_id: str, agreements: Dict) -> str:
+    """CPU mode main.load_cpu_variant() loads model_id in: HF_CPU_MODE, or fp32 when that mode disagrees with fp32."""
+    from hf_cpu import parse_cpu_modes, DEFAULT_CPU_MODE_SPEC, MIN_AGREEMENT
+
+    default, per_model = parse_cpu_modes(os.environ.get("HF_CPU_MODE", DEFAULT_CPU_MODE_SPEC))
+    mode = per_model.get(model_id, default)
+    min_agreement = float(os.environ.get("HF_MIN_AGREEMENT", str(MIN_AGREEMENT)))
+    score = agreements.get(mode)
+    return mode if mode == "fp32" or (score is not None and score >= min_agreement) else "fp32"
+
+
+def tune_transformers(model_id: str, path: str, host: Dict, quick: bool, cpu_mode: str = "fp32") -> List[Dict]:
+    import torch
+    from transformers import AutoTokenizer
+    from hf_cpu import load_cpu_model
+
+    tokenizer = AutoTokenizer.from_pretrained(path, local_files_only=True)
+    model = load_cpu_model(path, cpu_mode)
+    generate_kwargs = {"max_length": 128, "num_beams": 1}
+    if "mbart" in model_id.lower():
+        tokenizer.src_lang = "zh_CN"
+        generate_kwargs["forced_bos_token_id"] = tokenizer.convert_tokens_to_ids("vi_VN")
+    texts = workload(WORKLOAD_LINES // 2)
+    batch_sizes = HF_BATCH_SIZES[1:] if quick else HF_BATCH_SIZES
+
+    results = []
+    for threads in torch_thread_counts(host["physical_cpus"], host["logical_cpus"], quick):
+        torch.set_num_threads(threads)
+        for batch_size in batch_sizes:
+            def translate(lines):
+                for i in range(0, len(lines), batch_size):
+                    inputs = tokenizer(lines[i:i + batch_size], return_tensors="pt", padding=True)
+                    with torch.inference_mode():
+                        model.generate(**inputs, **generate_kwargs)
+            r = measure(translate, texts, LATENCY_ITERATIONS // 2)
+            r.update({"torch_threads": threads, "max_batch_size": batch_size})
+            print(f"  torch_threads={threads:<2} batch={batch_size:<3} "
+                  f"{r['lines_per_s']:8.1f} lines/s  p50 {r['p50_ms']:7.1f} ms")
+            results.append(r)
+    return results
+
+
+def tune_model(model_id: str, base_path: str, host: Dict, quick: bool = False) -> Dict:
+    path, backend = resolve_model_path(model_id, base_path)
+    print(f"\nTuning {model_id} ({backend}, {path})")
+    if backend == "ctranslate2":
+        results = tune_ct2(model_id, path, host, quick)
+    elif backend == "onnxruntime":
+        results = tune_onnx(model_id, path, host, quick)
+    else:
+        from model_catalog import dir_signature
+        agreements = check_transformers_modes(model_id, path)
+        cpu_mode = service_cpu_mode(model_id, agreements)
+        print(f"  Tuning in CPU mode {cpu_mode}")
+        results = tune_transformers(model_id, path, host, quick, cpu_mode)
+    best = dict(pick_best(results), backend=backend)
+    if backend == "transformers":
+        best["tuned_cpu_mode"] = cpu_mode
+        best["cpu_mode_agreement"] = agreements
+        best["cpu_mode_signature"] = dir_signature(path)  # Files the agreement was measured on
+    print(f"✓ {model_id}: {best}")
+    return best
+
+
+def check_transformers_modes(model_id: str, path: str) -> Dict:
+    """Agreement with fp32 of every hf_cpu.py mode (None when the mode fails)."""
+    from transformers import AutoTokenizer
+    from hf_cpu import CPU_MODES, check_cpu_modes, validation_kwargs
+
+    tokenizer = AutoTokenizer.from_pretrained(path, local_files_only=True)
+    if "mbart" in model_id.lower():
+        tokenizer.src_lang = "zh_CN"
+    scores = check_cpu_modes(path, CPU_MODES, tokenizer, validation_kwargs(model_id, tokenizer))
+    for mode, score in scores.items():
+        print(f"  {mode:<14} agreement with fp32: {'failed' if score is None else f'{score:.3f}'}")
+    return scores
+
+
+def print_profile(profile: Dict):
+    if not profile:
+        print("No tuning profile found. Run: python autotune.py --all-models")
+        return
+    host = profile.get("host", {})
+    print(f"Profile from {profile.get('created_at')} "
+          f"({host.get('physical_cpus')} physical / {host.get('logical_cpus')} logical CPUs)")
+    print(f"torch_threads: {profile.get('torch_threads')}\n")
+    for model_id, s in profile.get("models", {}).items():
+        if "backend" not in s:
+            continue  # Only CPU mode agreements recorded by the service
+        if "inter_threads" in s:
+            threads = f"inter={s['inter_threads']} intra={s['intra_threads']}"
+        elif "intra_threads" in s:
+            threads = f"intra={s['intra_threads']}"
+        else:
+            threads = f"torch={s['torch_threads']} {s.get('tuned_cpu_mode', 'fp32')}"
+        batch = f"{s.get('batch_type', 'examples')}={s['max_batch_size']}"
+        print(f"{model_id:15} | {s['backend']:12} | {threads:18} | {batch:14} | "
+              f"{s['lines_per_s']:8.1f} lines/s | p50 {s['p50_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune CPU threads and batch sizes per model")
+    parser.add_argument("--model", action="append", help="Model to tune (repeatable, e.g. --model opus)")
+    parser.add_argument("--all-models", action="store_true", help="Tune every model in models/")
+    parser.add_argument("--quick", action="store_true", help="Smaller sweep")
+    parser.add_argument("--models-path", default=BASE_MODELS_PATH, help="Directory containing the models")
+    parser.add_argument("--output", default=DEFAULT_PROFILE_PATH, help="Profile to write (merged with existing entries)")
+    parser.add_argument("--show", action="store_true", help="Print the current profile")
+    args = parser.parse_args()
+
+    if args.show:
+        print_profile(load_profile(args.output))
+        sys.exit(0)
+
+    if args.all_models:
+        from model_catalog import is_model_name
+        models = sorted(d for d in os.listdir(args.models_path)
+                        if os.path.isdir(os.path.join(args.models_path, d)) and is_model_name(d))
+    elif args.model:
+        models = args.model
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+    host = host_info()
+    print(f"Host: {host['physical_cpus']} physical / {host['logical_cpus']} logical CPUs")
+
+    profile = load_profile(args.output)
+    profile.setdefault("models", {})
+    for model_id in models:
+        try:
+            profile["models"][model_id] = tune_model(model_id, args.models_path, host, args.quick)
+        except Exception as e:
+            print(f"✗ {model_id}: {e}")
+
+    # One torch thread count for the process: the best one among tuned Transformers models
+    hf_results = [s for s in profile["models"].values() if s.get("backend") == "transformers"]
+    profile["torch_threads"] = (max(hf_results, key=lambda s: s["lines_per_s"])["torch_threads"]
+                                if hf_results else host["physical_cpus"])
+    profile["host"] = host
+    profile["created_at"] = datetime.now().isoformat(timespec="seconds")
+    save_profile(profile, args.output)
+    print(f"\nProfile written to {args.output}\n")
+    print_profile(profile)
@@ -16,18 +16,50 @@ from transformers import AutoTokenizer
 from typing import List, Dict
 
 class ModelBenchmark:
-    def __init__(self, model_path: str, model_id: str):
-        """Initialize benchmark for a specific model."""
+    TEST_SENTENCES = [
+        "你好，世界！",
+        "今天天气很好。",
+        "我喜欢学习中文。",
+        "这是一个测试句子。",
+        "人工智能正在改变世界。",
+        "机器学习是一个非常有趣的领域。",
+        "深度学习模型需要大量的数据来训练。",
+        "自然语言处理是人工智能的一个重要分支。",
+        "翻译系统可以帮助人们跨越语言障碍进行交流。",
+        "字幕管理系统可以自动翻译和同步字幕文件。"
+    ]
+
+    def __init__(self, model_path: str, model_id: str, cpu_mode: str = None):
+        """
+        Initialize benchmark for a specific model.
+        cpu_mode: Transformers CPU variant from hf_cpu.py (default: plain from_pretrained)
+        """
+        self.is_ct2 = model_path.endswith("_ct2")
+        self.is_onnx = model_path.endswith("_onnx")
+        # Transformers weights may sit in a nested final_model (as in load_model_bundle)
+        nested_path = os.path.join(model_path, "final_model")
+        if not self.is_ct2 and not self.is_onnx and os.path.isdir(nested_path):
+            model_path = nested_path
         self.model_path = model_path
         self.model_id = model_id
-        self.is_ct2 = model_path.endswith("_ct2")
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.cpu_mode = cpu_mode
         
         # Load model
         print(f"Loading model from {model_path}...")
         if self.is_ct2:
             self.translator = ctranslate2.Translator(model_path, device=self.device)
             self.model = None
+        elif self.is_onnx:
+            from onnx_backend import OnnxTranslator
+            self.translator = OnnxTranslator(model_path)
+            self.model = None
+            self.device = "cpu"
+        elif cpu_mode:
+            from hf_cpu import load_cpu_model
+            self.model = load_cpu_model(model_path, cpu_mode)
+            self.device = "cpu"
+            self.translator = None
         else:
             from transformers import AutoModelForSeq2SeqLM
             self.model = AutoModelForSeq2SeqLM.from_pretrained(model_path, local_files_only=True)
@@ -39,21 +71,12 @@ class ModelBenchmark:
         self.tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
         
         # Test data (Chinese sentences)
-        self.test_sentences = [
-            "你好，世界！",
-            "今天天气很好。",
-            "我喜欢学习中文。",
-            "这是一个测试句子。",
-            "人工智能正在改变世界。",
-            "机器学习是一个非常有趣的领域。",
-            "深度学习模型需要大量的数据来训练。",
-            "自然语言处理是人工智能的一个重要分支。",
-            "翻译系统可以帮助人们跨越语言障碍进行交流。",
-            "字幕管理系统可以自动翻译和同步字幕文件。"
-        ]
+        self.test_sentences = list(self.TEST_SENTENCES)
     
     def translate_single(self, text: str) -> str:
         """Translate a single sentence."""
+        if self.is_onnx:
+            return self.translate_batch([text])[0]
         if self.is_ct2:
             # CTranslate2 path
             input_ids = self.tokenizer.encode(text)
@@ -76,12 +99,19 @@ class ModelBenchmark:
         else:
             # Transformers path
             inputs = self.tokenizer(text, return_tensors="pt", padding=True).to(self.device)
-            with torch.no_grad():
+            with torch.inference_mode():
                 outputs = self.model.generate(**inputs, max_length=512)
             return self.tokenizer.decode(outputs[0], skip_special_tokens=True)
     
     def translate_batch(self, texts: List[str]) -> List[str]:
         """Translate a batch of sentences."""
+        if self.is_onnx:
+            # ONNX Runtime path (the export's generation defaults, mBART target language forced)
+            results = self.translator.translate_batch(
+                [self.tokenizer.encode(t) for t in texts],
+                forced_bos_token_id=self.translator.metadata.get("forced_bos_token_id")
+            )
+            return [self.tokenizer.decode(ids, skip_special_tokens=True) for ids, _ in results]
         if self.is_ct2:
             # CTranslate2 batch path
             source_tokens = [
@@ -108,10 +138,14 @@ class ModelBenchmark:
         else:
             # Transformers batch path
             inputs = self.tokenizer(texts, return_tensors="pt", padding=True, truncation=True).to(self.device)
-            with torch.no_grad():
+            with torch.inference_mode():
                 outputs = self.model.generate(**inputs, max_length=512)
             return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
     
+    @property
+    def backend(self) -> str:
+        return "ctranslate2" if self.is_ct2 else "onnxruntime" if self.is_onnx else "transformers"
+    
     def benchmark_latency(self, iterations: int = 100) -> Dict:
         """Measure single-request latency."""
         print(f"\nBenchmarking latency ({iterations} iterations)...")
@@ -200,14 +234,15 @@ class ModelBenchmark:
         """Run complete benchmark suite."""
         print(f"\n{'='*70}")
         print(f"  Benchmarking: {self.model_id}")
-        print(f"  Backend: {'CTranslate2' if self.is_ct2 else 'Transformers'}")
+        print(f"  Backend: {self.backend}")
         print(f"  Device: {self.device}")
         print(f"{'='*70}")
         
         results = {
             "model_id": self.model_id,
-            "backend": "ctranslate2" if self.is_ct2 else "transformers",
+            "backend": self.backend,
             "device": self.device,
+            "cpu_mode": self.cpu_mode,
             "latency": self.benchmark_latency(latency_iterations),
             "throughput": self.benchmark_throughput(iterations=throughput_iterations),
             "memory": self.benchmark_memory()
@@ -215,6 +250,278 @@ class ModelBenchmark:
         
         return results
 
+def benchmark_hf_variants(model_path: str, model_id: str, modes: List[str],
+                          latency_iterations: int = 100, throughput_iterations: int = 20) -> List[Dict]:
+    """
+    Benchmark a Transformers model in each hf_cpu.py mode. Each result also has
+    the variant's agreement with the fp32 outputs on the test sentences.
+    """
+    from hf_cpu import agreement
+
+    nested = os.path.join(model_path, "final_model")
+    if os.path.isdir(nested):
+        model_path = nested
+
+    results_list = []
+    reference = None
+    for mode in ["fp32"] + [m for m in modes if m != "fp32"]:
+        benchmark = ModelBenchmark(model_path, model_id, cpu_mode=mode)
+        outputs = benchmark.translate_batch(benchmark.test_sentences)  # Also compiles int8_compile
+        if reference is None:
+            reference = outputs
+        results = benchmark.run_full_benchmark(latency_iterations, throughput_iterations)
+        results["agreement"] = agreement(reference, outputs)
+        results_list.append(results)
+        del benchmark
+    return results_list
+
+def print_variant_results(results_list: List[Dict]):
+    print(f"\n{'='*70}")
+    print(f"  CPU Variants: {results_list[0]['model_id']}")
+    print(f"{'='*70}\n")
+    print(f"{'Mode':<14} {'Latency (ms)':<14} {'Speedup':<9} {'Throughput':<15} {'Memory (MB)':<12} {'vs fp32':<8}")
+    print(f"{'-'*74}")
+    baseline = results_list[0]['latency']['mean_ms']
+    for r in results_list:
+        latency = r['latency']['mean_ms']
+        print(f"{r['cpu_mode']:<14} {latency:<14.1f} {baseline / latency:<9.2f} "
+              f"{r['throughput']['sentences_per_second']:<15.1f} {r['memory']['model_memory_mb']:<12.0f} "
+              f"{r['agreement']:.3f}")
+    print("\nvs fp32: mean character similarity of the batch outputs to fp32 (1.000 = identical)")
+
+def benchmark_serialization(lines: int = 2000, file_path: str = None, iterations: int = 20) -> Dict:
+    """
+    Measure request/response serialization cost of /translate_batch for a
+    subtitle file (default: synthetic lines), without any model.
+    """
+    from fastapi.encoders import jsonable_encoder
+    import transport
+    from main import BatchTranslationRequest
+
+    if file_path:
+        with open(file_path, "r", encoding="utf-8-sig") as f:
+            texts = [line.rstrip("\n") for line in f][:lines]
+    else:
+        sentences = ModelBenchmark.TEST_SENTENCES
+        texts = [f"{sentences[i % len(sentences)]} ({i})" for i in range(lines)]
+    response = {"translated_texts": [f"Dòng phụ đề đã dịch số {i}" for i in range(len(texts))], "model_used": "opus"}
+    request_data = {"texts": texts}
+
+    def timed(func) -> float:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - start) / iterations * 1000
+
+    def stock_round_trip():
+        BatchTranslationRequest(**json.loads(json.dumps(request_data)))
+        json.dumps(jsonable_encoder(response)).encode("utf-8")
+
+    def negotiated_round_trip(content_type, accept):
+        body = transport.dumps_json(request_data) if content_type == transport.JSON_TYPE else transport.msgpack.packb(request_data)
+        def run():
+            BatchTranslationRequest.model_validate(transport.decode_body(body, content_type, None))
+            transport.encode_body(response, accept)
+        return run
+
+    results = {"lines": len(texts), "formats": {}}
+    results["formats"]["json (stock)"] = {
+        "round_trip_ms": timed(stock_round_trip),
+        "response_bytes": len(json.dumps(response).encode("utf-8"))
+    }
+    results["formats"][f"json ({transport.available_formats()['json']})"] = {
+        "round_trip_ms": timed(negotiated_round_trip(transport.JSON_TYPE, transport.JSON_TYPE)),
+        "response_bytes": len(transport.dumps_json(response))
+    }
+    if transport.msgpack:
+        results["formats"]["msgpack"] = {
+            "round_trip_ms": timed(negotiated_round_trip(transport.MSGPACK_TYPE, transport.MSGPACK_TYPE)),
+            "response_bytes": len(transport.encode_body(response, transport.MSGPACK_TYPE)[0])
+        }
+
+    body = transport.dumps_json(response)
+    for encoding in transport.available_formats()["encodings"]:
+        compressed, _ = transport.compress(body, encoding)
+        results["formats"][f"json + {encoding}"] = {
+            "round_trip_ms": timed(lambda: transport.compress(body, encoding)),
+            "response_bytes": len(compressed)
+        }
+    return results
+
+def print_serialization_results(results: Dict):
+    print(f"\n{'='*70}")
+    print(f"  Serialization: {results['lines']} lines")
+    print(f"{'='*70}\n")
+    print(f"{'Format':<20} {'Time (ms)':<12} {'Response size':<15}")
+    print(f"{'-'*50}")
+    for name, r in results["formats"].items():
+        print(f"{name:<20} {r['round_trip_ms']:<12.2f} {r['response_bytes'] / 1024:.1f} KB")
+    print("\nTime is request parse + validation + response encoding (compression rows: compression only)")
+
+def benchmark_logging(requests: int = 20000, sample_rate: float = 0.01) -> Dict:
+    """
+    Request-thread cost of the log lines of a /translate call on a CTranslate2
+    model, without any model: the print() calls the handler used to make vs
+    logging through service_logging's queue. Log lines go to stderr, so
+    redirect stderr to the sink to measure (terminal, pipe, file, /dev/null).
+    """
+    import logging
+    import service_logging
+
+    text = ModelBenchmark.TEST_SENTENCES[-1]
+    source_tokens = ["▁" + c for c in text] + ["</s>"]
+    logger = logging.getLogger("benchmark.logging")
+
+    def print_request():
+        print(f"Tokenizing text: {text[:50]}...", file=sys.stderr)
+        print(f"Source tokens (first 10): {source_tokens[:10]}", file=sys.stderr)
+
+    def queue_request():
+        with service_logging.request_context(sample_rate):
+            if service_logging.log_tokens(logger):
+                logger.debug("Source tokens (first 10): %s", source_tokens[:10], extra={"text": text[:50]})
+
+    modes = {
+        "print": (print_request, None, False),
+        "queue (INFO)": (queue_request, "INFO", False),
+        f"queue (DEBUG, {sample_rate:.0%} sampled, tokens on)": (queue_request, "DEBUG", True)
+    }
+    results = {"requests": requests, "modes": {}}
+    for name, (request, level, tokens) in modes.items():
+        if level:
+            service_logging.LOG_TOKENS = int(tokens)
+            service_logging.setup_logging(level=level, stream=sys.stderr)
+            logger.setLevel(level)
+        start = time.perf_counter()
+        for _ in range(requests):
+            request()
+        request_s = time.perf_counter() - start
+        sys.stderr.flush()
+        service_logging.shutdown_logging()  # Waits for the listener to write everything queued
+        total_s = time.perf_counter() - start
+        results["modes"][name] = {
+            "request_thread_us": request_s / requests * 1e6,
+            "requests_per_second": requests / request_s,
+            "total_s": total_s
+        }
+    return results
+
+def print_logging_results(results: Dict):
+    print(f"\n{'='*70}")
+    print(f"  Logging: {results['requests']} /translate requests")
+    print(f"{'='*70}\n")
+    print(f"{'Mode':<42} {'us/request':<12} {'Requests/s':<14} {'Total (s)':<10}")
+    print(f"{'-'*78}")
+    for name, r in results["modes"].items():
+        print(f"{name:<42} {r['request_thread_us']:<12.2f} {r['requests_per_second']:<14.0f} {r['total_s']:.2f}")
+    print("\nus/request: time spent in the request thread; total: until every line was written")
+
+def benchmark_live(models_path: str, model_id: str, step: int = 2, rounds: int = 3) -> Dict:
+    """
+    Decode cost of live-caption lines growing by step characters per update
+    (the longer test sentences): each update translated from scratch vs a
+    live_captions.LiveSession reusing the previous translation as the decoder
+    prefix. Both decode greedily with main.translate_live on the service's model.
+    """
+    import main
+    from live_captions import LiveSession
+
+    loaded = main.load_model_bundle(model_id, models_path)
+    lines = [[s[:i] for i in range(step, len(s), step)] + [s] for s in ModelBenchmark.TEST_SENTENCES[5:]]
+    updates = sum(len(texts) for texts in lines)
+
+    def run(reuse: bool):
+        decoded = reused = 0
+        start = time.perf_counter()
+        for texts in lines:
+            session = LiveSession("benchmark", model_id, mask_tokens=main.LIVE_MASK_TOKENS)
+            for text in texts:
+                prefix = session.reusable_prefix(text) if reuse else []
+                translated, tokens, forced = main.translate_live(text, prefix, loaded)
+                session.record(text, translated, tokens, forced)
+                decoded += len(tokens) - forced
+                reused += forced
+        return time.perf_counter() - start, decoded, reused
+
+    run(True)  # Warm-up
+    results = {"model_id": model_id, "backend": loaded.backend, "lines": len(lines), "updates": updates, "modes": {}}
+    for name, reuse in (("re-translate", False), ("session (prefix reuse)", True)):
+        runs = [run(reuse) for _ in range(rounds)]
+        elapsed, decoded, reused = min(runs)
+        results["modes"][name] = {
+            "ms_per_update": elapsed / updates * 1000,
+            "decoded_tokens": decoded,
+            "reused_tokens": reused
+        }
+    return results
+
+def print_live_results(results: Dict):
+    print(f"\n{'='*70}")
+    print(f"  Live captions: {results['model_id']} ({results['backend']}), "
+          f"{results['lines']} lines, {results['updates']} updates")
+    print(f"{'='*70}\n")
+    print(f"{'Mode':<26} {'ms/update':<12} {'Decoded tokens':<16} {'Reused tokens':<14}")
+    print(f"{'-'*68}")
+    for name, r in results["modes"].items():
+        print(f"{name:<26} {r['ms_per_update']:<12.2f} {r['decoded_tokens']:<16} {r['reused_tokens']:<14}")
+
+def benchmark_streaming(models_path: str, model_id: str, rounds: int = 3) -> Dict:
+    """
+    Per test sentence: latency of the blocking translation (what /translate
+    returns after) vs time to first chunk and total time of the streamed
+    translation (main.translate_streaming), on the service's model_id.
+    """
+    import threading
+    import main
+
+    loaded = main.load_model_bundle(model_id, models_path)
+    sentences = ModelBenchmark.TEST_SENTENCES
+
+    def blocking(text):
+        start = time.perf_counter()
+        main.translate_text(text, loaded)
+        return time.perf_counter() - start
+
+    def streamed(text):
+        first = []
+        start = time.perf_counter()
+
+        def emit(chunk):
+            if not first:
+                first.append(time.perf_counter() - start)
+
+        main.translate_streaming(text, loaded, emit, threading.Event())
+        return first[0] if first else None, time.perf_counter() - start
+
+    for text in sentences[:2]:  # Warm-up
+        blocking(text)
+        streamed(text)
+    blocking_s, first_s, streamed_s = [], [], []
+    for _ in range(rounds):
+        for text in sentences:
+            blocking_s.append(blocking(text))
+            first, total = streamed(text)
+            if first is not None:
+                first_s.append(first)
+            streamed_s.append(total)
+    mean_ms = lambda values: sum(values) / len(values) * 1000 if values else None
+    return {
+        "model_id": model_id,
+        "backend": loaded.backend,
+        "sentences": len(sentences) * rounds,
+        "blocking_ms": mean_ms(blocking_s),
+        "stream_first_chunk_ms": mean_ms(first_s),
+        "stream_total_ms": mean_ms(streamed_s)
+    }
+
+def print_streaming_results(results: Dict):
+    print(f"\n{'='*70}")
+    print(f"  Streaming: {results['model_id']} ({results['backend']}), {results['sentences']} lines")
+    print(f"{'='*70}\n")
+    print(f"Blocking translation:     {results['blocking_ms']:.1f} ms until any text")
+    print(f"Streamed, first chunk:    {results['stream_first_chunk_ms']:.1f} ms")
+    print(f"Streamed, complete:       {results['stream_total_ms']:.1f} ms")
+
 def print_results(results: Dict):
     """Pretty print benchmark results."""
     print(f"\n{'='*70}")
@@ -265,7 +572,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Benchmark translation models")
     parser.add_argument(
         "--model",
-        help="Specific model to benchmark (e.g., mbart_ct2)"
+        help="Specific model to benchmark (e.g., mbart_ct2, mbart_onnx)"
     )
     parser.add_argument(
         "--all-models",
@@ -288,15 +595,117 @@ if __name__ == "__main__":
         "--output",
         help="Output JSON file for results"
     )
+    parser.add_argument(
+        "--models-path",
+        help="Models directory (default: ./models, e.g. the output of make_fixtures.py)"
+    )
+    parser.add_argument(
+        "--hf-variants",
+        action="store_true",
+        help="Benchmark a Transformers model (--model) in each CPU mode (fp32, sdpa, int8, int8_compile)"
+    )
+    parser.add_argument(
+        "--modes",
+        default="fp32,sdpa,int8,int8_compile",
+        help="Comma-separated CPU modes for --hf-variants"
+    )
+    parser.add_argument(
+        "--serialization",
+        action="store_true",
+        help="Benchmark /translate_batch body serialization (JSON, orjson, MessagePack, gzip/zstd) instead of a model"
+    )
+    parser.add_argument(
+        "--logging",
+        action="store_true",
+        help="Benchmark the per-request cost of print() vs queued logging (log lines go to stderr)"
+    )
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        help="Benchmark live-caption updates of a service model (--model, e.g. opus): re-translation vs prefix reuse"
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Benchmark time to first chunk of streamed translation vs blocking translation of a service model (--model)"
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=20000,
+        help="Number of requests for the logging benchmark (default: 20000)"
+    )
+    parser.add_argument(
+        "--lines",
+        type=int,
+        default=2000,
+        help="Number of lines for the serialization benchmark (default: 2000)"
+    )
+    parser.add_argument(
+        "--file",
+        help="Subtitle/text file for the serialization benchmark (default: synthetic lines)"
+    )
     
     args = parser.parse_args()
     
-    base_path = "./models"
-    if not os.path.exists(base_path):
+    if args.serialization:
+        results = benchmark_serialization(args.lines, args.file)
+        print_serialization_results(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        sys.exit(0)
+    
+    if args.logging:
+        results = benchmark_logging(args.requests)
+        print_logging_results(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        sys.exit(0)
+    
+    base_path = args.models_path or "./models"
+    if not args.models_path and not os.path.exists(base_path):
         base_path = "../../models"
     
     all_results = []
     
+    if args.live:
+        if not args.model:
+            print("Error: --live needs --model")
+            sys.exit(1)
+        results = benchmark_live(base_path, args.model)
+        print_live_results(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        sys.exit(0)
+    
+    if args.streaming:
+        if not args.model:
+            print("Error: --streaming needs --model")
+            sys.exit(1)
+        results = benchmark_streaming(base_path, args.model)
+        print_streaming_results(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        sys.exit(0)
+    
+    if args.hf_variants:
+        if not args.model:
+            print("Error: --hf-variants needs --model")
+            sys.exit(1)
+        all_results = benchmark_hf_variants(os.path.join(base_path, args.model), args.model,
+                                            args.modes.split(","), args.latency_iterations,
+                                            args.throughput_iterations)
+        print_variant_results(all_results)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(all_results, f, indent=2)
+            print(f"\nResults saved to: {args.output}")
+        sys.exit(0)
+    
     if args.all_models:
         # Find all available models
         models = [d for d in os.listdir(base_path) if os.path.isdir(os.path.join(base_path, d))]
@@ -1,45 +1,131 @@
 import os
 import argparse
+import hashlib
 import ctranslate2
 import transformers
 import time
 import json
+from artifact_store import ArtifactStore, auto_ingest, hash_file
 
-def convert_model(model_id, quantization="int8", force=False, validate=False):
+METADATA_FILE = "conversion_metadata.json"
+CONVERSION_FORMAT = 1  # Bump when the conversion steps change to rebuild every model
+
+def model_paths(model_id, base_models_path=None):
+    """
+    (model_dir, input_dir, output_dir) for a model. input_dir is the nested
+    final_model directory when there is one. Rebuilds model_dir from the
+    artifact store if it has a manifest.
+    base_models_path defaults to ./models (or ../../models, ../../../models).
+    """
+    if base_models_path is None:
+        base_models_path = "./models"
+        # Check alternate paths just like main.py
+        if not os.path.exists(base_models_path):
+            if os.path.exists("../../models"):
+                 base_models_path = "../../models"
+            elif os.path.exists("../../../models"):
+                 base_models_path = "../../../models"
+    
+    model_dir = os.path.join(base_models_path, model_id)
+    output_dir = os.path.join(base_models_path, f"{model_id}_ct2")
+    ArtifactStore().resolve(model_dir)
+    
+    input_dir = model_dir
+    nested_path = os.path.join(input_dir, "final_model")
+    if os.path.exists(nested_path) and os.path.isdir(nested_path):
+        input_dir = nested_path
+    return model_dir, input_dir, output_dir
+
+def conversion_settings(quantization):
+    """Everything besides the source files that determines the converted model."""
+    return {
+        "quantization": quantization,
+        "ctranslate2_version": ctranslate2.__version__,
+        "format": CONVERSION_FORMAT
+    }
+
+def hash_model_dir(path, previous=None):
+    """
+    Content hash of a model directory. Returns (digest, files) where files maps
+    relative paths to size, mtime and SHA-256. Files whose size and mtime match
+    previous (the files of an earlier call) reuse its digest instead of being read.
+    """
+    previous = previous or {}
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.startswith("."):
+                continue
+            full_path = os.path.join(dirpath, filename)
+            rel_path = os.path.relpath(full_path, path).replace(os.sep, "/")
+            st = os.stat(full_path)
+            cached = previous.get(rel_path)
+            if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+                digest = cached["sha256"]
+            else:
+                digest = hash_file(full_path)
+            files[rel_path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+    h = hashlib.sha256()
+    for rel_path in sorted(files):
+        h.update(f"{rel_path}\0{files[rel_path]['sha256']}\n".encode("utf-8"))
+    return h.hexdigest(), files
+
+def read_metadata(output_dir):
+    try:
+        with open(os.path.join(output_dir, METADATA_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def needs_conversion(model_id, quantization, base_models_path=None):
+    """
+    Whether model_id has to be (re)converted. Returns (bool, reason).
+    A conversion is up to date when the source files and the conversion
+    settings hash to what its metadata recorded.
+    """
+    model_dir, input_dir, output_dir = model_paths(model_id, base_models_path)
+    if not os.path.exists(input_dir):
+        return True, "source missing"
+    if not os.path.exists(os.path.join(output_dir, "model.bin")):
+        return True, "not converted"
+    metadata = read_metadata(output_dir)
+    if "source_hash" not in metadata:
+        return True, "no source hash (converted by an older version)"
+    if metadata.get("conversion_settings") != conversion_settings(quantization):
+        return True, "conversion settings changed"
+    digest, _ = hash_model_dir(input_dir, metadata.get("source_files"))
+    if digest != metadata["source_hash"]:
+        return True, "source changed"
+    return False, "up to date"
+
+def convert_model(model_id, quantization="int8", force=False, validate=False, base_models_path=None):
     """
     Converts a HuggingFace model to CTranslate2 format with enhanced options.
     
     Args:
         model_id: Model folder name
         quantization: Quantization type (int8, int8_float16, float16, int16)
-        force: Overwrite existing output
+        force: Reconvert even if the existing output is up to date
         validate: Run validation after conversion
+        base_models_path: Directory holding the models (default: see model_paths)
     """
-    base_models_path = "./models"
-    
-    # Check alternate paths just like main.py
-    if not os.path.exists(base_models_path):
-        if os.path.exists("../../models"):
-             base_models_path = "../../models"
-        elif os.path.exists("../../../models"):
-             base_models_path = "../../../models"
-    
-    input_dir = os.path.join(base_models_path, model_id)
-    output_dir = os.path.join(base_models_path, f"{model_id}_ct2")
+    model_dir, input_dir, output_dir = model_paths(model_id, base_models_path)
+    store = ArtifactStore()
     
     if not os.path.exists(input_dir):
         print(f"Error: Input model {model_id} not found at {input_dir}")
         return False
         
     if os.path.exists(output_dir) and not force:
-        print(f"Output directory {output_dir} already exists. Use --force to overwrite.")
-        return True
+        convert, reason = needs_conversion(model_id, quantization, base_models_path)
+        if not convert:
+            print(f"{output_dir} is up to date (source and settings unchanged). Use --force to reconvert.")
+            return True
+        print(f"Reconverting {model_id}: {reason}")
 
-    # Check for nested 'final_model' directory
-    nested_path = os.path.join(input_dir, "final_model")
-    if os.path.exists(nested_path) and os.path.isdir(nested_path):
-        print(f"Found nested 'final_model' directory. Using {nested_path}")
-        input_dir = nested_path
+    if input_dir != model_dir:
+        print(f"Found nested 'final_model' directory. Using {input_dir}")
 
     print(f"\n{'='*60}")
     print(f"Converting {model_id}")
@@ -84,6 +170,8 @@ def convert_model(model_id, quantization="int8", force=False, validate=False):
                     config.forced_bos_token_id = vi_token_id
                     
                     # Save modified config to input directory temporarily
+                    # (detach it first: stored files are shared hard links)
+                    store.detach(os.path.join(input_dir, "config.json"))
                     config.save_pretrained(input_dir)
                 else:
                     print("Warning: Could not find vi_VN token in tokenizer vocabulary")
@@ -114,7 +202,15 @@ def convert_model(model_id, quantization="int8", force=False, validate=False):
         print(f"  Converted: {converted_size / (1024**2):.2f} MB")
         print(f"  Compression: {compression_ratio:.2f}x")
         
+        # Deduplicate against the source (vocab.json, *.spm, tokenizer configs are identical);
+        # the source files stay writable for the next training run
+        try:
+            auto_ingest(model_dir, link_in_place=False, store=store)
+        except Exception as e:
+            print(f"Warning: Could not add {model_id} to artifact store: {e}")
+        
         # Save conversion metadata
+        source_hash, source_files = hash_model_dir(input_dir)
         metadata = {
             "model_id": model_id,
             "quantization": quantization,
@@ -122,13 +218,23 @@ def convert_model(model_id, quantization="int8", force=False, validate=False):
             "original_size_mb": original_size / (1024**2),
             "converted_size_mb": converted_size / (1024**2),
             "compression_ratio": compression_ratio,
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "source_hash": source_hash,
+            "conversion_settings": conversion_settings(quantization),
+            "source_files": source_files
         }
         
-        metadata_path = os.path.join(output_dir, "conversion_metadata.json")
+        metadata_path = os.path.join(output_dir, METADATA_FILE)
         with open(metadata_path, 'w') as f:
             json.dump(metadata, f, indent=2)
         
+        try:
+            if auto_ingest(output_dir, store=store):
+                stats = store.stats()
+                print(f"Artifact store: {stats['stored_mb']:.2f} MB stored, {stats['saved_mb']:.2f} MB saved by deduplication")
+        except Exception as e:
+            print(f"Warning: Could not add {model_id} to artifact store: {e}")
+        
         # Validate if requested
         if validate:
             print("\nRunning validation...")
@@ -220,7 +326,7 @@ if __name__ == "__main__":
     parser.add_argument(
         "--force", 
         action="store_true", 
-        help="Overwrite existing output path"
+        help="Reconvert even if the existing output is up to date"
     )
     parser.add_argument(
         "--validate", 
@@ -0,0 +1,84 @@
+"""
+Output checks for greedy-first decoding.
+
+Beam search mostly reproduces the greedy output on short subtitle lines, so
+lines are decoded greedily first and only suspect outputs are decoded again
+with beam search. suspect_reason() names why an output needs the retry, or
+returns None when the greedy output is kept.
+"""
+
+import re
+from collections import Counter
+from typing import Optional
+
+REASON_ENGLISH = "english"
+REASON_REPETITION = "repetition"
+REASON_LOW_SCORE = "low_score"
+REASON_TRUNCATED = "truncated"
+
+MIN_OUTPUT_RATIO = 0.5  # Vietnamese output is normally 2-4x longer than the Chinese source
+MIN_CHECKED_LENGTH = 4  # Sources shorter than this are not checked for truncation
+
+WORD = re.compile(r"\w+")
+LETTERS = re.compile(r"[^\W\d_]+")
+# Initial consonant, one to three vowels and a final consonant, all without diacritics
+VIETNAMESE_SYLLABLE = re.compile(r"^(ngh|ng|gh|gi|kh|nh|ph|qu|th|tr|ch|[bcdghklmnprstvx])?[aeiouy]{1,3}(ch|ng|nh|[cmnpt])?$")
+# English words that are also valid Vietnamese syllables in form
+ENGLISH_LOOKALIKES = {"the", "that", "you", "it", "at", "be", "he", "she", "we", "they", "do", "go", "my", "by", "hi"}
+
+
+def is_english_word(word: str) -> bool:
+    """ASCII word that can't be a Vietnamese syllable written without diacritics, or a common English look-alike."""
+    word = word.lower()
+    if not word.isascii():
+        return False
+    return word in ENGLISH_LOOKALIKES or not VIETNAMESE_SYLLABLE.match(word)
+
+
+def contains_english(text):
+    """
+    Heuristic check for significant English content in Vietnamese text.
+    Returns True if more than 30% of the words are English: Vietnamese words
+    without diacritics ("anh", "em", "xin") are plain ASCII too, so words are
+    checked against the shape of a Vietnamese syllable rather than by script.
+    """
+    if not text:
+        return False
+
+    words = LETTERS.findall(text)
+    if not words:
+        return False
+
+    english = sum(1 for w in words if is_english_word(w))
+    return english / len(words) > 0.3
+
+
+def has_repetition(text: str, max_run: int = 3, max_ngram_count: int = 3) -> bool:
+    """Same word repeated max_run times in a row, or a word trigram occurring max_ngram_count times."""
+    words = [w.lower() for w in WORD.findall(text)]
+    run = 1
+    for previous, word in zip(words, words[1:]):
+        run = run + 1 if word == previous else 1
+        if run >= max_run:
+            return True
+    trigrams = Counter(zip(words, words[1:], words[2:]))
+    return bool(trigrams) and max(trigrams.values()) >= max_ngram_count
+
+
+def suspect_reason(source: str, output: str, score: Optional[float], min_score: float) -> Optional[str]:
+    """
+    Args:
+        source: Source line
+        output: Greedy translation
+        score: Length-normalized log probability of the output (None if unknown)
+        min_score: Outputs scoring below this are retried
+    """
+    if contains_english(output) and not contains_english(source):
+        return REASON_ENGLISH
+    if has_repetition(output):
+        return REASON_REPETITION
+    if score is not None and score < min_score:
+        return REASON_LOW_SCORE
+    if len(source) >= MIN_CHECKED_LENGTH and len(output.strip()) < MIN_OUTPUT_RATIO * len(source):
+        return REASON_TRUNCATED
+    return None
@@ -0,0 +1,324 @@
+"""
+Export a HuggingFace model to ONNX for the ONNX Runtime backend (onnx_backend.py).
+
+Writes models/<model_id>_onnx/ with three graphs:
+  encoder_model.onnx             input_ids, attention_mask -> last_hidden_state
+  decoder_model.onnx             first decoder step -> logits + self/cross KV cache
+  decoder_with_past_model.onnx   later steps: reads the KV cache, returns logits + new self KV
+plus the tokenizer files and onnx_metadata.json (special tokens and generation
+defaults). Intended for models CTranslate2 handles badly, such as mBART.
+
+Usage:
+  python export_onnx.py --model_id mbart --validate
+  python export_onnx.py --model_id nllb --quantization none --force
+"""
+
+import os
+import time
+import json
+import shutil
+import argparse
+
+import torch
+from artifact_store import ArtifactStore, auto_ingest
+from onnx_backend import (ENCODER_FILE, DECODER_FILE, DECODER_WITH_PAST_FILE, METADATA_FILE,
+                          cache_names)
+from convert import get_dir_size, model_paths
+
+OPSET = 17
+TOKENIZER_FILES = [
+    "tokenizer.json",
+    "vocab.json",
+    "source.spm",
+    "target.spm",
+    "tokenizer_config.json",
+    "special_tokens_map.json",
+    "sentencepiece.bpe.model",
+    "config.json",
+    "generation_config.json"
+]
+
+
+class EncoderGraph(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model.get_encoder()(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+
+class DecoderGraph(torch.nn.Module):
+    """First decoder step: returns the logits of the last position and the full KV cache."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, decoder_input_ids, encoder_hidden_states, encoder_attention_mask):
+        outputs = self.model(decoder_input_ids=decoder_input_ids, encoder_outputs=(encoder_hidden_states,),
+                             attention_mask=encoder_attention_mask, use_cache=True)
+        cache = outputs.past_key_values
+        tensors = []
+        for self_layer, cross_layer in zip(cache.self_attention_cache.layers, cache.cross_attention_cache.layers):
+            tensors += [self_layer.keys, self_layer.values, cross_layer.keys, cross_layer.values]
+        return (outputs.logits[:, -1, :], *tensors)
+
+
+class DecoderWithPastGraph(torch.nn.Module):
+    """Later decoder steps: the cross-attention cache replaces the encoder output."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        self.num_layers = model.config.decoder_layers
+
+    def forward(self, decoder_input_ids, encoder_attention_mask, *past):
+        from transformers.cache_utils import DynamicCache, EncoderDecoderCache
+
+        self_cache = DynamicCache(ddp_cache_data=[(past[4 * i], past[4 * i + 1]) for i in range(self.num_layers)])
+        cross_cache = DynamicCache(ddp_cache_data=[(past[4 * i + 2], past[4 * i + 3]) for i in range(self.num_layers)])
+        # Never read: cross-attention uses the cached keys/values
+        encoder_hidden_states = torch.zeros(decoder_input_ids.shape[0], encoder_attention_mask.shape[1],
+                                            self.model.config.d_model)
+        outputs = self.model(decoder_input_ids=decoder_input_ids, encoder_outputs=(encoder_hidden_states,),
+                             attention_mask=encoder_attention_mask,
+                             past_key_values=EncoderDecoderCache(self_cache, cross_cache), use_cache=True)
+        tensors = []
+        for layer in outputs.past_key_values.self_attention_cache.layers:
+            tensors += [layer.keys, layer.values]
+        return (outputs.logits[:, -1, :], *tensors)
+
+
+def cache_axes(names, self_length: str, source_length: str = "source_length") -> dict:
+    return {name: {0: "batch", 2: self_length if ".self." in name else source_length} for name in names}
+
+
+def export_graphs(model, tokenizer, output_dir: str):
+    """Trace the encoder and both decoder graphs with small sample inputs."""
+    num_layers = model.config.decoder_layers
+    sample = tokenizer(["你好，世界！", "今天天气很好。"], return_tensors="pt", padding=True)
+    start = torch.full((2, 1), model.config.decoder_start_token_id, dtype=torch.long)
+    options = {"opset_version": OPSET, "dynamo": False, "do_constant_folding": True}
+
+    with torch.no_grad():
+        encoder = EncoderGraph(model)
+        hidden = encoder(sample.input_ids, sample.attention_mask)
+        torch.onnx.export(
+            encoder, (sample.input_ids, sample.attention_mask), os.path.join(output_dir, ENCODER_FILE),
+            input_names=["input_ids", "attention_mask"], output_names=["last_hidden_state"],
+            dynamic_axes={"input_ids": {0: "batch", 1: "source_length"},
+                          "attention_mask": {0: "batch", 1: "source_length"},
+                          "last_hidden_state": {0: "batch", 1: "source_length"}},
+            **options
+        )
+
+        decoder = DecoderGraph(model)
+        first = decoder(start, hidden, sample.attention_mask)
+        present = cache_names(num_layers, "present")
+        torch.onnx.export(
+            decoder, (start, hidden, sample.attention_mask), os.path.join(output_dir, DECODER_FILE),
+            input_names=["decoder_input_ids", "encoder_hidden_states", "encoder_attention_mask"],
+            output_names=["logits"] + present,
+            dynamic_axes={"decoder_input_ids": {0: "batch"},
+                          "encoder_hidden_states": {0: "batch", 1: "source_length"},
+                          "encoder_attention_mask": {0: "batch", 1: "source_length"},
+                          "logits": {0: "batch"},
+                          **cache_axes(present, "target_length")},
+            **options
+        )
+
+        past = cache_names(num_layers, "past")
+        present_self = cache_names(num_layers, "present", cross=False)
+        torch.onnx.export(
+            DecoderWithPastGraph(model), (start, sample.attention_mask, *first[1:]),
+            os.path.join(output_dir, DECODER_WITH_PAST_FILE),
+            input_names=["decoder_input_ids", "encoder_attention_mask"] + past,
+            output_names=["logits"] + present_self,
+            dynamic_axes={"decoder_input_ids": {0: "batch"},
+                          "encoder_attention_mask": {0: "batch", 1: "source_length"},
+                          "logits": {0: "batch"},
+                          **cache_axes(past, "past_length"),
+                          **cache_axes(present_self, "target_length")},
+            **options
+        )
+
+
+def quantize_graphs(output_dir: str):
+    """Dynamic int8 quantization of the MatMul weights of each graph, in place."""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    for name in (ENCODER_FILE, DECODER_FILE, DECODER_WITH_PAST_FILE):
+        path = os.path.join(output_dir, name)
+        quantized = path + ".int8"
+        quantize_dynamic(path, quantized, weight_type=QuantType.QInt8, op_types_to_quantize=["MatMul"])
+        os.replace(quantized, path)
+
+
+def export_model(model_id, quantization="int8", force=False, validate=False):
+    """
+    Export a HuggingFace model to <model_id>_onnx.
+
+    Args:
+        model_id: Model folder name
+        quantization: int8 (dynamic MatMul quantization) or none
+        force: Overwrite existing output
+        validate: Compare greedy outputs with Transformers after export
+    """
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+    model_dir, input_dir, _ = model_paths(model_id)
+    output_dir = f"{model_dir}_onnx"
+    store = ArtifactStore()
+
+    if not os.path.exists(model_dir):
+        print(f"Error: Input model {model_id} not found at {model_dir}")
+        return False
+
+    if os.path.exists(output_dir) and not force:
+        print(f"Output directory {output_dir} already exists. Use --force to overwrite.")
+        return True
+
+    if input_dir != model_dir:
+        print(f"Found nested 'final_model' directory. Using {input_dir}")
+
+    print(f"\n{'='*60}")
+    print(f"Exporting {model_id} to ONNX")
+    print(f"  Input:  {input_dir}")
+    print(f"  Output: {output_dir}")
+    print(f"  Quantization: {quantization}")
+    print(f"{'='*60}\n")
+
+    start_time = time.time()
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(input_dir, local_files_only=True)
+        # Eager attention traces to plain MatMul/Softmax, which ONNX Runtime fuses itself
+        model = AutoModelForSeq2SeqLM.from_pretrained(input_dir, local_files_only=True,
+                                                      attn_implementation="eager").eval()
+
+        tmp_dir = output_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        export_graphs(model, tokenizer, tmp_dir)
+        if quantization == "int8":
+            print("Quantizing graphs to int8...")
+            quantize_graphs(tmp_dir)
+
+        files_to_copy = [f for f in TOKENIZER_FILES if os.path.exists(os.path.join(input_dir, f))]
+        print(f"Copying tokenizer files: {files_to_copy}")
+        for f in files_to_copy:
+            shutil.copy2(os.path.join(input_dir, f), os.path.join(tmp_dir, f))
+
+        generation_config = model.generation_config
+        forced_bos_token_id = None
+        if "mbart" in model_id.lower():
+            forced_bos_token_id = tokenizer.convert_tokens_to_ids("vi_VN")
+        suppress = sorted({tokenizer.pad_token_id} | {ids[0] for ids in (generation_config.bad_words_ids or []) if len(ids) == 1})
+        export_time = time.time() - start_time
+        metadata = {
+            "model_id": model_id,
+            "architecture": model.config.model_type,
+            "num_layers": model.config.decoder_layers,
+            "decoder_start_token_id": model.config.decoder_start_token_id,
+            "eos_token_id": model.config.eos_token_id,
+            "pad_token_id": tokenizer.pad_token_id,
+            "forced_bos_token_id": forced_bos_token_id,
+            "forced_eos_token_id": generation_config.forced_eos_token_id,
+            "suppress_token_ids": suppress,
+            "num_beams": generation_config.num_beams or 1,
+            "max_length": min(generation_config.max_length or 512, 512),
+            "quantization": quantization,
+            "opset": OPSET,
+            "export_time": export_time,
+            "original_size_mb": get_dir_size(input_dir) / (1024**2),
+            "exported_size_mb": get_dir_size(tmp_dir) / (1024**2),
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        with open(os.path.join(tmp_dir, METADATA_FILE), "w") as f:
+            json.dump(metadata, f, indent=2)
+
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.replace(tmp_dir, output_dir)
+        print(f"\n✓ Export successful in {export_time:.2f}s")
+        print(f"\nModel Size:")
+        print(f"  Original: {metadata['original_size_mb']:.2f} MB")
+        print(f"  Exported: {metadata['exported_size_mb']:.2f} MB")
+
+        try:
+            auto_ingest(model_dir, link_in_place=False, store=store)
+            auto_ingest(output_dir, store=store)
+        except Exception as e:
+            print(f"Warning: Could not add {model_id} to artifact store: {e}")
+
+        if validate:
+            print("\nRunning validation...")
+            return validate_export(output_dir, input_dir, model_id)
+        return True
+
+    except Exception as e:
+        print(f"\n✗ Export failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def validate_export(output_dir, input_dir, model_id, min_agreement=0.9):
+    """Compare greedy ONNX Runtime outputs with Transformers on the benchmark sentences."""
+    from transformers import AutoTokenizer
+    from benchmark import ModelBenchmark
+    from hf_cpu import load_cpu_model, generate_texts, agreement
+    from onnx_backend import OnnxTranslator
+
+    tokenizer = AutoTokenizer.from_pretrained(output_dir, local_files_only=True)
+    translator = OnnxTranslator(output_dir)
+    texts = ModelBenchmark.TEST_SENTENCES
+    forced_bos_token_id = translator.metadata["forced_bos_token_id"]
+
+    results = translator.translate_batch([tokenizer.encode(t) for t in texts], beam_size=1,
+                                         max_length=128, forced_bos_token_id=forced_bos_token_id)
+    outputs = [tokenizer.decode(ids, skip_special_tokens=True) for ids, _ in results]
+
+    generate_kwargs = {"max_length": 128, "num_beams": 1}
+    if forced_bos_token_id is not None:
+        generate_kwargs["forced_bos_token_id"] = forced_bos_token_id
+    reference = generate_texts(load_cpu_model(input_dir, "fp32"), tokenizer, texts, generate_kwargs)
+
+    score = agreement(reference, outputs)
+    print(f"  Test input:  {texts[0]}")
+    print(f"  Test output: {outputs[0]}")
+    if score < min_agreement:
+        print(f"✗ Validation failed: agreement with Transformers {score:.3f} < {min_agreement}")
+        return False
+    print(f"✓ Validation passed (agreement with Transformers: {score:.3f})")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export HuggingFace models to ONNX (encoder + decoder with KV cache) for ONNX Runtime"
+    )
+    parser.add_argument(
+        "--model_id",
+        required=True,
+        help="Folder name of the model in /models"
+    )
+    parser.add_argument(
+        "--quantization",
+        default="int8",
+        choices=["int8", "none"],
+        help="Quantization type (default: int8)"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Overwrite existing output path"
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Compare outputs with Transformers after export"
+    )
+
+    args = parser.parse_args()
+    success = export_model(args.model_id, args.quantization, args.force, args.validate)
+    exit(0 if success else 1)
@@ -0,0 +1,212 @@
+"""
+Per-project glossaries for names and show-specific terms.
+
+All source terms of a glossary are compiled into one Aho-Corasick automaton,
+so a line is scanned once however many terms there are (the cost grows with
+the line length and the number of matches, not with the glossary size).
+Before decoding, each matched term is replaced by a numbered placeholder
+("[0]", "[1]", ...) that the model copies through. After decoding, the
+placeholders are replaced by the glossary's target terms.
+
+Matches are leftmost-longest and never overlap, so "小明的妈妈" wins over
+"小明" when both are terms. Lines that already contain placeholder-like text
+are left unprotected. If a placeholder doesn't come back intact, restore()
+returns None and the caller translates the original line instead.
+
+Glossaries are stored as one JSON file per project in GlossaryStore's
+directory.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+PLACEHOLDER = "[{n}]"
+# The model may add spaces inside the brackets or switch to full-width ones
+PLACEHOLDER_PATTERN = re.compile(r"[\[［【]\s*(\d+)\s*[\]］】]")
+PROJECT_ID = re.compile(r"^[\w.-]{1,128}$")
+
+
+class Automaton:
+    """Aho-Corasick automaton over a fixed set of patterns."""
+
+    def __init__(self, patterns: List[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[int] = [-1]  # Index of the longest pattern ending at each state (-1: none)
+        self.lengths = [len(p) for p in patterns]
+
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(-1)
+                state = next_state
+            if pattern and (self.output[state] < 0 or len(pattern) > self.lengths[self.output[state]]):
+                self.output[state] = index
+
+        # Breadth-first: a state's failure link is the longest proper suffix that is also a prefix
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                # Inherit the longest match of the suffix state when this state has none of its own
+                if self.output[next_state] < 0:
+                    self.output[next_state] = self.output[self.fail[next_state]]
+
+    def find(self, text: str) -> List[Tuple[int, int, int]]:
+        """Leftmost-longest, non-overlapping matches as (start, end, pattern index)."""
+        candidates = []
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            index = self.output[state]
+            if index >= 0:
+                candidates.append((i + 1 - self.lengths[index], i + 1, index))
+            # Shorter patterns ending here (reachable through failure links) only matter
+            # when they start after the longest one; the selection below handles both
+            suffix = self.fail[state]
+            while suffix:
+                other = self.output[suffix]
+                if other < 0:
+                    break
+                if other != index:
+                    candidates.append((i + 1 - self.lengths[other], i + 1, other))
+                suffix = self.fail[suffix]
+        # Leftmost first, longest first among equal starts
+        candidates.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+        matches = []
+        end = 0
+        for start, stop, index in candidates:
+            if start >= end:
+                matches.append((start, stop, index))
+                end = stop
+        return matches
+
+
+class Glossary:
+    def __init__(self, entries: List[Dict[str, str]]):
+        # Later entries override earlier ones with the same source term
+        terms = {}
+        for entry in entries:
+            source = entry["source"].strip()
+            if source:
+                terms[source] = entry["target"].strip()
+        self.entries = [{"source": s, "target": t} for s, t in terms.items()]
+        # Identifies the glossary content (e.g. to keep translations made with other terms apart)
+        self.digest = hashlib.sha256(json.dumps(sorted(terms.items()), ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+        self.sources = list(terms)
+        self.targets = list(terms.values())
+        self.automaton = Automaton(self.sources)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def protect(self, text: str) -> Tuple[str, Optional[List[str]]]:
+        """
+        Replace glossary terms in text with placeholders.
+        Returns (protected text, target term per placeholder); the list is None
+        when nothing was replaced.
+        """
+        if not self.sources or PLACEHOLDER_PATTERN.search(text):
+            return text, None
+        matches = self.automaton.find(text)
+        if not matches:
+            return text, None
+        pieces = []
+        targets = []
+        position = 0
+        for start, end, index in matches:
+            pieces.append(text[position:start])
+            pieces.append(PLACEHOLDER.format(n=len(targets)))
+            targets.append(self.targets[index])
+            position = end
+        pieces.append(text[position:])
+        return "".join(pieces), targets
+
+    def protect_batch(self, texts: List[str]) -> Tuple[List[str], List[Optional[List[str]]]]:
+        protected = [self.protect(text) for text in texts]
+        return [text for text, _ in protected], [targets for _, targets in protected]
+
+    @staticmethod
+    def restore(text: str, targets: List[str]) -> Optional[str]:
+        """Put the target terms back. Returns None unless every placeholder came back exactly once."""
+        seen = []
+
+        def replace(match):
+            n = int(match.group(1))
+            if n >= len(targets):
+                return match.group(0)
+            seen.append(n)
+            return targets[n]
+
+        restored = PLACEHOLDER_PATTERN.sub(replace, text)
+        if sorted(seen) != list(range(len(targets))):
+            return None
+        return restored
+
+    @staticmethod
+    def only_placeholders(text: str) -> bool:
+        """True if a protected line has nothing left to translate (just terms and punctuation)."""
+        return not any(c.isalpha() for c in PLACEHOLDER_PATTERN.sub("", text))
+
+
+class GlossaryStore:
+    """Glossaries by project id, kept as <directory>/<project_id>.json."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._glossaries: Dict[str, Glossary] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, project_id: str) -> str:
+        if not PROJECT_ID.match(project_id):
+            raise ValueError(f"Invalid project id: {project_id!r}")
+        return os.path.join(self.directory, f"{project_id}.json")
+
+    def get(self, project_id: str) -> Optional[Glossary]:
+        path = self._path(project_id)
+        with self._lock:
+            glossary = self._glossaries.get(project_id)
+            if glossary is None and os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    glossary = Glossary(json.load(f)["entries"])
+                self._glossaries[project_id] = glossary
+            return glossary
+
+    def put(self, project_id: str, entries: List[Dict[str, str]]) -> Glossary:
+        path = self._path(project_id)
+        glossary = Glossary(entries)
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"project_id": project_id, "entries": glossary.entries}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, path)
+            self._glossaries[project_id] = glossary
+        return glossary
+
+    def delete(self, project_id: str) -> bool:
+        path = self._path(project_id)
+        with self._lock:
+            self._glossaries.pop(project_id, None)
+            if not os.path.exists(path):
+                return False
+            os.remove(path)
+            return True
@@ -0,0 +1,160 @@
+"""
+CPU variants of the Transformers path.
+
+mBART stays on Transformers (its CT2 conversion has repetition issues), so on
+CPU it is loaded in one of these modes:
+
+  fp32          Eager attention, as trained (the reference)
+  sdpa          PyTorch scaled_dot_product_attention kernels
+  int8          sdpa + dynamic int8 quantization of the Linear layers (lm_head kept in fp32)
+  int8_compile  int8 + torch.compile of the forward pass
+
+A variant is only used if its outputs agree with fp32 on a few reference
+sentences; otherwise the caller falls back to fp32. autotune.py measures the
+agreement of every mode once (check_cpu_modes()) and stores it in the tuning
+profile, so loads only run validate_cpu_mode() for models it hasn't seen.
+"""
+
+import difflib
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from transformers import AutoModelForSeq2SeqLM
+
+CPU_MODES = ("fp32", "sdpa", "int8", "int8_compile")
+DEFAULT_CPU_MODE_SPEC = "int8"  # HF_CPU_MODE when unset
+MIN_AGREEMENT = 0.9  # Mean similarity to fp32 outputs required to keep a variant
+VALIDATION_SENTENCES = [
+    "你好，世界！",
+    "今天天气很好。",
+    "我喜欢学习中文。",
+    "这是一个测试句子。",
+    "人工智能正在改变世界。",
+    "机器学习是一个非常有趣的领域。"
+]
+
+logger = logging.getLogger(__name__)
+
+
+def parse_cpu_modes(spec: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Parse an HF_CPU_MODE value: a mode for every model ("int8"), per-model
+    modes ("mbart=int8_compile,nllb=sdpa"), or both ("sdpa,mbart=int8").
+    Returns (default mode, {model_id: mode}).
+    """
+    default = "fp32"
+    per_model = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        model_id, _, mode = item.rpartition("=")
+        if mode not in CPU_MODES:
+            raise ValueError(f"Unknown CPU mode {mode!r} (expected one of: {', '.join(CPU_MODES)})")
+        if model_id:
+            per_model[model_id] = mode
+        else:
+            default = mode
+    return default, per_model
+
+
+def load_cpu_model(path: str, mode: str):
+    """Load a Transformers model from path, prepared for CPU inference in the given mode."""
+    if mode not in CPU_MODES:
+        raise ValueError(f"Unknown CPU mode {mode!r}")
+    attn_implementation = "eager" if mode == "fp32" else "sdpa"
+    try:
+        model = AutoModelForSeq2SeqLM.from_pretrained(path, local_files_only=True,
+                                                      attn_implementation=attn_implementation)
+    except (ValueError, ImportError) as e:
+        # Architectures without SDPA support keep their default attention
+        logger.warning("%s attention not available for %s: %s", attn_implementation, path, e)
+        model = AutoModelForSeq2SeqLM.from_pretrained(path, local_files_only=True)
+    model.eval()
+
+    if mode in ("int8", "int8_compile"):
+        model = quantize_linear(model)
+    if mode == "int8_compile":
+        # Compiled lazily on the first call; dynamic shapes avoid a recompile per input length
+        model.forward = torch.compile(model.forward, dynamic=True)
+    return model
+
+
+def quantize_linear(model):
+    """Dynamic int8 quantization of every Linear layer except the output projection."""
+    from torch.ao.quantization import quantize_dynamic, default_dynamic_qconfig
+
+    qconfig = {name: default_dynamic_qconfig for name, module in model.named_modules()
+               if isinstance(module, torch.nn.Linear) and name != "lm_head"}
+    return quantize_dynamic(model, qconfig, dtype=torch.qint8)
+
+
+def generate_texts(model, tokenizer, texts: List[str], generate_kwargs: Dict) -> List[str]:
+    inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=512)
+    with torch.inference_mode():
+        outputs = model.generate(**inputs, **generate_kwargs)
+    return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+
+def agreement(reference: List[str], outputs: List[str]) -> float:
+    """Mean character-level similarity (0-1) between two lists of translations."""
+    if not reference:
+        return 1.0
+    ratios = [difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(reference, outputs)]
+    return sum(ratios) / len(ratios)
+
+
+def validation_kwargs(model_id: str, tokenizer) -> Dict:
+    """Greedy generate() arguments the variants are compared with."""
+    generate_kwargs = {"max_length": 128, "num_beams": 1}
+    if "mbart" in model_id.lower():
+        generate_kwargs["forced_bos_token_id"] = tokenizer.convert_tokens_to_ids("vi_VN")
+    return generate_kwargs
+
+
+def check_cpu_modes(path: str, modes: List[str], tokenizer, generate_kwargs: Dict,
+                    texts: Optional[List[str]] = None) -> Dict[str, Optional[float]]:
+    """Agreement with fp32 of each mode's outputs on texts (None when the variant fails)."""
+    texts = texts or VALIDATION_SENTENCES
+    reference_model = load_cpu_model(path, "fp32")
+    reference = generate_texts(reference_model, tokenizer, texts, generate_kwargs)
+    del reference_model
+
+    scores = {}
+    for mode in modes:
+        if mode == "fp32":
+            continue
+        try:
+            model = load_cpu_model(path, mode)
+            scores[mode] = agreement(reference, generate_texts(model, tokenizer, texts, generate_kwargs))
+            del model
+        except Exception as e:
+            logger.warning("CPU mode %s failed for %s: %s", mode, path, e)
+            scores[mode] = None
+    return scores
+
+
+def validate_cpu_mode(path: str, mode: str, tokenizer, generate_kwargs: Dict,
+                      texts: Optional[List[str]] = None, min_agreement: float = MIN_AGREEMENT):
+    """
+    Load the mode's variant and compare its outputs with fp32 on texts.
+    Returns (model, agreement); model is None when the variant fails or disagrees.
+    """
+    texts = texts or VALIDATION_SENTENCES
+    reference_model = load_cpu_model(path, "fp32")
+    reference = generate_texts(reference_model, tokenizer, texts, generate_kwargs)
+    del reference_model
+
+    try:
+        model = load_cpu_model(path, mode)
+        outputs = generate_texts(model, tokenizer, texts, generate_kwargs)  # Also triggers torch.compile
+    except Exception as e:
+        logger.warning("CPU mode %s failed for %s: %s", mode, path, e)
+        return None, None
+
+    score = agreement(reference, outputs)
+    if score < min_agreement:
+        logger.warning("CPU mode %s disagrees with fp32 for %s (agreement %.3f < %s)", mode, path, score, min_agreement)
+        return None, score
+    return model, score
@@ -0,0 +1,252 @@
+"""
+Durable translation job queue backed by SQLite.
+
+Jobs are split into fixed-size chunks when submitted. Each chunk is
+checkpointed as soon as it is translated, so a job interrupted by a service
+restart resumes from the first unfinished chunk instead of starting over.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+TERMINAL_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+# Chunk states
+CHUNK_PENDING = "pending"
+CHUNK_RUNNING = "running"
+CHUNK_DONE = "done"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    model_id TEXT,
+    status TEXT NOT NULL,
+    total_lines INTEGER NOT NULL,
+    total_chunks INTEGER NOT NULL,
+    done_chunks INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    line_count INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    result TEXT,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_status ON chunks (status);
+"""
+
+
+class JobStore:
+    def __init__(self, db_path: str, chunk_size: int = 32):
+        """Open (or create) the job database and requeue interrupted work."""
+        self.db_path = db_path
+        self.chunk_size = max(1, chunk_size)
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            # Anything marked running belonged to a previous process: requeue it
+            self._conn.execute(
+                "UPDATE chunks SET status = ? WHERE status = ?",
+                (CHUNK_PENDING, CHUNK_RUNNING)
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = ? WHERE status = ?",
+                (JOB_QUEUED, JOB_RUNNING)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def submit(self, texts: List[str], model_id: Optional[str] = None) -> Dict:
+        """Create a job and split its lines into pending chunks."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+        status = JOB_QUEUED if chunks else JOB_COMPLETED
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, model_id, status, total_lines, total_chunks, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, model_id, status, len(texts), len(chunks), now, now)
+            )
+            self._conn.executemany(
+                "INSERT INTO chunks (job_id, idx, status, line_count, source) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (job_id, i, CHUNK_PENDING, len(chunk), json.dumps(chunk, ensure_ascii=False))
+                    for i, chunk in enumerate(chunks)
+                ]
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return the job's status record, or None if it does not exist."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["progress"] = round(job["done_chunks"] / job["total_chunks"], 4) if job["total_chunks"] else 1.0
+        return job
+
+    def results(self, job_id: str) -> List[str]:
+        """Concatenate the translated chunks of a job in order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT result FROM chunks WHERE job_id = ? ORDER BY idx", (job_id,)
+            ).fetchall()
+        translated = []
+        for row in rows:
+            translated.extend(json.loads(row["result"]) if row["result"] else [])
+        return translated
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not finished yet. Returns False if it already ended."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+                (JOB_CANCELLED, time.time(), job_id, JOB_QUEUED, JOB_RUNNING)
+            )
+            if cur.rowcount:
+                self._conn.execute(
+                    "DELETE FROM chunks WHERE job_id = ? AND status != ?", (job_id, CHUNK_DONE)
+                )
+            return cur.rowcount > 0
+
+    def queued_models(self) -> List[Optional[str]]:
+        """Models that have pending chunks."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT j.model_id FROM chunks c JOIN jobs j ON j.id = c.job_id "
+                "WHERE c.status = ? AND j.status IN (?, ?)",
+                (CHUNK_PENDING, JOB_QUEUED, JOB_RUNNING)
+            ).fetchall()
+        return [row["model_id"] for row in rows]
+
+    def claim(self, max_lines: int, prefer: Optional[List[str]] = None, max_delay: float = 0.0) -> Optional[Dict]:
+        """
+        Claim pending chunks for the oldest queued job's model.
+
+        Chunks from several jobs that target the same model are claimed
+        together (up to max_lines) so the worker always decodes full batches,
+        even when individual jobs are small.
+
+        prefer lists models that are cheap to switch to (e.g. already loaded).
+        Their jobs are claimed ahead of older jobs for other models, as long as
+        the oldest of those was created less than max_delay seconds ago.
+
+        Returns {"model_id": ..., "chunks": [{"job_id", "idx", "source"}, ...]}
+        or None when there is nothing to do.
+        """
+        with self._lock, self._conn:
+            head = self._conn.execute(
+                "SELECT j.model_id, j.created_at FROM chunks c JOIN jobs j ON j.id = c.job_id "
+                "WHERE c.status = ? AND j.status IN (?, ?) "
+                "ORDER BY j.created_at, c.idx LIMIT 1",
+                (CHUNK_PENDING, JOB_QUEUED, JOB_RUNNING)
+            ).fetchone()
+            if head is None:
+                return None
+
+            model_id = head["model_id"]
+            prefer = [m for m in (prefer or []) if m is not None]
+            if prefer and model_id not in prefer and time.time() - head["created_at"] < max_delay:
+                preferred = self._conn.execute(
+                    "SELECT j.model_id FROM chunks c JOIN jobs j ON j.id = c.job_id "
+                    "WHERE c.status = ? AND j.status IN (?, ?) AND j.model_id IN (%s) "
+                    "ORDER BY j.created_at, c.idx LIMIT 1" % ",".join("?" * len(prefer)),
+                    (CHUNK_PENDING, JOB_QUEUED, JOB_RUNNING, *prefer)
+                ).fetchone()
+                if preferred is not None:
+                    model_id = preferred["model_id"]
+            rows = self._conn.execute(
+                "SELECT c.job_id, c.idx, c.source FROM chunks c JOIN jobs j ON j.id = c.job_id "
+                "WHERE c.status = ? AND j.status IN (?, ?) AND j.model_id IS ? "
+                "ORDER BY j.created_at, c.idx",
+                (CHUNK_PENDING, JOB_QUEUED, JOB_RUNNING, model_id)
+            ).fetchall()
+
+            claimed = []
+            line_count = 0
+            for row in rows:
+                source = json.loads(row["source"])
+                if claimed and line_count + len(source) > max_lines:
+                    break
+                claimed.append({"job_id": row["job_id"], "idx": row["idx"], "source": source})
+                line_count += len(source)
+
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE chunks SET status = ? WHERE job_id = ? AND idx = ?",
+                [(CHUNK_RUNNING, c["job_id"], c["idx"]) for c in claimed]
+            )
+            self._conn.executemany(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                [(JOB_RUNNING, now, job_id, JOB_QUEUED) for job_id in {c["job_id"] for c in claimed}]
+            )
+        return {"model_id": model_id, "chunks": claimed}
+
+    def complete_chunk(self, job_id: str, idx: int, translated: List[str]):
+        """Checkpoint a translated chunk and finish the job if it was the last one."""
+        now = time.time()
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE chunks SET status = ?, result = ? WHERE job_id = ? AND idx = ? AND status = ?",
+                (CHUNK_DONE, json.dumps(translated, ensure_ascii=False), job_id, idx, CHUNK_RUNNING)
+            )
+            if not cur.rowcount:
+                # Job was cancelled while this chunk was being decoded
+                return
+            self._conn.execute(
+                "UPDATE jobs SET done_chunks = done_chunks + 1, updated_at = ? WHERE id = ?",
+                (now, job_id)
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = ? WHERE id = ? AND status = ? AND done_chunks >= total_chunks",
+                (JOB_COMPLETED, job_id, JOB_RUNNING)
+            )
+
+    def fail(self, job_id: str, error: str):
+        """Mark a job as failed and drop its unfinished chunks."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ? AND status NOT IN (?, ?, ?)",
+                (JOB_FAILED, error, time.time(), job_id, *TERMINAL_STATES)
+            )
+            self._conn.execute(
+                "DELETE FROM chunks WHERE job_id = ? AND status != ?", (job_id, CHUNK_DONE)
+            )
+
+    def pending_lines(self) -> int:
+        """Number of source lines still waiting to be translated."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(line_count), 0) AS n FROM chunks WHERE status IN (?, ?)",
+                (CHUNK_PENDING, CHUNK_RUNNING)
+            ).fetchone()
+        return row["n"]
@@ -0,0 +1,129 @@
+"""
+Incremental translation of live-caption lines.
+
+Speech recognition upstream sends a caption line as a growing prefix of the
+same sentence ("今天" -> "今天天气" -> "今天天气很好。"). A LiveSession keeps
+the target tokens of its last translation. The next update forces them, minus
+the last mask_tokens (the ones most likely to change as the sentence goes
+on), as the decoder prefix, so only the tail is decoded again.
+
+The reusable prefix is only valid while the new source extends the source it
+was decoded from. Each partial translation leaves a checkpoint (source length,
+reusable tokens). When recognition revises earlier words, the checkpoints past
+the first changed character are dropped and the prefix of the last remaining
+one is reused, or none at all.
+
+Updates of a session are decoded one at a time. An update that a newer one
+replaced while it waited is answered with the current translation instead of
+being decoded, so a burst of updates costs one decode, whatever the model's
+speed.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    for i in range(n):
+        if a[i] != b[i]:
+            return i
+    return n
+
+
+class LiveSession:
+    def __init__(self, session_id: str, model_id: str, project_id: Optional[str] = None, mask_tokens: int = 3):
+        self.session_id = session_id
+        self.model_id = model_id
+        self.project_id = project_id
+        self.mask_tokens = mask_tokens
+        self.lock = asyncio.Lock()  # Held while an update is decoded
+        self.source = ""  # Source of the current translation
+        self.translation = ""
+        self.tokens: List[str] = []  # Target tokens of the current translation
+        self.checkpoints: List[Tuple[int, int]] = []  # (source chars, reusable tokens), oldest first
+        self.updates = 0  # Updates received (the last one is the only one worth decoding)
+        self.last_used = time.time()
+
+    def submit(self) -> int:
+        """Register an incoming update; returns its number."""
+        self.updates += 1
+        self.last_used = time.time()
+        return self.updates
+
+    def superseded(self, update: int) -> bool:
+        """Whether a newer update arrived after this one."""
+        return update < self.updates
+
+    def reusable_prefix(self, source: str) -> List[str]:
+        """Target tokens still valid for source, to force as the decoder prefix."""
+        common = common_prefix_length(self.source, source)
+        # Checkpoint sources are prefixes of self.source: drop the ones source doesn't extend
+        while self.checkpoints and self.checkpoints[-1][0] > common:
+            self.checkpoints.pop()
+        return self.tokens[:self.checkpoints[-1][1]] if self.checkpoints else []
+
+    def record(self, source: str, translation: str, tokens: List[str], prefix_length: int):
+        """Store a partial translation decoded with the first prefix_length tokens forced."""
+        # Only the forced prefix is shared with the previous tokens
+        self.checkpoints = [(chars, min(reusable, prefix_length)) for chars, reusable in self.checkpoints]
+        self.checkpoints.append((len(source), max(prefix_length, len(tokens) - self.mask_tokens)))
+        self.source, self.translation, self.tokens = source, translation, tokens
+
+    def reset(self):
+        """Start the next line (after a final update)."""
+        self.source, self.translation, self.tokens = "", "", []
+        self.checkpoints = []
+
+    def describe(self) -> Dict:
+        return {
+            "session_id": self.session_id,
+            "model_id": self.model_id,
+            "project_id": self.project_id,
+            "source_text": self.source,
+            "translated_text": self.translation,
+            "idle_s": round(time.time() - self.last_used, 1)
+        }
+
+
+class LiveSessionStore:
+    """Open sessions, closed after ttl seconds without updates (the oldest is closed when full)."""
+
+    def __init__(self, ttl: float = 300, max_sessions: int = 256, mask_tokens: int = 3):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.mask_tokens = mask_tokens
+        self._sessions: "OrderedDict[str, LiveSession]" = OrderedDict()  # Least recently used first
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self, model_id: str, project_id: Optional[str] = None) -> LiveSession:
+        self.expire()
+        while len(self._sessions) >= self.max_sessions:
+            self._sessions.popitem(last=False)
+        session = LiveSession(uuid.uuid4().hex, model_id, project_id, self.mask_tokens)
+        self._sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[LiveSession]:
+        session = self._sessions.get(session_id)
+        if session is None or time.time() - session.last_used > self.ttl:
+            self._sessions.pop(session_id, None)
+            return None
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def expire(self) -> int:
+        """Close idle sessions; returns how many were closed."""
+        now = time.time()
+        idle = [sid for sid, s in self._sessions.items() if now - s.last_used > self.ttl]
+        for sid in idle:
+            del self._sessions[sid]
+        return len(idle)
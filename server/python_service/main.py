@@ -1,6 +1,7 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, StoppingCriteriaList
 import torch
 import ctranslate2
 from fastapi.middleware.cors import CORSMiddleware
@@ -8,11 +9,40 @@ import os
 import glob
 import time
 import psutil
-from typing import Optional
+from typing import Optional, Union
 import asyncio
-from collections import deque
+import functools
+import gc
+import json
+import logging
+import threading
+from collections import Counter, deque
+from job_queue import JobStore, TERMINAL_STATES, JOB_COMPLETED
+from admission import AdmissionController, CancellableBatch, Overloaded, DeadlineExceeded, estimate_tokens
+from model_state import LoadedModel
+from shadow import ShadowEvaluator
+from artifact_store import ArtifactStore
+from autotune import load_profile, model_settings, save_profile, DEFAULT_PROFILE_PATH
+from hf_cpu import parse_cpu_modes, load_cpu_model, validate_cpu_mode, validation_kwargs, MIN_AGREEMENT, DEFAULT_CPU_MODE_SPEC
+from onnx_backend import OnnxTranslator, is_onnx_model
+from model_catalog import ModelCatalog, dir_signature
+from segmenter import needs_segmentation, segment_texts, reassemble, group
+from prefilter import prefilter, merge, KIND_MODEL, PUNCTUATION
+from glossary import Glossary, GlossaryStore
+from translation_memory import TranslationMemory
+from live_captions import LiveSessionStore
+from streaming import TextDeltas, TokenStreamer, StopOnEvent, LatencyStats
+from decoding import contains_english, suspect_reason
+from transport import decode_body, encode_body, compress, available_formats, UnsupportedMediaType
+from service_logging import setup_logging, log_tokens, request_context, RequestContextMiddleware
+
+# Leveled logging through a queue, written by a background thread (LOG_LEVEL, LOG_FORMAT,
+# LOG_SAMPLE_RATE, LOG_TOKENS; see service_logging.py)
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
+app.add_middleware(RequestContextMiddleware)
 
 # Allow CORS for frontend
 app.add_middleware(
@@ -26,119 +56,403 @@ app.add_middleware(
 class TranslationRequest(BaseModel):
     text: str
     model_id: str = None  # Optional, if None uses current loaded model
+    deadline_ms: Optional[int] = None  # Drop the request if it can't start within this time
+    project_id: Optional[str] = None  # Enforce this project's glossary (see /glossaries)
 
 class BatchTranslationRequest(BaseModel):
     texts: list[str]
     model_id: str = None
+    deadline_ms: Optional[int] = None
+    cascade: bool = False  # Fast model first, heavy model for low-confidence lines (ignores model_id)
+    cascade_min_score: Optional[float] = None  # Default CASCADE_MIN_SCORE
+    project_id: Optional[str] = None  # Enforce this project's glossary (see /glossaries)
+    memory: bool = True  # Reuse translation-memory matches scoring at least TM_AUTO_ACCEPT
+
+class LibreTranslateRequest(BaseModel):
+    q: Union[str, list[str]]  # One line or a whole chunk
+    source: str = "auto"
+    target: str = "vi"
+    format: str = "text"
+    api_key: Optional[str] = None  # Accepted for compatibility, not checked
+
+class GlossaryEntry(BaseModel):
+    source: str  # Term as it appears in the source text
+    target: str  # Translation to use every time
+
+class GlossaryRequest(BaseModel):
+    entries: list[GlossaryEntry]
+
+class MemoryLookupRequest(BaseModel):
+    texts: list[str]
+    model_id: str = None  # Default: the currently loaded model
+    project_id: Optional[str] = None
+    min_score: Optional[float] = None  # Default TM_MIN_SCORE
+
+class MemoryEntriesRequest(BaseModel):
+    entries: list[GlossaryEntry]  # Approved source/target pairs
+    model_id: str = None
+    project_id: Optional[str] = None
+
+class LiveSessionRequest(BaseModel):
+    model_id: str = None  # Pinned for the session; defaults to the currently loaded model
+    project_id: Optional[str] = None  # Glossary applied to final updates
+
+class LiveUpdateRequest(BaseModel):
+    text: str  # The whole caption line so far
+    final: bool = False  # Line is complete: translate it in full and start the next one
+    deadline_ms: Optional[int] = None
 
 class VersionRequest(BaseModel):
     version: str
 
+class ShadowRequest(BaseModel):
+    candidate: str  # Folder in versions/ (e.g. "v2.0") or a model id in models/
+    sample_rate: float = None  # Fraction of requests to mirror (default SHADOW_SAMPLE_RATE)
+
+class JobRequest(BaseModel):
+    texts: list[str]
+    model_id: str = None  # Pinned at submission; defaults to the currently loaded model
+
 # models are now in specific folder
 # Base path relative to this script
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-BASE_MODELS_PATH = os.path.join(SCRIPT_DIR, "models")
+# (MODELS_PATH points the service at other models, e.g. the fixtures of make_fixtures.py)
+BASE_MODELS_PATH = os.environ.get("MODELS_PATH", os.path.join(SCRIPT_DIR, "models"))
+VERSIONS_PATH = os.environ.get("VERSIONS_PATH", os.path.join(SCRIPT_DIR, "versions"))
 
 # CPU Optimization Settings
 CPU_THREADS = os.cpu_count() or 4  # Use all available CPU cores
 INTER_THREADS = max(1, CPU_THREADS // 2)  # Threads for inter-op parallelism
 INTRA_THREADS = max(1, CPU_THREADS // 2)  # Threads for intra-op parallelism
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_BATCH_TYPE = "tokens"
+
+# Per-model threads and batch sizes measured by autotune.py override the defaults above
+TUNING_PROFILE_PATH = DEFAULT_PROFILE_PATH
+
+# Index of models/ and versions/ with backends, sizes and measured load costs (model_catalog.py)
+MODEL_CATALOG_PATH = os.environ.get("MODEL_CATALOG_PATH", os.path.join(SCRIPT_DIR, "model_catalog.json"))
+
+# Background job settings
+JOB_DB_PATH = os.environ.get("JOB_DB_PATH", os.path.join(SCRIPT_DIR, "jobs.db"))
+JOB_CHUNK_SIZE = 32  # Lines per checkpointed chunk (same as the editor's batch size)
+JOB_BATCH_LINES = 64  # Max lines the worker decodes in one call, across jobs
+JOB_EVENT_INTERVAL = 0.5  # Seconds between status polls in the event stream
+MAX_PENDING_JOB_LINES = int(os.environ.get("MAX_PENDING_JOB_LINES", "200000"))
+# Jobs for models that are cheap to switch to (pooled, or a cold load + warm-up under JOB_CHEAP_SWITCH_S)
+# run ahead of older jobs for other models, which wait at most JOB_MAX_REORDER_S longer than in FIFO order
+JOB_CHEAP_SWITCH_S = float(os.environ.get("JOB_CHEAP_SWITCH_S", "1.0"))
+JOB_MAX_REORDER_S = float(os.environ.get("JOB_MAX_REORDER_S", "30"))
+
+# Admission control: bound queued work so overload is rejected early (429)
+MAX_QUEUE_DEPTH = int(os.environ.get("MAX_QUEUE_DEPTH", "64"))  # Requests waiting or decoding
+MAX_INFLIGHT_TOKENS = int(os.environ.get("MAX_INFLIGHT_TOKENS", "50000"))  # Estimated tokens admitted at once
+MAX_CONCURRENT_DECODES = int(os.environ.get("MAX_CONCURRENT_DECODES", str(INTER_THREADS)))
+DEFAULT_DEADLINE_MS = int(os.environ.get("DEFAULT_DEADLINE_MS", "0"))  # 0 = no deadline
+
+# Client disconnect handling for /translate_batch: lines are decoded one model batch (max_batch_size)
+# at a time and cancellation takes effect between batches
+DISCONNECT_POLL_INTERVAL = 0.1  # Seconds between disconnect checks
+
+# Shadow evaluation of a candidate model (off unless SHADOW_MODEL is set or /shadow is called)
+SHADOW_MODEL = os.environ.get("SHADOW_MODEL")
+SHADOW_SAMPLE_RATE = float(os.environ.get("SHADOW_SAMPLE_RATE", "0.1"))
+SHADOW_THREADS = 1  # Keep the candidate's CPU footprint small
+
+# Model switching
+MODEL_DRAIN_TIMEOUT = 300  # Seconds to wait for requests on a replaced model before releasing it
+WARMUP_TEXT = "你好，世界！"
+
+# Idle model parking: models unused for this long give their weights back (0 = never park,
+# and models replaced by /set_version are freed instead of kept parked)
+MODEL_IDLE_TIMEOUT = float(os.environ.get("MODEL_IDLE_TIMEOUT", "600"))
+PARK_CHECK_INTERVAL = 10  # Seconds between idle checks
+
+# LibreTranslate-compatible /translate ({"q": ...} bodies) is served by this model, kept in the pool
+LIBRE_MODEL = os.environ.get("LIBRE_MODEL", "opus")
+LIBRE_SOURCES = ("auto", "zh")
+LIBRE_TARGETS = ("vi",)
+
+# Per-project glossaries (glossary.py), one JSON file per project
+GLOSSARY_DIR = os.environ.get("GLOSSARY_DIR", os.path.join(SCRIPT_DIR, "glossaries"))
+
+# Fuzzy translation memory (translation_memory.py): lines of /translate_batch whose best match scores
+# at least TM_AUTO_ACCEPT reuse its translation; /tm/lookup returns matches from TM_MIN_SCORE up
+TM_ENABLED = int(os.environ.get("TM_ENABLED", "1"))
+TM_DB_PATH = os.environ.get("TM_DB_PATH", os.path.join(SCRIPT_DIR, "tm.db"))
+TM_AUTO_ACCEPT = float(os.environ.get("TM_AUTO_ACCEPT", "0.95"))
+TM_MIN_SCORE = float(os.environ.get("TM_MIN_SCORE", "0.7"))
+
+# Live captions (live_captions.py): partial updates reuse the previous translation minus its last
+# LIVE_MASK_TOKENS tokens as the decoder prefix; sessions close after LIVE_SESSION_TTL idle seconds
+LIVE_MASK_TOKENS = int(os.environ.get("LIVE_MASK_TOKENS", "3"))
+LIVE_SESSION_TTL = float(os.environ.get("LIVE_SESSION_TTL", "300"))
+LIVE_MAX_SESSIONS = int(os.environ.get("LIVE_MAX_SESSIONS", "256"))
+LIVE_MAX_LENGTH_RATIO = 3  # Partial decodes stop at this many target tokens per source token (+ 10)
+
+# Long blocks are split at sentence/clause punctuation into segments of about this many characters
+# (multi-line blocks are always split at their line breaks); 0 = translate blocks whole
+SEGMENT_MAX_CHARS = int(os.environ.get("SEGMENT_MAX_CHARS", "40"))
+
+# Greedy-first decoding for beam-search models (mBART): lines are decoded greedily and only
+# suspect outputs (English, repetition, low score, truncated) are re-decoded with beam search
+MBART_BEAM_SIZE = 5
+
+# CPU mode of Transformers models (hf_cpu.py): fp32, sdpa, int8 or int8_compile, for all models
+# and/or per model ("int8,mbart=int8_compile"). Variants whose outputs disagree with fp32 (measured
+# by autotune.py, else at the first load of the model's current files) fall back to fp32.
+HF_CPU_MODE, HF_CPU_MODES = parse_cpu_modes(os.environ.get("HF_CPU_MODE", DEFAULT_CPU_MODE_SPEC))
+HF_MIN_AGREEMENT = float(os.environ.get("HF_MIN_AGREEMENT", str(MIN_AGREEMENT)))
+
+# Use models/<id>_onnx (export_onnx.py) on CPU when CTranslate2 isn't used for a model, e.g. mBART
+USE_ONNX = int(os.environ.get("USE_ONNX", "1"))
+TWO_PASS_DECODING = int(os.environ.get("TWO_PASS_DECODING", "1"))  # 0 = always use beam search
+RETRY_MIN_SCORE = float(os.environ.get("RETRY_MIN_SCORE", "-1.5"))  # Length-normalized log probability
+
+# Cascade mode ("cascade": true on /translate_batch): lines go through the fast model first and
+# only those scoring below CASCADE_MIN_SCORE are re-translated by the heavy model
+CASCADE_FAST_MODEL = os.environ.get("CASCADE_FAST_MODEL", "opus")
+CASCADE_HEAVY_MODEL = os.environ.get("CASCADE_HEAVY_MODEL", "mbart")
+CASCADE_MIN_SCORE = float(os.environ.get("CASCADE_MIN_SCORE", "-0.8"))  # Length-normalized log probability
 
 # Global state
-model = None # HF Model
-translator = None # CTranslate2 Translator
+# active_model is the source of truth; the other names mirror it for convenience
+active_model = None # LoadedModel
+model_pool = {} # model_id -> LoadedModel, active or parked
 tokenizer = None
 current_model_id = None
 is_ct2_model = False
+model_switch_lock = asyncio.Lock()
+park_task = None
+shadow = None # ShadowEvaluator
+
+tuning_profile = {} # Loaded from TUNING_PROFILE_PATH on startup
+tuning_profile_lock = threading.Lock()  # Loads in worker threads add CPU mode agreements to it
+
+# Deduplicated model files (see artifact_store.py); directories with a manifest are rebuilt from it on load
+artifact_store = ArtifactStore()
+
+catalog = ModelCatalog(BASE_MODELS_PATH, VERSIONS_PATH, MODEL_CATALOG_PATH,
+                       prefer_onnx=bool(USE_ONNX) and not torch.cuda.is_available())
 
 # Performance monitoring
 request_times = deque(maxlen=100)  # Track last 100 request times
+segment_stats = {"blocks": 0, "split_blocks": 0, "segments": 0}
+prefilter_stats = Counter()  # Lines per pre-filter kind (see prefilter.py)
+decode_stats = Counter()  # Greedy/beam lines and retry reasons (see decoding.py)
+cascade_stats = Counter()  # Lines translated in cascade mode and how many were escalated
+glossary_stats = Counter()  # Lines with glossary terms, terms replaced and fallbacks
+memory_stats = Counter()  # Translation-memory lookups, reused lines and stored lines
+live_stats = Counter()  # Live-caption updates: decoded, coalesced, unchanged, final; reused/decoded tokens
+stream_stats = Counter()  # /translate/stream requests, cancelled ones and lines not decoded token by token
+stream_latency = LatencyStats()  # Time to first chunk and total latency of recent streams
 
-def contains_english(text):
-    """
-    Simple heuristic to detect if text contains significant English content.
-    Returns True if more than 30% of alphabetic characters are ASCII (likely English).
-    """
-    if not text:
-        return False
-    
-    alpha_chars = [c for c in text if c.isalpha()]
-    if not alpha_chars:
-        return False
-    
-    ascii_alpha = [c for c in alpha_chars if ord(c) < 128]
-    ratio = len(ascii_alpha) / len(alpha_chars)
-    
-    return ratio > 0.3  # More than 30% ASCII letters suggests English content
+glossary_store = GlossaryStore(GLOSSARY_DIR)
+
+admission = AdmissionController(MAX_QUEUE_DEPTH, MAX_INFLIGHT_TOKENS, MAX_CONCURRENT_DECODES)
+
+live_sessions = LiveSessionStore(LIVE_SESSION_TTL, LIVE_MAX_SESSIONS, LIVE_MASK_TOKENS)
+
+# Translation memory (opened on startup in the background: indexing a large memory takes a while)
+translation_memory = None
+memory_task = None
+
+# Background jobs (created on startup)
+job_store = None
+job_wakeup = None
+job_worker_task = None
+
+def request_deadline(arrival: float, deadline_ms: Optional[int]) -> Optional[float]:
+    """Convert a per-request deadline (or the default one) to a time.monotonic() value."""
+    deadline_ms = deadline_ms or DEFAULT_DEADLINE_MS
+    if not deadline_ms or deadline_ms <= 0:
+        return None
+    return arrival + deadline_ms / 1000
+
+def overload_error(e: Exception) -> HTTPException:
+    """Map admission control failures to HTTP errors."""
+    if isinstance(e, Overloaded):
+        return HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+    return HTTPException(status_code=504, detail=str(e))
+
+async def read_payload(http_request: Request):
+    """Decode a JSON or MessagePack body, optionally gzip/zstd compressed."""
+    try:
+        return decode_body(
+            await http_request.body(),
+            http_request.headers.get("content-type"),
+            http_request.headers.get("content-encoding")
+        )
+    except UnsupportedMediaType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except (ValueError, OSError, EOFError) as e:
+        raise HTTPException(status_code=400, detail=f"Malformed request body: {e}")
+
+def validate_payload(payload, model_cls):
+    try:
+        return model_cls.model_validate(payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json()))
+
+async def read_body(http_request: Request, model_cls):
+    """Parse a request body into model_cls (see read_payload)."""
+    return validate_payload(await read_payload(http_request), model_cls)
+
+def negotiated_response(data: dict, http_request: Request) -> Response:
+    """Encode data as the client's Accept header asks (MessagePack or JSON), compressed if large."""
+    body, media_type = encode_body(data, http_request.headers.get("accept"))
+    body, encoding = compress(body, http_request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+async def wait_for_disconnect(http_request: Request):
+    """Return once the client has closed the connection."""
+    while not await http_request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
 
 def get_available_models():
-    """Scan the models directory for available models."""
-    global BASE_MODELS_PATH
-    
-    # Just in case, check if we are in a weird env, but SCRIPT_DIR should be correct.
-    if not os.path.exists(BASE_MODELS_PATH):
-        print(f"Warning: Models path {BASE_MODELS_PATH} does not exist.")
-        return []
-    
-    models = []
-    print(f"Scanning models in {BASE_MODELS_PATH}...")
-    for entry in os.listdir(BASE_MODELS_PATH):
-        full_path = os.path.join(BASE_MODELS_PATH, entry)
-        if os.path.isdir(full_path):
-            # Hide the internal _ct2 folders from the frontend list to avoid duplicates
-            # Also hide backup folders
-            if not entry.endswith("_ct2") and "ct2_backup" not in entry:
-                models.append(entry)
-    
-    return sorted(models)
+    """Models in the models directory (from the catalog, which only rescans changed folders)."""
+    # The _ct2/_onnx and backup folders are listed as backends of their model, not as models
+    return catalog.model_ids("models")
+
+def activation_cost(model_id: str) -> Optional[float]:
+    """Seconds until model_id could serve: 0 if pooled and ready, the unpark time if parked, else a cold load."""
+    loaded = model_pool.get(model_id)
+    if loaded is not None:
+        if not loaded.parked:
+            return 0.0
+        unpark_ms = loaded.park_stats["last_unpark_ms"]
+        return unpark_ms / 1000 if unpark_ms is not None else 0.0
+    return catalog.expected_load_s(model_id)
 
 @app.on_event("startup")
 async def startup_event():
+    global job_store, job_wakeup, job_worker_task, park_task, tuning_profile, memory_task
+    
+    tuning_profile = load_profile(TUNING_PROFILE_PATH)
+    if tuning_profile:
+        logger.info("Using tuning profile %s (%d models)", TUNING_PROFILE_PATH, len(tuning_profile.get("models", {})))
+    
     # Configure PyTorch for CPU optimization (must be done before any model loading)
-    torch.set_num_threads(CPU_THREADS)
+    torch.set_num_threads(tuning_profile.get("torch_threads") or CPU_THREADS)
     if hasattr(torch, 'set_num_interop_threads'):
         try:
             torch.set_num_interop_threads(INTER_THREADS)
         except RuntimeError as e:
-            print(f"Warning: Could not set interop threads: {e}")
+            logger.warning("Could not set interop threads: %s", e)
     
     # Try to find available models
     models = get_available_models()
+    if not os.path.exists(BASE_MODELS_PATH):
+        logger.warning("Models path %s does not exist", BASE_MODELS_PATH)
     if models:
         # Load the first one by default (e.g. mbart or opus)
         # Prioritize 'mbart' if exists as default
         default_model = "mbart" if "mbart" in models else models[0]
         await load_model(default_model)
     else:
-        print(f"No models found in {BASE_MODELS_PATH}")
-
-async def load_model(model_id: str):
-    global model, translator, tokenizer, current_model_id, is_ct2_model
+        logger.warning("No models found in %s", BASE_MODELS_PATH)
     
-    # Don't reload if already loaded and same type
-    if current_model_id == model_id:
-        # Check if we are currently optimized? 
-        # Actually simplest to just return if ID matches.
-        if (translator is not None or model is not None):
-            return True
+    # Start the job worker; unfinished jobs from a previous run are resumed
+    job_store = JobStore(JOB_DB_PATH, chunk_size=JOB_CHUNK_SIZE)
+    job_wakeup = asyncio.Event()
+    job_worker_task = asyncio.create_task(job_worker())
+    pending = job_store.pending_lines()
+    if pending:
+        logger.info("Resuming %d queued job lines from %s", pending, JOB_DB_PATH)
+    
+    if MODEL_IDLE_TIMEOUT > 0:
+        park_task = asyncio.create_task(park_idle_models())
+    
+    if TM_ENABLED:
+        memory_task = asyncio.create_task(open_translation_memory())
+    
+    if SHADOW_MODEL:
+        try:
+            await enable_shadow(SHADOW_MODEL, SHADOW_SAMPLE_RATE)
+        except Exception as e:
+            logger.warning("Could not start shadow evaluation of %s: %s", SHADOW_MODEL, e)
 
-    print(f"Loading model process for: {model_id}...")
+@app.on_event("shutdown")
+async def shutdown_event():
+    if job_worker_task:
+        job_worker_task.cancel()
+    if park_task:
+        park_task.cancel()
+    disable_shadow()
+    if job_store:
+        job_store.close()
+    if memory_task:
+        memory_task.cancel()
+    if translation_memory is not None:
+        translation_memory.close()
+
+async def open_translation_memory():
+    global translation_memory
+    try:
+        start_time = time.time()
+        memory = await asyncio.to_thread(TranslationMemory, TM_DB_PATH)
+        translation_memory = memory
+        logger.info("Translation memory: %d segments indexed in %.2fs", len(memory), time.time() - start_time)
+    except Exception as e:
+        logger.warning("Could not open translation memory %s: %s", TM_DB_PATH, e)
+
+def model_base_path(model_id: str) -> str:
+    """Directory holding model_id: VERSIONS_PATH for a published version, else BASE_MODELS_PATH."""
+    return VERSIONS_PATH if os.path.isdir(os.path.join(VERSIONS_PATH, model_id)) else BASE_MODELS_PATH
+
+def load_model_bundle(model_id: str, base_path: str = None,
+                      inter_threads: int = None, intra_threads: int = None) -> LoadedModel:
+    """
+    Load a tokenizer and engine for model_id without touching the active model.
+    Blocking: runs in a worker thread so requests keep being served meanwhile.
+    Raises HTTPException(404) if the model does not exist.
+    
+    Args:
+        base_path: Directory containing the model (default: BASE_MODELS_PATH)
+        inter_threads/intra_threads: CTranslate2 CPU threads (default: service settings)
+    """
+    logger.info("Loading model %s", model_id)
+    start_time = time.time()
+    start_rss = psutil.Process().memory_info().rss
+    start_cuda = torch.cuda.memory_allocated() if torch.cuda.is_available() else 0
+    base_path = base_path or BASE_MODELS_PATH
+    settings = model_settings(tuning_profile, model_id)
+    inter_threads = inter_threads or settings.get("inter_threads") or INTER_THREADS
+    intra_threads = intra_threads or settings.get("intra_threads") or INTRA_THREADS
+    model = None
+    translator = None
     
     # paths
-    original_model_path = os.path.join(BASE_MODELS_PATH, model_id)
-    ct2_model_path = os.path.join(BASE_MODELS_PATH, f"{model_id}_ct2")
+    original_model_path = os.path.join(base_path, model_id)
+    ct2_model_path = os.path.join(base_path, f"{model_id}_ct2")
+    onnx_model_path = os.path.join(base_path, f"{model_id}_onnx")
+    
+    # Resolve through the artifact store so shared files are hard links to one blob
+    for path in (original_model_path, ct2_model_path, onnx_model_path):
+        try:
+            artifact_store.resolve(path)
+        except Exception as e:
+            logger.warning("Could not materialize %s from artifact store: %s", path, e)
     
     # Check if optimized version exists and is valid (contains model.bin)
     use_ct2 = False
+    use_onnx = False
     model_path_to_load = original_model_path
     
     # Check for model.bin specifically to verify CT2 model validity
     if os.path.exists(ct2_model_path) and os.path.exists(os.path.join(ct2_model_path, "model.bin")) and "mbart" not in model_id.lower():
-        print(f"Found optimized CTranslate2 model at {ct2_model_path}")
+        logger.info("Found optimized CTranslate2 model at %s", ct2_model_path)
         use_ct2 = True
         model_path_to_load = ct2_model_path
+    elif USE_ONNX and is_onnx_model(onnx_model_path) and not torch.cuda.is_available():
+        logger.info("Found ONNX export at %s", onnx_model_path)
+        use_onnx = True
+        model_path_to_load = onnx_model_path
     elif "mbart" in model_id.lower():
-        print(f"Using original HuggingFace model for mBART (CT2 version has repetition issues)")
+        logger.info("Using original HuggingFace model for mBART (CT2 version has repetition issues)")
         use_ct2 = False
         model_path_to_load = original_model_path
     elif not os.path.exists(original_model_path):
@@ -152,338 +466,1450 @@ async def load_model(model_id: str):
              else:
                  model_path_to_load = original_model_path
         else:
-             print(f"Model path failed: {original_model_path}")
+             logger.error("Model path failed: %s", original_model_path)
              raise HTTPException(status_code=404, detail=f"Model {model_id} not found")
 
-    # Check for nested final_model in original path if NOT using CT2
-    if not use_ct2:
+    # Check for nested final_model in original path if NOT using CT2/ONNX
+    if not use_ct2 and not use_onnx:
         nested_path = os.path.join(model_path_to_load, "final_model")
         if os.path.exists(nested_path) and os.path.isdir(nested_path):
-             print(f"Adjusting path to nested 'final_model': {nested_path}")
+             logger.debug("Adjusting path to nested 'final_model': %s", nested_path)
              model_path_to_load = nested_path
              original_model_path = nested_path # Keep original path updated too
 
+    # Load Tokenizer
+    # We try to load tokenizer from the directory we are loading the model from
+    # If CT2, we hopefully copied tokenizer files there. If not, fallback to original?
+    
     try:
-        # Unload previous
-        model = None
-        translator = None
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
+         # Try fast tokenizer first
+         tokenizer = AutoTokenizer.from_pretrained(model_path_to_load, local_files_only=True)
+    except Exception as e:
+         logger.warning("Could not load fast tokenizer from %s: %s", model_path_to_load, e)
+         try:
+             # Try slow tokenizer or fallback to original path
+             logger.info("Attempting to load tokenizer from original path %s", original_model_path)
+             tokenizer = AutoTokenizer.from_pretrained(original_model_path, local_files_only=True)
+         except Exception as e2:
+             logger.critical("Failed to load tokenizer: %s", e2)
+             raise e2
+
+    if use_ct2:
+        logger.info("Loading CTranslate2 engine from %s", model_path_to_load)
+        # Robust CUDA effort with CPU fallback
+        try:
+            try:
+                if torch.cuda.is_available():
+                    logger.info("Attempting to load CTranslate2 on CUDA")
+                    translator = ctranslate2.Translator(model_path_to_load, device="cuda")
+                    logger.info("CTranslate2 model loaded on CUDA")
+                else:
+                    raise RuntimeError("CUDA not available")
+            except Exception as e:
+                # Handle cases where CUDA is available but fails to initialize (e.g. driver issues)
+                if torch.cuda.is_available():
+                    logger.warning("CUDA initialization failed (likely driver version mismatch): %s", e)
+                
+                logger.info("Configuring CTranslate2 for CPU with %d inter_threads, %d intra_threads",
+                            inter_threads, intra_threads)
+                translator = ctranslate2.Translator(
+                    model_path_to_load, 
+                    device="cpu",
+                    inter_threads=inter_threads,
+                    intra_threads=intra_threads,
+                    compute_type="auto"
+                )
+                logger.info("CTranslate2 model loaded on CPU")
             
-        # Load Tokenizer
-        # We try to load tokenizer from the directory we are loading the model from
-        # If CT2, we hopefully copied tokenizer files there. If not, fallback to original?
+            # Special handling for mBART: It needs to know the target language code
+            if "mbart" in model_id.lower():
+                # Ensure compatibility with mBART tokenizer which might be multilingual
+                if tokenizer.pad_token is None:
+                    tokenizer.pad_token = tokenizer.eos_token
+                # Set source and target languages
+                if not hasattr(tokenizer, 'src_lang') or not tokenizer.src_lang:
+                     logger.debug("Setting default src_lang to zh_CN for mBART")
+                     tokenizer.src_lang = "zh_CN"
+                # Force target language to Vietnamese
+                tokenizer.tgt_lang = "vi_VN"
+                logger.debug("mBART config: src_lang=%s, tgt_lang=%s", tokenizer.src_lang, tokenizer.tgt_lang)
+        except Exception as e:
+            logger.warning("CTranslate2 loading failed completely: %s. Falling back to standard Transformers", e)
+            use_ct2 = False
+            translator = None
+            # If CT2 fails, we'll fall through to the Transformers path below
+            # We need to update model_path_to_load to the original path
+            model_path_to_load = original_model_path
+            # Check for nested final_model again just in case
+            nested_path = os.path.join(model_path_to_load, "final_model")
+            if os.path.exists(nested_path) and os.path.isdir(nested_path):
+                 model_path_to_load = nested_path
+
+    onnx_translator = None
+    if use_onnx:
+        logger.info("Loading ONNX Runtime model from %s with %d intra_threads", model_path_to_load, intra_threads)
+        try:
+            onnx_translator = OnnxTranslator(model_path_to_load, intra_threads=intra_threads)
+            logger.info("ONNX Runtime model loaded on CPU")
+        except Exception as e:
+            logger.warning("ONNX Runtime loading failed: %s. Falling back to standard Transformers", e)
+            model_path_to_load = original_model_path
+            nested_path = os.path.join(model_path_to_load, "final_model")
+            if os.path.exists(nested_path) and os.path.isdir(nested_path):
+                 model_path_to_load = nested_path
+
+    cpu_mode = None
+    if not use_ct2 and onnx_translator is None:
+        logger.info("Loading standard Transformers model from %s", model_path_to_load)
+        if torch.cuda.is_available():
+            model = AutoModelForSeq2SeqLM.from_pretrained(model_path_to_load, local_files_only=True)
+            try:
+                model = model.to("cuda")
+                logger.info("Transformers model loaded on CUDA")
+            except Exception as e:
+                logger.warning("Failed to move Transformers model to CUDA, falling back to CPU: %s", e)
+                model = model.to("cpu")
+                logger.info("Transformers model loaded on CPU")
+        else:
+            cpu_mode = HF_CPU_MODES.get(model_id, HF_CPU_MODE)
+            model, cpu_mode = load_cpu_variant(model_id, model_path_to_load, tokenizer, cpu_mode)
+            logger.info("Transformers model loaded on CPU (%s)", cpu_mode)
+
+    loaded = LoadedModel(model_id, tokenizer, translator=translator, model=model, model_path=model_path_to_load,
+                         onnx=onnx_translator)
+    loaded.cpu_mode = cpu_mode
+    loaded.max_batch_size = settings.get("max_batch_size")
+    loaded.batch_type = settings.get("batch_type")
+    if translator is not None:
+        loaded.compute_type = translator.compute_type
+    elif onnx_translator is not None:
+        quantization = onnx_translator.metadata.get("quantization")
+        loaded.compute_type = "float32" if quantization in (None, "none") else quantization
+    else:
+        loaded.compute_type = cpu_mode or str(next(model.parameters()).dtype).replace("torch.", "")
+    # Rough when other loads run at the same time; shared (already mapped) files aren't counted
+    if model is not None and model.device.type == "cuda":
+        loaded.resident_mb = (torch.cuda.memory_allocated() - start_cuda) / (1024 ** 2)
+    elif translator is None or translator.device == "cpu":
+        loaded.resident_mb = max(0, psutil.Process().memory_info().rss - start_rss) / (1024 ** 2)
+    loaded.load_time = time.time() - start_time
+    return loaded
+
+def record_cpu_mode_agreement(model_id: str, cpu_mode: str, score: Optional[float], signature: list):
+    """Keep a load-time validation result in the tuning profile so later loads of the same files skip it."""
+    with tuning_profile_lock:
+        settings = tuning_profile.setdefault("models", {}).setdefault(model_id, {})
+        if settings.get("cpu_mode_signature") != signature:
+            # Results for other (e.g. retrained) files no longer apply
+            settings["cpu_mode_signature"] = signature
+            settings["cpu_mode_agreement"] = {}
+        settings["cpu_mode_agreement"][cpu_mode] = score
+        try:
+            save_profile(tuning_profile, TUNING_PROFILE_PATH)
+        except OSError as e:
+            logger.warning("Could not save CPU mode agreement to %s: %s", TUNING_PROFILE_PATH, e)
+
+def load_cpu_variant(model_id: str, path: str, tokenizer, cpu_mode: str):
+    """
+    Load a Transformers model for CPU in cpu_mode, falling back to fp32 when the
+    variant fails or its outputs disagree with fp32. Returns (model, mode used).
+
+    The agreement comes from the tuning profile (autotune.py) when it was
+    measured on the same files (size/mtime signature of path); otherwise the
+    mode is validated here once and the result is added to the profile.
+    """
+    if cpu_mode != "fp32":
+        signature = dir_signature(path)
+        settings = model_settings(tuning_profile, model_id)
+        agreements = settings.get("cpu_mode_agreement", {}) if settings.get("cpu_mode_signature") == signature else {}
+        if cpu_mode in agreements:
+            score = agreements[cpu_mode]
+            if score is not None and score >= HF_MIN_AGREEMENT:
+                logger.info("CPU mode %s for %s (agreement with fp32: %.3f)", cpu_mode, model_id, score)
+                return load_cpu_model(path, cpu_mode), cpu_mode
+        else:
+            model, score = validate_cpu_mode(path, cpu_mode, tokenizer, validation_kwargs(model_id, tokenizer),
+                                             min_agreement=HF_MIN_AGREEMENT)
+            record_cpu_mode_agreement(model_id, cpu_mode, score, signature)
+            if model is not None:
+                logger.info("CPU mode %s for %s (agreement with fp32: %.3f)", cpu_mode, model_id, score)
+                return model, cpu_mode
+        logger.warning("CPU mode %s disagrees with fp32 for %s (agreement %s), falling back to fp32",
+                       cpu_mode, model_id, score)
+    return load_cpu_model(path, "fp32"), "fp32"
+
+def warm_up_model(loaded: LoadedModel):
+    """Run one short translation so the first real request doesn't pay for lazy init."""
+    start_time = time.time()
+    translate_texts([WARMUP_TEXT], loaded)
+    loaded.warmup_time = time.time() - start_time
+    catalog.record_load(loaded.model_id, loaded.backend, loaded.load_time, loaded.warmup_time,
+                        loaded.resident_mb, loaded.compute_type)
+
+def activate_model(loaded: LoadedModel):
+    """Make loaded the active model. No awaits here, so the swap is atomic for request handlers."""
+    global active_model, tokenizer, current_model_id, is_ct2_model
+    active_model = loaded
+    tokenizer = loaded.tokenizer
+    current_model_id = loaded.model_id
+    is_ct2_model = loaded.is_ct2
+
+async def retire_model(old: LoadedModel):
+    """Wait for requests still running on a replaced model, then park or release it."""
+    drained = await asyncio.to_thread(old.wait_idle, MODEL_DRAIN_TIMEOUT)
+    if not drained:
+        logger.warning("%d requests still using %s after %ds", old.active_requests, old.model_id, MODEL_DRAIN_TIMEOUT)
+    async with model_switch_lock:
+        # Switched back to it while it drained (A -> B -> A): it's serving again
+        if old is active_model:
+            return
+        if MODEL_IDLE_TIMEOUT > 0 and await asyncio.to_thread(old.park):
+            logger.info("Parked %s in %s ms", old.model_id, old.park_stats["last_park_ms"])
+            return
+        # The last reference held by an in-flight request frees the weights
+        if model_pool.get(old.model_id) is old:
+            del model_pool[old.model_id]
+    del old
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+async def load_model(model_id: str):
+    """
+    Switch the active model without an outage: the new model is loaded and
+    warmed up in a worker thread while the old one keeps serving, then swapped
+    in atomically; the old one is released once its requests have drained.
+    """
+    # Don't reload if already loaded
+    if current_model_id == model_id and active_model is not None:
+        return True
+
+    async with model_switch_lock:
+        # Another request may have switched to the same model while we waited
+        if current_model_id == model_id and active_model is not None:
+            return True
         
         try:
-             # Try fast tokenizer first
-             tokenizer = AutoTokenizer.from_pretrained(model_path_to_load, local_files_only=True)
+            loaded = model_pool.get(model_id)
+            if loaded is not None:
+                # Previously used model kept parked: reactivate instead of a cold load
+                await asyncio.to_thread(loaded.unpark)
+                logger.info("Reactivated %s in %s ms", model_id, loaded.park_stats["last_unpark_ms"])
+            else:
+                loaded = await asyncio.to_thread(load_model_bundle, model_id, model_base_path(model_id))
+                await asyncio.to_thread(warm_up_model, loaded)
+                model_pool[model_id] = loaded
+        except HTTPException:
+            raise
         except Exception as e:
-             print(f"Warning: Could not load fast tokenizer from {model_path_to_load}: {e}")
-             try:
-                 # Try slow tokenizer or fallback to original path
-                 print(f"Attempting to load tokenizer from original path {original_model_path}...")
-                 tokenizer = AutoTokenizer.from_pretrained(original_model_path, local_files_only=True)
-             except Exception as e2:
-                 print(f"Critical: Failed to load tokenizer: {e2}")
-                 raise e2
-
-        if use_ct2:
-            print(f"Loading CTranslate2 engine from {model_path_to_load}...")
-            # Robust CUDA effort with CPU fallback
+            logger.exception("Critical error loading model %s: %s", model_id, e)
+            return False
+
+        old = active_model
+        activate_model(loaded)
+        logger.info("Model %s active (%s, loaded in %.2fs, warm-up %.2fs)", model_id, loaded.backend,
+                    loaded.load_time, loaded.warmup_time,
+                    extra={"model_id": model_id, "backend": loaded.backend, "compute_type": loaded.compute_type})
+        if old is not None:
+            asyncio.create_task(retire_model(old))
+        return True
+
+async def get_pooled_model(model_id: str) -> LoadedModel:
+    """Return model_id from the pool, loading and warming it up (without activating it) if needed."""
+    loaded = model_pool.get(model_id)
+    if loaded is not None:
+        return loaded
+    async with model_switch_lock:
+        loaded = model_pool.get(model_id)
+        if loaded is None:
+            loaded = await asyncio.to_thread(load_model_bundle, model_id, model_base_path(model_id))
+            await asyncio.to_thread(warm_up_model, loaded)
+            model_pool[model_id] = loaded
+    return loaded
+
+async def park_idle_models():
+    """Periodically park models (including the active one) that have been idle too long."""
+    while True:
+        await asyncio.sleep(PARK_CHECK_INTERVAL)
+        for loaded in list(model_pool.values()):
+            if loaded.parked or loaded.active_requests:
+                continue
+            if time.time() - loaded.last_used < MODEL_IDLE_TIMEOUT:
+                continue
             try:
-                try:
-                    if torch.cuda.is_available():
-                        print("Attempting to load CTranslate2 on CUDA...")
-                        translator = ctranslate2.Translator(model_path_to_load, device="cuda")
-                        print("CTranslate2 model loaded successfully on CUDA!")
-                    else:
-                        raise RuntimeError("CUDA not available")
-                except Exception as e:
-                    # Handle cases where CUDA is available but fails to initialize (e.g. driver issues)
-                    if torch.cuda.is_available():
-                        print(f"CUDA initialization failed (likely driver version mismatch): {e}")
-                    
-                    print(f"Falling back to CPU configuration...")
-                    print(f"Configuring CTranslate2 for CPU with {INTER_THREADS} inter_threads, {INTRA_THREADS} intra_threads")
-                    translator = ctranslate2.Translator(
-                        model_path_to_load, 
-                        device="cpu",
-                        inter_threads=INTER_THREADS,
-                        intra_threads=INTRA_THREADS,
-                        compute_type="auto"
-                    )
-                    print("CTranslate2 model loaded successfully on CPU!")
-                
-                is_ct2_model = True
+                if await asyncio.to_thread(loaded.park):
+                    logger.info("Parked idle model %s in %s ms", loaded.model_id, loaded.park_stats["last_park_ms"])
+            except Exception as e:
+                logger.warning("Could not park %s: %s", loaded.model_id, e)
+
+def translate_texts(texts: list[str], loaded: LoadedModel = None, with_passes: bool = False) -> list:
+    """
+    Translate a list of lines with the given model (default: the active one).
+    Blocking: callers on the event loop should run it in a worker thread.
+
+    With with_passes, returns (text, pass) pairs where pass is "single" for
+    one-pass models, "greedy" or "beam" for two-pass decoding.
+    """
+    loaded = loaded or active_model
+    with loaded.lease():
+        # Decode the segments of all blocks as one batch, then put each block back together
+        segments, layout = split_blocks(texts)
+        translated, passes = _translate_two_pass(segments, loaded) if segments else ([], [])
+    # A block counts as beam-decoded if any of its segments was retried
+    passes = ["beam" if "beam" in block else (block[0] if block else "single") for block in group(passes, layout)]
+    translated = reassemble(translated, layout)
+    return list(zip(translated, passes)) if with_passes else translated
+
+def split_blocks(texts: list[str]):
+    """Segments to decode and the layout to reassemble them (one segment per block when disabled)."""
+    if not SEGMENT_MAX_CHARS:
+        return texts, [[(i, 1)] for i in range(len(texts))]
+    segments, layout = segment_texts(texts, SEGMENT_MAX_CHARS)
+    segment_stats["blocks"] += len(texts)
+    segment_stats["split_blocks"] += sum(1 for lines in layout if len(lines) > 1 or any(count > 1 for _, count in lines))
+    segment_stats["segments"] += len(segments)
+    return segments, layout
+
+def translate_cascade(texts: list[str], fast: LoadedModel, heavy: LoadedModel, min_score: float) -> list:
+    """
+    Translate with the fast model and re-translate the blocks it is unsure about
+    (a segment scoring below min_score) with the heavy model.
+    Returns (text, stage) pairs where stage is "fast" or "heavy".
+    """
+    with fast.lease():
+        segments, layout = split_blocks(texts)
+        translated, scores = _translate_texts(segments, fast, with_scores=True) if segments else ([], [])
+    blocks = reassemble(translated, layout)
+    escalate = [i for i, block_scores in enumerate(group(scores, layout))
+                if block_scores and min(block_scores) < min_score]
+    
+    stages = ["fast"] * len(texts)
+    if escalate:
+        logger.debug("Cascade: escalating %d/%d lines to %s", len(escalate), len(texts), heavy.model_id)
+        for i, text in zip(escalate, translate_texts([texts[i] for i in escalate], heavy)):
+            blocks[i] = text
+            stages[i] = "heavy"
+    cascade_stats["lines"] += len(texts)
+    cascade_stats["escalated_lines"] += len(escalate)
+    return list(zip(blocks, stages))
+
+def uses_two_pass(loaded: LoadedModel) -> bool:
+    return bool(TWO_PASS_DECODING) and "mbart" in loaded.model_id.lower()
+
+def _translate_two_pass(texts: list[str], loaded: LoadedModel) -> tuple[list[str], list[str]]:
+    """Greedy pass over all lines, beam-search pass over the suspect ones."""
+    if not uses_two_pass(loaded):
+        return _translate_texts(texts, loaded), ["single"] * len(texts)
+    
+    translated, scores = _translate_texts(texts, loaded, beam_size=1, with_scores=True)
+    passes = ["greedy"] * len(texts)
+    retry = []
+    for i, (source, output, score) in enumerate(zip(texts, translated, scores)):
+        reason = suspect_reason(source, output, score, RETRY_MIN_SCORE)
+        if reason:
+            decode_stats[reason] += 1
+            retry.append(i)
+    
+    if retry:
+        logger.debug("Two-pass decoding: retrying %d/%d lines with beam search", len(retry), len(texts))
+        for i, output in zip(retry, _translate_texts([texts[i] for i in retry], loaded)):
+            translated[i] = output
+            passes[i] = "beam"
+    decode_stats["greedy_lines"] += len(texts) - len(retry)
+    decode_stats["beam_lines"] += len(retry)
+    return translated, passes
+
+def _translate_texts(texts: list[str], loaded: LoadedModel, beam_size: int = None, with_scores: bool = False):
+    """
+    Decode texts in one call. beam_size overrides the model's default; with
+    with_scores, returns (texts, length-normalized log probabilities).
+    """
+    tokenizer = loaded.tokenizer
+    translator = loaded.translator
+    model = loaded.model
+    current_model_id = loaded.model_id
+    
+    if loaded.is_ct2:
+        # CTranslate2 Path with optimizations
+        
+        # Special handling for mBART to force Vietnamese target
+        target_prefix = None
+        default_beam_size = 1
+        max_decoding_length = 512
+        
+        if "mbart" in current_model_id.lower():
+            # Ensure target language is set
+            if not hasattr(tokenizer, 'tgt_lang') or not tokenizer.tgt_lang:
+                tokenizer.tgt_lang = "vi_VN"
+            if not hasattr(tokenizer, 'src_lang') or not tokenizer.src_lang:
+                tokenizer.src_lang = "zh_CN"
+            
+            # CRITICAL: For mBART with CTranslate2, we need to use the language token
+            # The target_prefix should contain the actual language token, not just the string
+            # We need to ensure the tokenizer properly encodes this
+            try:
+                # Set the target language in tokenizer
+                tokenizer.tgt_lang = "vi_VN"
+                # Get the language token - for mBART this is typically at the end of vocab
+                # The token should be in the format "vi_VN"
+                lang_token = "vi_VN"
                 
-                # Special handling for mBART: It needs to know the target language code
-                if "mbart" in model_id.lower():
-                    # Ensure compatibility with mBART tokenizer which might be multilingual
-                    if tokenizer.pad_token is None:
-                        tokenizer.pad_token = tokenizer.eos_token
-                    # Set source and target languages
-                    if not hasattr(tokenizer, 'src_lang') or not tokenizer.src_lang:
-                         print("Setting default src_lang to zh_CN for mBART")
-                         tokenizer.src_lang = "zh_CN"
-                    # Force target language to Vietnamese
-                    tokenizer.tgt_lang = "vi_VN"
-                    print(f"mBART config: src_lang={tokenizer.src_lang}, tgt_lang={tokenizer.tgt_lang}")
-                    
-                print("CTranslate2 model loaded successfully!")
+                # Verify the token exists
+                test_id = tokenizer.convert_tokens_to_ids(lang_token)
+                if test_id != tokenizer.unk_token_id:
+                    target_prefix = [[lang_token]] * len(texts)
+                    logger.debug("Using target_prefix with token: %s (ID: %s)", lang_token, test_id)
+                else:
+                    logger.warning("Language token %s not found in vocabulary", lang_token)
+                    target_prefix = [[lang_token]] * len(texts)
             except Exception as e:
-                print(f"CTranslate2 loading failed completely: {e}. Falling back to standard Transformers...")
-                use_ct2 = False
-                # If CT2 fails, we'll fall through to the Transformers path below
-                # We need to update model_path_to_load to the original path
-                model_path_to_load = original_model_path
-                # Check for nested final_model again just in case
-                nested_path = os.path.join(model_path_to_load, "final_model")
-                if os.path.exists(nested_path) and os.path.isdir(nested_path):
-                     model_path_to_load = nested_path
-
-        if not use_ct2:
-            print(f"Loading standard Transformers model from {model_path_to_load}...")
-            model = AutoModelForSeq2SeqLM.from_pretrained(model_path_to_load, local_files_only=True)
+                logger.warning("Error setting target prefix: %s", e)
+                target_prefix = [["vi_VN"]] * len(texts)
             
-            if torch.cuda.is_available():
-                try:
-                    model = model.to("cuda")
-                    print("Transformers model loaded successfully on CUDA!")
-                except Exception as e:
-                    print(f"Failed to move Transformers model to CUDA, falling back to CPU: {e}")
-                    model = model.to("cpu")
-                    print("Transformers model loaded successfully on CPU!")
+            # Use beam search for better quality and language adherence
+            default_beam_size = MBART_BEAM_SIZE
+            logger.debug("mBART translation: src_lang=%s, tgt_lang=%s, beam_size=%s",
+                         tokenizer.src_lang, tokenizer.tgt_lang, beam_size or default_beam_size)
+        
+        beam_size = beam_size or default_beam_size
+        logger.debug("Batch translating %d items with CTranslate2 (beam_size=%d)", len(texts), beam_size,
+                     extra={"model_id": current_model_id, "lines": len(texts)})
+        
+        # Tokenize (optimized batch tokenization)
+        source_tokens = [tokenizer.convert_ids_to_tokens(tokenizer.encode(t)) for t in texts]
+        
+        # Translate with optimized settings
+        # Note: Keep parameters simple - repetition_penalty can cause issues with mBART
+        translate_params = {
+            "source": source_tokens,
+            "target_prefix": target_prefix,
+            "beam_size": beam_size,
+            "max_batch_size": loaded.max_batch_size or DEFAULT_MAX_BATCH_SIZE,
+            "batch_type": loaded.batch_type or DEFAULT_BATCH_TYPE,
+            "return_scores": with_scores
+        }
+        
+        # Only add max_decoding_length if not mBART (it can cause repetition issues)
+        if "mbart" not in current_model_id.lower():
+            translate_params["max_decoding_length"] = max_decoding_length
+        
+        results = translator.translate_batch(**translate_params)
+        
+        # Detokenize
+        translated_texts = [tokenizer.decode(tokenizer.convert_tokens_to_ids(res.hypotheses[0]), skip_special_tokens=True) for res in results]
+        
+        # Detect English output in mBART translations (diagnostic)
+        if "mbart" in current_model_id.lower():
+            english_count = sum(1 for text in translated_texts if contains_english(text))
+            if english_count > 0:
+                # Known limitation of the current model training
+                logger.debug("%d/%d translations contain English text", english_count, len(translated_texts))
+        
+        if with_scores:
+            return translated_texts, [res.scores[0] for res in results]
+        return translated_texts
+    
+    elif loaded.is_onnx:
+        # ONNX Runtime Path (same generation settings as the Transformers path)
+        decode_params = {
+            "beam_size": beam_size,
+            "max_length": 512,
+            "max_batch_size": loaded.max_batch_size
+        }
+        if "mbart" in current_model_id.lower():
+            decode_params.update({
+                "forced_bos_token_id": tokenizer.convert_tokens_to_ids("vi_VN"),
+                "beam_size": beam_size or MBART_BEAM_SIZE,
+                "no_repeat_ngram_size": 3,
+                "repetition_penalty": 1.5
+            })
+        logger.debug("Batch translating %d items with ONNX Runtime (beam_size=%s)", len(texts),
+                     decode_params["beam_size"] or loaded.onnx.metadata.get("num_beams"),
+                     extra={"model_id": current_model_id, "lines": len(texts)})
+        
+        source_ids = [tokenizer.encode(t, truncation=True, max_length=512) for t in texts]
+        results = loaded.onnx.translate_batch(source_ids, **decode_params)
+        translated_texts = [tokenizer.decode(ids, skip_special_tokens=True) for ids, _ in results]
+        
+        if with_scores:
+            return translated_texts, [score for _, score in results]
+        return translated_texts
+        
+    else:
+        # Transformers Path (used for mBART to avoid CT2 repetition issues)
+        device = model.device
+        
+        # Special handling for mBART to force Vietnamese output
+        generate_kwargs = {"max_length": 512}
+        if "mbart" in current_model_id.lower():
+            # Force Vietnamese output
+            vi_token_id = tokenizer.convert_tokens_to_ids("vi_VN")
+            generate_kwargs.update({
+                "forced_bos_token_id": vi_token_id,
+                "num_beams": MBART_BEAM_SIZE,
+                "early_stopping": True,
+                "no_repeat_ngram_size": 3,
+                "repetition_penalty": 1.5
+            })
+            logger.debug("mBART (Transformers): Using forced_bos_token_id=%s for Vietnamese", vi_token_id)
+        if beam_size:
+            generate_kwargs["num_beams"] = beam_size
+            if beam_size == 1:
+                generate_kwargs.pop("early_stopping", None)
+        
+        # One generate() call per tuned batch (whole input when untuned)
+        batch_size = loaded.max_batch_size or len(texts)
+        translated_texts = []
+        scores = []
+        for i in range(0, len(texts), batch_size):
+            inputs = tokenizer(texts[i:i + batch_size], return_tensors="pt", padding=True, truncation=True, max_length=512).to(device)
+            with torch.inference_mode():
+                outputs = model.generate(**inputs, **generate_kwargs,
+                                         return_dict_in_generate=with_scores, output_scores=with_scores)
+            
+            if not with_scores:
+                translated_texts.extend(tokenizer.batch_decode(outputs, skip_special_tokens=True))
+                continue
+            
+            translated_texts.extend(tokenizer.batch_decode(outputs.sequences, skip_special_tokens=True))
+            if generate_kwargs.get("num_beams", 1) > 1:
+                scores.extend(outputs.sequences_scores.tolist())
             else:
-                print("Transformers model loaded successfully on CPU!")
-            is_ct2_model = False
+                # Mean log probability of the generated tokens, ignoring padding after EOS
+                token_scores = model.compute_transition_scores(outputs.sequences, outputs.scores, normalize_logits=True)
+                generated = outputs.sequences[:, -token_scores.shape[1]:]
+                mask = (generated != tokenizer.pad_token_id).float()
+                scores.extend(((token_scores * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)).tolist())
+        
+        if with_scores:
+            return translated_texts, scores
+        return translated_texts
 
-        current_model_id = model_id
-        return True
-    except Exception as e:
-        print(f"Critical error loading model {model_id}: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+def translate_with_glossary(texts: list[str], translate_func, glossary: Glossary) -> list:
+    """
+    Translate texts with the glossary's terms protected by placeholders.
+    translate_func returns (text, pass) pairs, and so does this function.
+    Lines that only contain terms skip the model. Lines whose placeholders
+    don't survive decoding are translated again without protection.
+    """
+    protected, targets = glossary.protect_batch(texts)
+    results = [None] * len(texts)
+    decode = []
+    for i, (text, terms) in enumerate(zip(protected, targets)):
+        if terms and Glossary.only_placeholders(text):
+            results[i] = (Glossary.restore(text, terms).translate(PUNCTUATION), "glossary")
+        else:
+            decode.append(i)
+    
+    if decode:
+        for i, result in zip(decode, translate_func([protected[i] for i in decode])):
+            results[i] = result
+    retry = []
+    for i in decode:
+        if targets[i]:
+            restored = Glossary.restore(results[i][0], targets[i])
+            if restored is None:
+                retry.append(i)
+            else:
+                results[i] = (restored, results[i][1])
+    
+    if retry:
+        logger.debug("Glossary: placeholders lost in %d lines, translating them without protection", len(retry))
+        for i, result in zip(retry, translate_func([texts[i] for i in retry])):
+            results[i] = result
+    term_lines = [terms for terms in targets if terms]
+    glossary_stats["lines"] += len(term_lines)
+    glossary_stats["terms"] += sum(len(terms) for terms in term_lines)
+    glossary_stats["term_only_lines"] += len(term_lines) - sum(1 for i in decode if targets[i])
+    glossary_stats["fallback_lines"] += len(retry)
+    return results
+
+def memory_scope(model_id: str, project_id: Optional[str], glossary: Optional[Glossary] = None) -> str:
+    """
+    Translations are reused only for the model (or cascade), project and
+    glossary content that produced them: editing a glossary starts a new scope.
+    """
+    scope = f"{model_id}|{project_id or ''}"
+    return f"{scope}|{glossary.digest}" if glossary else scope
+
+def translate_with_memory(texts: list[str], translate_func, scope: str) -> list:
+    """
+    Reuse translation-memory matches scoring at least TM_AUTO_ACCEPT (pass "memory"),
+    translate the other lines with translate_func and store their translations.
+    """
+    matches = translation_memory.lookup_batch(scope, texts, TM_AUTO_ACCEPT)
+    results = [(match["target"], "memory") if match else None for match in matches]
+    decode = [i for i, match in enumerate(matches) if match is None]
+    if decode:
+        for i, result in zip(decode, translate_func([texts[i] for i in decode])):
+            results[i] = result
+        memory_stats["stored_lines"] += translation_memory.add(scope, [(texts[i], results[i][0]) for i in decode])
+    memory_stats["lookups"] += len(texts)
+    memory_stats["reused_lines"] += len(texts) - len(decode)
+    return results
+
+def project_glossary(project_id: Optional[str]) -> Optional[Glossary]:
+    """The glossary of project_id (None if no project was given or it has no glossary)."""
+    if not project_id:
+        return None
+    try:
+        return glossary_store.get(project_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def cancellable_batch(texts: list[str], translate_func, loaded: LoadedModel) -> CancellableBatch:
+    """Sub-batches of one decode batch of loaded: lines, or estimated tokens for token-batched CTranslate2."""
+    size = loaded.max_batch_size or DEFAULT_MAX_BATCH_SIZE
+    sizes = None
+    if loaded.is_ct2 and (loaded.batch_type or DEFAULT_BATCH_TYPE) == "tokens":
+        sizes = [estimate_tokens([t]) for t in texts]
+    return CancellableBatch(translate_func, texts, size, admission.record_cancel, sizes)
+
+async def decode_lines(texts: list[str], translate_func, http_request: Request, deadline: Optional[float],
+                       loaded: LoadedModel):
+    """
+    Pre-filter texts, then decode the remaining lines with translate_func
+    (returning (text, pass) pairs) through admission control, one decode batch
+    of loaded at a time, stopping early if the client disconnects.
+    Returns (translated texts, pass per line, lines sent to the model).
+    """
+    # Lines like "♪", timestamps or text already in Vietnamese never reach the model
+    outputs, model_indices, kinds = prefilter(texts)
+    prefilter_stats.update(kinds)
+    model_texts = [texts[i] for i in model_indices]
+    if not model_texts:
+        return outputs, ["skipped"] * len(outputs), model_texts
+    
+    start_time = time.time()
+    # Decode batch by batch so a disconnected client stops the remaining work
+    batch = cancellable_batch(model_texts, translate_func, loaded)
+    work = asyncio.create_task(admission.run(
+        batch.run,
+        tokens=estimate_tokens(model_texts),
+        deadline=deadline
+    ))
+    disconnect = asyncio.create_task(wait_for_disconnect(http_request))
+    try:
+        await asyncio.wait({work, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect.cancel()
+    
+    if not work.done():
+        logger.info("Client disconnected, cancelling batch of %d items", len(model_texts))
+        batch.cancel()
+        work.cancel()
+        admission.stats["cancelled_requests"] += 1
+        raise HTTPException(status_code=499, detail="Client closed request")
+    results = work.result()
+    
+    # Track performance
+    request_times.append(time.time() - start_time)
+    
+    translated = merge(outputs, model_indices, [text for text, _ in results])
+    passes = merge(["skipped"] * len(outputs), model_indices, [p for _, p in results])
+    return translated, passes, model_texts
 
 @app.post("/translate_batch")
-async def translate_batch(request: BatchTranslationRequest):
-    global model, translator, tokenizer, current_model_id, is_ct2_model
+async def translate_batch(http_request: Request):
+    global tokenizer, current_model_id, is_ct2_model
     
+    arrival = time.monotonic()
+    request = await read_body(http_request, BatchTranslationRequest)
     target_model = request.model_id
     
-    if target_model and target_model != current_model_id:
-        print(f"Switching to {target_model}...")
-        success = await load_model(target_model)
-        if not success:
-             raise HTTPException(status_code=500, detail=f"Failed to load requested model: {target_model}")
-
-    if (not model and not translator) or not tokenizer:
-        raise HTTPException(status_code=503, detail="Model not loaded.")
+    if request.cascade:
+        # Both cascade models stay in the pool next to the active one
+        try:
+            loaded = await get_pooled_model(CASCADE_FAST_MODEL)
+            heavy = await get_pooled_model(CASCADE_HEAVY_MODEL)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to load cascade models: {e}")
+        min_score = CASCADE_MIN_SCORE if request.cascade_min_score is None else request.cascade_min_score
+        translate_func = functools.partial(translate_cascade, fast=loaded, heavy=heavy, min_score=min_score)
+    else:
+        if target_model and target_model != current_model_id:
+            logger.info("Switching to %s", target_model)
+            success = await load_model(target_model)
+            if not success:
+                 raise HTTPException(status_code=500, detail=f"Failed to load requested model: {target_model}")
+        
+        loaded = active_model
+        if loaded is None:
+            raise HTTPException(status_code=503, detail="Model not loaded.")
+        translate_func = functools.partial(translate_texts, loaded=loaded, with_passes=True)
+    
+    glossary = project_glossary(request.project_id)
+    if glossary:
+        translate_func = functools.partial(translate_with_glossary, translate_func=translate_func, glossary=glossary)
+    if translation_memory is not None and request.memory:
+        scope = memory_scope("cascade" if request.cascade else loaded.model_id, request.project_id, glossary)
+        translate_func = functools.partial(translate_with_memory, translate_func=translate_func, scope=scope)
 
     try:
         start_time = time.time()
-        texts = request.texts
+        translated_texts, passes, model_texts = await decode_lines(
+            request.texts, translate_func, http_request,
+            request_deadline(arrival, request.deadline_ms), loaded
+        )
+        elapsed = time.time() - start_time
         
-        if is_ct2_model:
-            # CTranslate2 Path with optimizations
-            
-            # Special handling for mBART to force Vietnamese target
-            target_prefix = None
-            beam_size = 1
-            max_decoding_length = 512
-            
-            if "mbart" in current_model_id.lower():
-                # Ensure target language is set
-                if not hasattr(tokenizer, 'tgt_lang') or not tokenizer.tgt_lang:
-                    tokenizer.tgt_lang = "vi_VN"
-                if not hasattr(tokenizer, 'src_lang') or not tokenizer.src_lang:
-                    tokenizer.src_lang = "zh_CN"
-                
-                # CRITICAL: For mBART with CTranslate2, we need to use the language token
-                # The target_prefix should contain the actual language token, not just the string
-                # We need to ensure the tokenizer properly encodes this
-                try:
-                    # Set the target language in tokenizer
-                    tokenizer.tgt_lang = "vi_VN"
-                    # Get the language token - for mBART this is typically at the end of vocab
-                    # The token should be in the format "vi_VN"
-                    lang_token = "vi_VN"
-                    
-                    # Verify the token exists
-                    test_id = tokenizer.convert_tokens_to_ids(lang_token)
-                    if test_id != tokenizer.unk_token_id:
-                        target_prefix = [[lang_token]] * len(texts)
-                        print(f"Using target_prefix with token: {lang_token} (ID: {test_id})")
-                    else:
-                        print(f"Warning: Language token {lang_token} not found in vocabulary")
-                        target_prefix = [[lang_token]] * len(texts)
-                except Exception as e:
-                    print(f"Error setting target prefix: {e}")
-                    target_prefix = [["vi_VN"]] * len(texts)
-                
-                # Use beam search for better quality and language adherence
-                beam_size = 5  # Higher beam size for better quality
-                print(f"mBART translation: src_lang={tokenizer.src_lang}, tgt_lang={tokenizer.tgt_lang}, beam_size={beam_size}")
-            
-            print(f"Batch translating {len(texts)} items with CTranslate2...")
-            
-            # Tokenize (optimized batch tokenization)
-            source_tokens = [tokenizer.convert_ids_to_tokens(tokenizer.encode(t)) for t in texts]
-            
-            # Translate with optimized settings
-            # Note: Keep parameters simple - repetition_penalty can cause issues with mBART
-            translate_params = {
-                "source": source_tokens,
-                "target_prefix": target_prefix,
-                "beam_size": beam_size,
-                "max_batch_size": 32,
-                "batch_type": "tokens"
-            }
-            
-            # Only add max_decoding_length if not mBART (it can cause repetition issues)
-            if "mbart" not in current_model_id.lower():
-                translate_params["max_decoding_length"] = max_decoding_length
-            
-            results = translator.translate_batch(**translate_params)
-            
-            # Detokenize
-            translated_texts = [tokenizer.decode(tokenizer.convert_tokens_to_ids(res.hypotheses[0]), skip_special_tokens=True) for res in results]
-            
-            # Detect English output in mBART translations (diagnostic)
-            if "mbart" in current_model_id.lower():
-                english_count = sum(1 for text in translated_texts if contains_english(text))
-                if english_count > 0:
-                    print(f"Warning: {english_count}/{len(translated_texts)} translations contain English text")
-                    print(f"Note: This is a known limitation of the current model training")
-            
-            # Track performance
-            elapsed = time.time() - start_time
-            request_times.append(elapsed)
-            
-            return {
-                "translated_texts": translated_texts, 
-                "model_used": current_model_id, 
-                "backend": "ctranslate2",
-                "processing_time_ms": round(elapsed * 1000, 2)
-            }
+        if shadow and model_texts and not request.cascade:
+            shadow.offer(model_texts, [t for t, p in zip(translated_texts, passes) if p != "skipped"], elapsed)
+        
+        response = {
+            "translated_texts": translated_texts, 
+            "model_used": loaded.model_id, 
+            "backend": loaded.backend,
+            "processing_time_ms": round(elapsed * 1000, 2),
+            "skipped_lines": len(request.texts) - len(model_texts),
+            "memory_lines": passes.count("memory"),
+            "decode_passes": passes
+        }
+        if request.cascade:
+            escalated = passes.count("heavy")
+            response.update({
+                "escalation_model": heavy.model_id,
+                "escalated_lines": escalated,
+                "escalated_fraction": round(escalated / len(model_texts), 4) if model_texts else 0.0
+            })
+        return negotiated_response(response, http_request)
+    except (Overloaded, DeadlineExceeded) as e:
+        raise overload_error(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Batch Translation Error: %s", e)
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+def translate_text(text: str, loaded: LoadedModel = None) -> str:
+    """
+    Translate a single line with the given model (default: the active one).
+    Blocking: callers on the event loop should run it in a worker thread.
+    """
+    loaded = loaded or active_model
+    if loaded.is_onnx or uses_two_pass(loaded) or (SEGMENT_MAX_CHARS and needs_segmentation(text, SEGMENT_MAX_CHARS)):
+        return translate_texts([text], loaded)[0]
+    with loaded.lease():
+        return _translate_text(text, loaded)
+
+def _translate_text(text: str, loaded: LoadedModel) -> str:
+    tokenizer = loaded.tokenizer
+    translator = loaded.translator
+    model = loaded.model
+    current_model_id = loaded.model_id
+    
+    if loaded.is_ct2:
+        target_prefix = None
+        beam_size = 1
+        max_decoding_length = 512
+        
+        if "mbart" in current_model_id.lower():
+            # Ensure languages are set
+            if not hasattr(tokenizer, 'tgt_lang') or not tokenizer.tgt_lang:
+                tokenizer.tgt_lang = "vi_VN"
+            if not hasattr(tokenizer, 'src_lang') or not tokenizer.src_lang:
+                tokenizer.src_lang = "zh_CN"
             
+            target_prefix = [["vi_VN"]]
+            beam_size = MBART_BEAM_SIZE  # Use beam search for better quality
+
+        input_ids = tokenizer.encode(text)
+        source_tokens = tokenizer.convert_ids_to_tokens(input_ids)
+        if log_tokens(logger):
+            logger.debug("Source tokens (first 10): %s", source_tokens[:10], extra={"text": text[:50]})
+        
+        # Simplified parameters for mBART to avoid repetition issues
+        translate_params = {
+            "source": [source_tokens],
+            "target_prefix": target_prefix,
+            "beam_size": beam_size
+        }
+        
+        # Only add max_decoding_length if not mBART
+        if "mbart" not in current_model_id.lower():
+            translate_params["max_decoding_length"] = max_decoding_length
+        
+        results = translator.translate_batch(**translate_params)
+        return tokenizer.decode(tokenizer.convert_tokens_to_ids(results[0].hypotheses[0]), skip_special_tokens=True)
+    else:
+        # Transformers Path (used for mBART)
+        device = model.device
+        inputs = tokenizer(text, return_tensors="pt", padding=True).to(device)
+        
+        # Special handling for mBART
+        generate_kwargs = {"max_length": 512}
+        if "mbart" in current_model_id.lower():
+            vi_token_id = tokenizer.convert_tokens_to_ids("vi_VN")
+            generate_kwargs.update({
+                "forced_bos_token_id": vi_token_id,
+                "num_beams": MBART_BEAM_SIZE,
+                "early_stopping": True,
+                "no_repeat_ngram_size": 3,
+                "repetition_penalty": 1.5
+            })
+        
+        with torch.inference_mode():
+            outputs = model.generate(**inputs, **generate_kwargs)
+        return tokenizer.decode(outputs[0], skip_special_tokens=True)
+
+def translate_live(text: str, prefix: list[str], loaded: LoadedModel) -> tuple[str, list[str], int]:
+    """
+    Greedy translation of a partial caption line whose output starts with prefix
+    (target tokens of an earlier translation, see live_captions.py).
+    Returns (translation, its target tokens, prefix tokens forced). ONNX models
+    decode without a prefix. Blocking: run it in a worker thread.
+    """
+    tokenizer = loaded.tokenizer
+    mbart = "mbart" in loaded.model_id.lower()
+    with loaded.lease():
+        source_ids = tokenizer.encode(text, truncation=True, max_length=512)
+        # Partial lines are short: stop runaway (repeating) decodes early
+        max_length = min(512, LIVE_MAX_LENGTH_RATIO * len(source_ids) + 10)
+        prefix = prefix[:max_length - 1]
+        
+        if loaded.is_onnx:
+            return _translate_texts([text], loaded, beam_size=1)[0], [], 0
+        
+        if loaded.is_ct2:
+            if mbart and not prefix:
+                prefix = ["vi_VN"]
+            result = loaded.translator.translate_batch(
+                [tokenizer.convert_ids_to_tokens(source_ids)],
+                target_prefix=[prefix] if prefix else None,
+                beam_size=1,
+                max_decoding_length=max_length
+            )[0]
+            tokens = result.hypotheses[0]  # Includes the prefix
         else:
-            # Transformers Path (used for mBART to avoid CT2 repetition issues)
-            device = model.device
-            inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=512).to(device)
-            
-            # Special handling for mBART to force Vietnamese output
-            generate_kwargs = {"max_length": 512}
-            if "mbart" in current_model_id.lower():
-                # Force Vietnamese output
-                vi_token_id = tokenizer.convert_tokens_to_ids("vi_VN")
+            model = loaded.model
+            generate_kwargs = {"max_length": max_length + 1, "num_beams": 1}  # + decoder start token
+            if mbart:
                 generate_kwargs.update({
-                    "forced_bos_token_id": vi_token_id,
-                    "num_beams": 5,
-                    "early_stopping": True,
+                    "forced_bos_token_id": tokenizer.convert_tokens_to_ids("vi_VN"),
                     "no_repeat_ngram_size": 3,
                     "repetition_penalty": 1.5
                 })
-                print(f"mBART (Transformers): Using forced_bos_token_id={vi_token_id} for Vietnamese")
-            
-            with torch.no_grad():
-                outputs = model.generate(**inputs, **generate_kwargs)
+            if prefix:
+                # The prefix goes through the decoder in one forward pass instead of one step per token
+                start = model.generation_config.decoder_start_token_id
+                generate_kwargs["decoder_input_ids"] = torch.tensor(
+                    [[start] + tokenizer.convert_tokens_to_ids(prefix)], device=model.device)
+            input_ids = torch.tensor([source_ids], device=model.device)
+            with torch.inference_mode():
+                output = model.generate(input_ids=input_ids, attention_mask=torch.ones_like(input_ids),
+                                        **generate_kwargs)[0].tolist()
+            ids = output[1:]
+            # A prefix must not end the sentence: drop EOS and padding
+            while ids and ids[-1] in (tokenizer.eos_token_id, tokenizer.pad_token_id):
+                ids.pop()
+            tokens = tokenizer.convert_ids_to_tokens(ids)
+        
+        translated = tokenizer.decode(tokenizer.convert_tokens_to_ids(tokens), skip_special_tokens=True)
+        return translated, tokens, len(prefix)
+
+def stream_segment(text: str, loaded: LoadedModel, on_token, cancelled: threading.Event) -> Optional[float]:
+    """
+    Greedy decode of one segment calling on_token(token_id) as each token is
+    generated, until the end or cancelled is set. Returns the mean log
+    probability of the tokens (None when the backend doesn't report it).
+    """
+    tokenizer = loaded.tokenizer
+    mbart = "mbart" in loaded.model_id.lower()
+    if loaded.is_ct2:
+        source = tokenizer.convert_ids_to_tokens(tokenizer.encode(text))
+        log_probs = []
+        for step in loaded.translator.generate_tokens(source, target_prefix=["vi_VN"] if mbart else None,
+                                                      max_decoding_length=512, return_log_prob=True):
+            if cancelled.is_set():
+                break  # Leaving the loop stops the decode
+            log_probs.append(step.log_prob)
+            on_token(step.token_id)
+        return sum(log_probs) / len(log_probs) if log_probs else None
+    
+    # Transformers: same settings as the greedy pass of _translate_texts
+    model = loaded.model
+    generate_kwargs = {"max_length": 512, "num_beams": 1}
+    if mbart:
+        generate_kwargs.update({
+            "forced_bos_token_id": tokenizer.convert_tokens_to_ids("vi_VN"),
+            "no_repeat_ngram_size": 3,
+            "repetition_penalty": 1.5
+        })
+    inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512).to(model.device)
+    with torch.inference_mode():
+        model.generate(**inputs, **generate_kwargs, streamer=TokenStreamer(on_token),
+                       stopping_criteria=StoppingCriteriaList([StopOnEvent(cancelled)]))
+    return None
+
+def translate_streaming(text: str, loaded: LoadedModel, emit, cancelled: threading.Event) -> tuple[str, str]:
+    """
+    Translate one line, calling emit(chunk) with text as it is decoded.
+    Blocking: run it in a worker thread.
+
+    Segments of long lines are decoded one after the other. For two-pass
+    models, a suspect greedy segment is decoded again with beam search, so the
+    returned (translation, pass) can differ from the streamed text. ONNX
+    models decode the whole line and emit it as one chunk.
+    """
+    if loaded.is_onnx:
+        translated, decode_pass = translate_texts([text], loaded, with_passes=True)[0]
+        emit(translated)
+        return translated, decode_pass
+    
+    segments, layout = split_blocks([text])
+    # Each segment is joined to the previous one by a space, or a line break for a new line
+    separators = [" " if i else "\n" for lines in layout for _, count in lines for i in range(count)]
+    separators[0] = ""
+    outputs, passes = [], []
+    with loaded.lease():
+        for segment, separator in zip(segments, separators):
+            if cancelled.is_set():
+                break
+            if separator:
+                emit(separator)
+            deltas = TextDeltas(loaded.tokenizer)
             
-            translated_texts = tokenizer.batch_decode(outputs, skip_special_tokens=True)
-            return {"translated_texts": translated_texts, "model_used": current_model_id, "backend": "transformers"}
+            def on_token(token_id):
+                chunk = deltas.push(token_id)
+                if chunk:
+                    emit(chunk)
             
-        raise HTTPException(status_code=500, detail=str(e))
+            score = stream_segment(segment, loaded, on_token, cancelled)
+            output = deltas.finish()
+            decode_pass = "single"
+            if uses_two_pass(loaded) and not cancelled.is_set():
+                reason = suspect_reason(segment, output, score, RETRY_MIN_SCORE)
+                if reason:
+                    decode_stats[reason] += 1
+                    output = _translate_texts([segment], loaded)[0]
+                decode_pass = "beam" if reason else "greedy"
+                decode_stats[f"{decode_pass}_lines"] += 1
+            outputs.append(output)
+            passes.append(decode_pass)
+    
+    if len(outputs) < len(segments):
+        return " ".join(outputs), "cancelled"  # The client is gone: the result is never sent
+    return reassemble(outputs, layout)[0], "beam" if "beam" in passes else passes[0]
+
+def libre_error(message: str, status_code: int, headers: dict = None) -> JSONResponse:
+    """Error in LibreTranslate's format ({"error": ...})."""
+    return JSONResponse({"error": message}, status_code=status_code, headers=headers)
+
+async def libre_translate(request: LibreTranslateRequest, http_request: Request):
+    """
+    LibreTranslate-compatible translation: q is one line or a list of lines,
+    all decoded as one batch with LIBRE_MODEL. translatedText has the same shape as q.
+    """
+    arrival = time.monotonic()
+    texts = request.q if isinstance(request.q, list) else [request.q]
+    if not any(t.strip() for t in texts):
+        return libre_error("Invalid request: missing q parameter", 400)
+    if request.source not in LIBRE_SOURCES:
+        return libre_error(f"{request.source} is not supported (source must be one of: {', '.join(LIBRE_SOURCES)})", 400)
+    if request.target not in LIBRE_TARGETS:
+        return libre_error(f"{request.target} is not supported (target must be one of: {', '.join(LIBRE_TARGETS)})", 400)
+    
+    try:
+        loaded = await get_pooled_model(LIBRE_MODEL)
+        translated, _, _ = await decode_lines(
+            texts, functools.partial(translate_texts, loaded=loaded, with_passes=True),
+            http_request, request_deadline(arrival, None), loaded
+        )
+    except (Overloaded, DeadlineExceeded) as e:
+        error = overload_error(e)
+        return libre_error(error.detail, error.status_code, error.headers)
+    except HTTPException as e:
+        return libre_error(str(e.detail), e.status_code)
     except Exception as e:
-        print(f"Batch Translation Error: {e}")
-        import traceback
-        traceback.print_exc()
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+        logger.exception("LibreTranslate Error: %s", e)
+        return libre_error(f"Internal Server Error: {str(e)}", 500)
+    
+    return {"translatedText": translated if isinstance(request.q, list) else translated[0]}
 
 @app.post("/translate") 
-async def translate(request: TranslationRequest):
-    global model, translator, tokenizer, current_model_id, is_ct2_model
+async def translate(http_request: Request):
+    global tokenizer, current_model_id, is_ct2_model
+    
+    # LibreTranslate clients send {"q": ...}; the editor's own format is {"text": ...}
+    payload = await read_payload(http_request)
+    if isinstance(payload, dict) and "q" in payload:
+        return await libre_translate(validate_payload(payload, LibreTranslateRequest), http_request)
+    request = validate_payload(payload, TranslationRequest)
     
+    arrival = time.monotonic()
     target_model = request.model_id
     if target_model and target_model != current_model_id:
         await load_model(target_model)
 
-    if (not model and not translator):
+    loaded = active_model
+    if loaded is None:
         raise HTTPException(status_code=503, detail="Model not loaded.")
+    glossary = project_glossary(request.project_id)
+
+    outputs, _, kinds = prefilter([request.text])
+    prefilter_stats.update(kinds)
+    if outputs[0] is not None:
+        return {
+            "translated_text": outputs[0],
+            "model_used": loaded.model_id,
+            "backend": loaded.backend,
+            "skipped_lines": 1
+        }
 
     try:
-        text = request.text
-        
-        if is_ct2_model:
-            target_prefix = None
-            beam_size = 1
-            max_decoding_length = 512
-            
-            if "mbart" in current_model_id.lower():
-                # Ensure languages are set
-                if not hasattr(tokenizer, 'tgt_lang') or not tokenizer.tgt_lang:
-                    tokenizer.tgt_lang = "vi_VN"
-                if not hasattr(tokenizer, 'src_lang') or not tokenizer.src_lang:
-                    tokenizer.src_lang = "zh_CN"
-                
-                target_prefix = [["vi_VN"]]
-                beam_size = 5  # Use beam search for better quality
+        start_time = time.time()
+        if glossary:
+            translate_func = functools.partial(translate_texts, loaded=loaded, with_passes=True)
+            translated_text = (await admission.run(
+                translate_with_glossary, [request.text], translate_func, glossary,
+                tokens=estimate_tokens([request.text]),
+                deadline=request_deadline(arrival, request.deadline_ms)
+            ))[0][0]
+        else:
+            translated_text = await admission.run(
+                translate_text, request.text, loaded,
+                tokens=estimate_tokens([request.text]),
+                deadline=request_deadline(arrival, request.deadline_ms)
+            )
+        if shadow:
+            shadow.offer([request.text], [translated_text], time.time() - start_time)
+        return {
+            "translated_text": translated_text,
+            "model_used": loaded.model_id,
+            "backend": loaded.backend,
+            "skipped_lines": 0
+        }
+    except (Overloaded, DeadlineExceeded) as e:
+        raise overload_error(e)
+    except Exception as e:
+        logger.exception("Translation Error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
-            print(f"Tokenizing text: {text[:50]}...")
-            input_ids = tokenizer.encode(text)
-            source_tokens = tokenizer.convert_ids_to_tokens(input_ids)
-            print(f"Source tokens (first 10): {source_tokens[:10]}")
-            
-            # Simplified parameters for mBART to avoid repetition issues
-            translate_params = {
-                "source": [source_tokens],
-                "target_prefix": target_prefix,
-                "beam_size": beam_size
-            }
+@app.post("/translate/stream")
+async def translate_stream(http_request: Request):
+    """
+    /translate with the translation streamed as server-sent events while it is
+    decoded: {"text": chunk} events, then {"done": true, "translated_text", ...}.
+    The done event has the final translation (see translate_streaming) and the
+    time to first chunk and total latency.
+    """
+    arrival = time.monotonic()
+    request = await read_body(http_request, TranslationRequest)
+    if request.model_id and request.model_id != current_model_id:
+        await load_model(request.model_id)
+    loaded = active_model
+    if loaded is None:
+        raise HTTPException(status_code=503, detail="Model not loaded.")
+    glossary = project_glossary(request.project_id)
+    text = request.text
+    stream_stats["requests"] += 1
+    start_time = time.monotonic()  # Latencies are measured once the model is ready
+    
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    cancelled = threading.Event()
+    
+    def emit(chunk: str):
+        loop.call_soon_threadsafe(events.put_nowait, ("text", chunk))
+    
+    def translate_line():
+        outputs, _, kinds = prefilter([text])
+        prefilter_stats.update(kinds)
+        if outputs[0] is not None:
+            translated, decode_pass = outputs[0], "skipped"
+        elif glossary and glossary.protect(text)[1]:
+            # Placeholders are only restored once the line is complete: send it whole
+            translate_func = functools.partial(translate_texts, loaded=loaded, with_passes=True)
+            translated, decode_pass = translate_with_glossary([text], translate_func, glossary)[0]
+        else:
+            return translate_streaming(text, loaded, emit, cancelled)
+        stream_stats["unstreamed_lines"] += 1
+        emit(translated)
+        return translated, decode_pass
+    
+    async def run():
+        try:
+            result = await admission.run(translate_line, tokens=estimate_tokens([text]),
+                                         deadline=request_deadline(arrival, request.deadline_ms))
+            events.put_nowait(("done", result))
+        except Exception as e:
+            events.put_nowait(("error", e))
+    
+    work = asyncio.create_task(run())
+    # Rejections and early failures get a status code; later errors are sent as an error event
+    first = await events.get()
+    if first[0] == "error":
+        if isinstance(first[1], (Overloaded, DeadlineExceeded)):
+            raise overload_error(first[1])
+        if isinstance(first[1], HTTPException):
+            raise first[1]
+        logger.error("Streaming Translation Error: %s", first[1], exc_info=first[1])
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(first[1])}")
+    first_chunk_s = time.monotonic() - start_time if first[0] == "text" else None
+    
+    async def event_stream():
+        event = first
+        try:
+            while True:
+                kind, value = event
+                if kind == "text":
+                    yield f"data: {json.dumps({'text': value})}\n\n"
+                elif kind == "error":
+                    logger.error("Streaming Translation Error: %s", value, exc_info=value)
+                    yield f"data: {json.dumps({'error': str(value)})}\n\n"
+                    return
+                else:
+                    translated, decode_pass = value
+                    total_s = time.monotonic() - start_time
+                    stream_latency.record(first_chunk_s, total_s)
+                    request_times.append(total_s)
+                    done = {
+                        "done": True,
+                        "translated_text": translated,
+                        "model_used": loaded.model_id,
+                        "backend": loaded.backend,
+                        "decode_pass": decode_pass,
+                        "ttft_ms": round(first_chunk_s * 1000, 2) if first_chunk_s is not None else None,
+                        "total_ms": round(total_s * 1000, 2)
+                    }
+                    yield f"data: {json.dumps(done)}\n\n"
+                    return
+                event = await events.get()
+        finally:
+            if not work.done():
+                # Client disconnected: stop decoding at the next token
+                cancelled.set()
+                stream_stats["cancelled"] += 1
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+async def job_worker():
+    """
+    Drain the job queue in the background, independent of client connections.
+    Chunks of different jobs for the same model are decoded together so every
+    call runs at full batch size; results are checkpointed per chunk.
+    """
+    while True:
+        try:
+            job_wakeup.clear()
+            costs = {m: activation_cost(m) for m in await asyncio.to_thread(job_store.queued_models)}
+            cheap = [m for m, cost in costs.items() if cost is not None and cost <= JOB_CHEAP_SWITCH_S]
+            claim = await asyncio.to_thread(job_store.claim, JOB_BATCH_LINES, prefer=[current_model_id, *cheap],
+                                            max_delay=JOB_MAX_REORDER_S)
+            if claim is None:
+                try:
+                    await asyncio.wait_for(job_wakeup.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    pass
+                continue
             
-            # Only add max_decoding_length if not mBART
-            if "mbart" not in current_model_id.lower():
-                translate_params["max_decoding_length"] = max_decoding_length
+            chunks = claim["chunks"]
+            job_ids = {c["job_id"] for c in chunks}
+            model_id = claim["model_id"]
             
-            results = translator.translate_batch(**translate_params)
-            translated_text = tokenizer.decode(tokenizer.convert_tokens_to_ids(results[0].hypotheses[0]), skip_special_tokens=True)
-            return {"translated_text": translated_text, "model_used": current_model_id, "backend": "ctranslate2"}
-        else:
-            # Transformers Path (used for mBART)
-            device = model.device
-            inputs = tokenizer(text, return_tensors="pt", padding=True).to(device)
+            # A job pinned to another model decodes with it from the pool: interactive traffic
+            # keeps the active model
+            loaded = active_model
+            if model_id and model_id != current_model_id:
+                try:
+                    loaded = await get_pooled_model(model_id)
+                except Exception as e:
+                    logger.warning("Job worker could not load %s: %s", model_id, e)
+                    for job_id in job_ids:
+                        await asyncio.to_thread(job_store.fail, job_id, f"Failed to load requested model: {model_id}")
+                    continue
             
-            # Special handling for mBART
-            generate_kwargs = {"max_length": 512}
-            if "mbart" in current_model_id.lower():
-                vi_token_id = tokenizer.convert_tokens_to_ids("vi_VN")
-                generate_kwargs.update({
-                    "forced_bos_token_id": vi_token_id,
-                    "num_beams": 5,
-                    "early_stopping": True,
-                    "no_repeat_ngram_size": 3,
-                    "repetition_penalty": 1.5
-                })
+            if loaded is None:
+                for job_id in job_ids:
+                    await asyncio.to_thread(job_store.fail, job_id, "Model not loaded.")
+                continue
             
-            with torch.no_grad():
-                outputs = model.generate(**inputs, **generate_kwargs)
-            translated_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-            return {"translated_text": translated_text, "model_used": current_model_id, "backend": "transformers"}
+            # Only lines the pre-filter can't resolve are decoded
+            sources = [line for c in chunks for line in c["source"]]
+            outputs, model_indices, kinds = prefilter(sources)
+            prefilter_stats.update(kinds)
+            lines = [sources[i] for i in model_indices]
+            try:
+                start_time = time.time()
+                with request_context():  # Debug lines of a chunk are sampled like those of a request
+                    translated = await admission.run_background(translate_texts, lines, loaded) if lines else []
+                request_times.append(time.time() - start_time)
+            except Exception as e:
+                logger.exception("Job Translation Error: %s", e)
+                for job_id in job_ids:
+                    await asyncio.to_thread(job_store.fail, job_id, f"Internal Server Error: {str(e)}")
+                continue
             
-        raise HTTPException(status_code=500, detail=str(e))
+            results = iter(merge(outputs, model_indices, translated))
+            for c in chunks:
+                result = [next(results) for _ in c["source"]]
+                await asyncio.to_thread(job_store.complete_chunk, c["job_id"], c["idx"], result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Never let the worker die; back off briefly and keep draining
+            logger.exception("Job worker error: %s", e)
+            await asyncio.sleep(1)
+
+def submit_job(texts: list[str], model_id: Optional[str]):
+    if job_store.pending_lines() + len(texts) > MAX_PENDING_JOB_LINES:
+        admission.stats["rejected_jobs"] += 1
+        raise HTTPException(
+            status_code=429,
+            detail="Job queue is full",
+            headers={"Retry-After": str(admission.retry_after())}
+        )
+    job = job_store.submit(texts, model_id or current_model_id)
+    job_wakeup.set()
+    return job
+
+def get_job_or_404(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@app.post("/jobs")
+async def create_job(http_request: Request):
+    request = await read_body(http_request, JobRequest)
+    return submit_job(request.texts, request.model_id)
+
+@app.post("/jobs/upload")
+async def create_job_from_file(file: UploadFile = File(...), model_id: Optional[str] = Form(None)):
+    content = await file.read()
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded text")
+    return submit_job(text.splitlines(), model_id)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return get_job_or_404(job_id)
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    get_job_or_404(job_id)
+    
+    async def event_stream():
+        last_state = None
+        while True:
+            job = job_store.get(job_id)
+            if job is None:
+                break
+            state = (job["status"], job["done_chunks"])
+            if state != last_state:
+                yield f"data: {json.dumps(job)}\n\n"
+                last_state = state
+            if job["status"] in TERMINAL_STATES:
+                break
+            await asyncio.sleep(JOB_EVENT_INTERVAL)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, http_request: Request):
+    job = get_job_or_404(job_id)
+    if job["status"] != JOB_COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job['status']}")
+    return negotiated_response({
+        "job_id": job_id,
+        "translated_texts": job_store.results(job_id),
+        "model_used": job["model_id"]
+    }, http_request)
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    get_job_or_404(job_id)
+    if not job_store.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} has already finished")
+    return get_job_or_404(job_id)
+
+def get_live_session_or_404(session_id: str):
+    session = live_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Live session {session_id} not found")
+    return session
+
+@app.post("/live/sessions")
+async def create_live_session(http_request: Request):
+    request = await read_body(http_request, LiveSessionRequest)
+    model_id = request.model_id or current_model_id
+    if model_id is None:
+        raise HTTPException(status_code=503, detail="Model not loaded.")
+    project_glossary(request.project_id)  # 400 on an invalid project id
+    try:
+        # Loaded now (without activating it) so the first update doesn't wait for it
+        await get_pooled_model(model_id)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Translation Error: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to load requested model: {e}")
+    return live_sessions.create(model_id, request.project_id).describe()
+
+@app.get("/live/sessions/{session_id}")
+async def get_live_session(session_id: str):
+    return get_live_session_or_404(session_id).describe()
+
+@app.post("/live/sessions/{session_id}")
+async def update_live_session(session_id: str, http_request: Request):
+    """
+    Translate the current text of a caption line. Partial updates reuse the
+    previous translation as the decoder prefix where it is still valid; a final
+    update is translated in full (with the project's glossary) and ends the line.
+    """
+    arrival = time.monotonic()
+    request = await read_body(http_request, LiveUpdateRequest)
+    session = get_live_session_or_404(session_id)
+    update = session.submit()
+    live_stats["updates"] += 1
+    
+    async with session.lock:
+        response = {
+            "session_id": session_id,
+            "source_text": session.source,
+            "translated_text": session.translation,
+            "final": False,
+            "superseded": False,
+            "reused_tokens": 0,
+            "decoded_tokens": 0,
+            "model_used": session.model_id,
+            "processing_time_ms": 0.0
+        }
+        # Partial updates replaced while waiting are answered without decoding (final ones never are)
+        if not request.final and session.superseded(update):
+            live_stats["coalesced_updates"] += 1
+            response["superseded"] = True
+            return negotiated_response(response, http_request)
+        if not request.final and request.text == session.source:
+            live_stats["unchanged_updates"] += 1
+            return negotiated_response(response, http_request)
+        
+        try:
+            loaded = await get_pooled_model(session.model_id)
+            deadline = request_deadline(arrival, request.deadline_ms)
+            start_time = time.time()
+            outputs, _, kinds = prefilter([request.text])
+            prefilter_stats.update(kinds)
+            if outputs[0] is not None:
+                translated, tokens, reused = outputs[0], [], 0
+            elif request.final:
+                translate_func = functools.partial(translate_texts, loaded=loaded, with_passes=True)
+                glossary = project_glossary(session.project_id)
+                if glossary:
+                    translate_func = functools.partial(translate_with_glossary, translate_func=translate_func,
+                                                       glossary=glossary)
+                translated = (await admission.run(
+                    translate_func, [request.text],
+                    tokens=estimate_tokens([request.text]),
+                    deadline=deadline
+                ))[0][0]
+                tokens, reused = [], 0
+            else:
+                translated, tokens, reused = await admission.run(
+                    translate_live, request.text, session.reusable_prefix(request.text), loaded,
+                    tokens=estimate_tokens([request.text]),
+                    deadline=deadline
+                )
+            elapsed = time.time() - start_time
+        except (Overloaded, DeadlineExceeded) as e:
+            raise overload_error(e)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.exception("Live Translation Error: %s", e)
+            raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+        
+        request_times.append(elapsed)
+        response.update({
+            "source_text": request.text,
+            "translated_text": translated,
+            "final": request.final,
+            "reused_tokens": reused,
+            "decoded_tokens": len(tokens) - reused,
+            "processing_time_ms": round(elapsed * 1000, 2)
+        })
+        if request.final:
+            live_stats["final_updates"] += 1
+            session.reset()
+        else:
+            live_stats["decoded_updates"] += 1
+            live_stats["reused_tokens"] += reused
+            live_stats["decoded_tokens"] += len(tokens) - reused
+            session.record(request.text, translated, tokens, reused)
+        return negotiated_response(response, http_request)
+
+@app.delete("/live/sessions/{session_id}")
+async def close_live_session(session_id: str):
+    if not live_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Live session {session_id} not found")
+    return {"closed": session_id}
+
+@app.get("/glossaries/{project_id}")
+async def get_glossary(project_id: str):
+    glossary = project_glossary(project_id)
+    if glossary is None:
+        raise HTTPException(status_code=404, detail=f"No glossary for project {project_id}")
+    return {"project_id": project_id, "entries": glossary.entries}
+
+@app.put("/glossaries/{project_id}")
+async def put_glossary(project_id: str, request: GlossaryRequest):
+    """Replace the project's glossary."""
+    try:
+        glossary = await asyncio.to_thread(glossary_store.put, project_id, [e.model_dump() for e in request.entries])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"project_id": project_id, "entries": glossary.entries}
+
+@app.delete("/glossaries/{project_id}")
+async def delete_glossary(project_id: str):
+    try:
+        deleted = glossary_store.delete(project_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"No glossary for project {project_id}")
+    return {"project_id": project_id, "deleted": True}
+
+@app.post("/tm/lookup")
+async def memory_lookup(request: MemoryLookupRequest):
+    """Best translation-memory match per line (None below min_score), as suggestions."""
+    if translation_memory is None:
+        raise HTTPException(status_code=503, detail="Translation memory not available.")
+    scope = memory_scope(request.model_id or current_model_id, request.project_id, project_glossary(request.project_id))
+    min_score = TM_MIN_SCORE if request.min_score is None else request.min_score
+    matches = await asyncio.to_thread(translation_memory.lookup_batch, scope, request.texts, min_score)
+    return {"matches": matches, "auto_accept": TM_AUTO_ACCEPT}
+
+@app.post("/tm/entries")
+async def memory_add(request: MemoryEntriesRequest):
+    """Store approved translations (e.g. edits made in the editor)."""
+    if translation_memory is None:
+        raise HTTPException(status_code=503, detail="Translation memory not available.")
+    scope = memory_scope(request.model_id or current_model_id, request.project_id, project_glossary(request.project_id))
+    stored = await asyncio.to_thread(translation_memory.add, scope, [(e.source, e.target) for e in request.entries])
+    return {"stored": stored, "segments": len(translation_memory)}
 
 @app.get("/versions")
 async def get_versions():
-    models = get_available_models()
+    # get_available_models() refreshes the catalog (a directory scan); keep both off the event loop
+    models, entries = await asyncio.to_thread(lambda: (get_available_models(), catalog.entries()))
+    for entry in entries:
+        loaded = model_pool.get(entry["model_id"]) if entry["source"] == "models" else None
+        if loaded is None:
+            entry["state"] = "available"
+        else:
+            entry["state"] = "active" if loaded is active_model else "parked" if loaded.parked else "loaded"
+            entry["resident_mb"] = loaded.describe()["resident_mb"] or entry["resident_mb"]
+        entry["activation_cost_s"] = activation_cost(entry["model_id"]) if entry["source"] == "models" else None
     return {
         "available_versions": models,
-        "current_version": current_model_id
+        "current_version": current_model_id,
+        "models": entries
     }
 
 @app.post("/set_version")
@@ -494,6 +1920,84 @@ async def set_version(request: VersionRequest):
     else:
         raise HTTPException(status_code=500, detail=f"Failed to load model {request.version}")
 
+async def enable_shadow(candidate: str, sample_rate: float):
+    """Load a candidate model with a small thread budget and start mirroring traffic to it."""
+    global shadow
+    loaded = await asyncio.to_thread(
+        load_model_bundle, candidate, model_base_path(candidate),
+        inter_threads=SHADOW_THREADS, intra_threads=SHADOW_THREADS
+    )
+    disable_shadow()
+    shadow = ShadowEvaluator(
+        loaded, translate_texts,
+        is_busy=lambda: admission.waiting > 0,
+        sample_rate=sample_rate
+    )
+    shadow.start()
+    logger.info("Shadow evaluation of %s enabled (sample_rate=%s)", candidate, sample_rate)
+
+def disable_shadow():
+    global shadow
+    if shadow:
+        shadow.stop()
+        shadow = None
+
+@app.post("/shadow")
+async def start_shadow(request: ShadowRequest):
+    sample_rate = SHADOW_SAMPLE_RATE if request.sample_rate is None else request.sample_rate
+    if not 0 <= sample_rate <= 1:
+        raise HTTPException(status_code=400, detail="sample_rate must be between 0 and 1")
+    try:
+        await enable_shadow(request.candidate, sample_rate)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load shadow model {request.candidate}: {e}")
+    return shadow.report()
+
+@app.get("/shadow")
+async def get_shadow():
+    if not shadow:
+        return {"enabled": False}
+    return {"enabled": True, **shadow.report()}
+
+@app.delete("/shadow")
+async def stop_shadow():
+    disable_shadow()
+    return {"enabled": False}
+
+@app.get("/metrics")
+async def metrics():
+    pending_lines = await asyncio.to_thread(job_store.pending_lines) if job_store else 0
+    return {
+        "admission": admission.snapshot(),
+        "models": [loaded.describe() for loaded in model_pool.values()],
+        "jobs": {
+            "pending_lines": pending_lines,
+            "max_pending_lines": MAX_PENDING_JOB_LINES
+        },
+        "segmentation": {"max_chars": SEGMENT_MAX_CHARS, **segment_stats},
+        "cascade": {
+            "fast_model": CASCADE_FAST_MODEL,
+            "heavy_model": CASCADE_HEAVY_MODEL,
+            "min_score": CASCADE_MIN_SCORE,
+            **cascade_stats,
+            "escalated_fraction": round(cascade_stats["escalated_lines"] / cascade_stats["lines"], 4) if cascade_stats["lines"] else None
+        },
+        "two_pass": {"enabled": bool(TWO_PASS_DECODING), "min_score": RETRY_MIN_SCORE, **decode_stats},
+        "glossary": dict(glossary_stats),
+        "live": {"sessions": len(live_sessions), "mask_tokens": LIVE_MASK_TOKENS, **live_stats},
+        "streaming": {**stream_stats, **stream_latency.snapshot()},
+        "memory": {
+            "enabled": translation_memory is not None,
+            "segments": len(translation_memory) if translation_memory is not None else 0,
+            "auto_accept": TM_AUTO_ACCEPT,
+            **memory_stats
+        },
+        "prefilter": {"skipped_lines": sum(n for kind, n in prefilter_stats.items() if kind != KIND_MODEL),
+                      **prefilter_stats}
+    }
+
 @app.get("/health")
 async def health():
     # Get memory usage
@@ -502,16 +2006,20 @@ async def health():
     
     # Calculate average request time
     avg_request_time = sum(request_times) / len(request_times) if request_times else 0
+    pending_lines = await asyncio.to_thread(job_store.pending_lines) if job_store else 0
     
     return {
         "status": "ok", 
-        "model_loaded": (model is not None or translator is not None),
-        "backend": "ctranslate2" if is_ct2_model else ("transformers" if model else "none"),
+        "model_loaded": active_model is not None,
+        "backend": active_model.backend if active_model else "none",
         "current_version": current_model_id,
+        "model_load_time_s": round(active_model.load_time, 2) if active_model and active_model.load_time else None,
         "cpu_threads": CPU_THREADS,
         "memory_mb": round(memory_mb, 2),
         "avg_request_time_ms": round(avg_request_time * 1000, 2) if avg_request_time else None,
-        "total_requests": len(request_times)
+        "total_requests": len(request_times),
+        "pending_job_lines": pending_lines,
+        "transport": available_formats()
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,209 @@
+"""
+Tiny randomly initialized models for CPU tests and benchmarks.
+
+The repo ships tokenizers and configs but no weights, so nothing can be loaded
+without the real checkpoints. This script builds stand-ins with the same
+architectures and tokenizer classes as the real models:
+- opus: MarianMTModel with a MarianTokenizer (source.spm, target.spm, vocab.json)
+- mbart: MBartForConditionalGeneration with an MBart50Tokenizer (zh_CN -> vi_VN)
+- nllb: M2M100ForConditionalGeneration with an NllbTokenizer (zho_Hans -> vie_Latn)
+
+All three use one SentencePiece model of a few hundred pieces trained on
+ModelBenchmark's Chinese test sentences and some Vietnamese ones. The models
+have 2 layers of width 32 and seeded random weights, so they are rebuilt
+identically, load in well under a second and translate into nonsense. Random
+weights rarely produce the end-of-sentence token, so most lines decode up to
+the length limit: timings measured on them are a worst case for output length.
+Each model is saved as <output>/<id>/final_model like the real ones and
+converted to <output>/<id>_ct2 with convert.py.
+
+Usage:
+    python make_fixtures.py --output /tmp/fixtures/models
+    MODELS_PATH=/tmp/fixtures/models uvicorn main:app
+    python benchmark.py --models-path /tmp/fixtures/models --all-models
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import tempfile
+
+import sentencepiece as spm
+import torch
+from transformers import (
+    M2M100Config, M2M100ForConditionalGeneration, MarianConfig, MarianMTModel, MarianTokenizer,
+    MBart50Tokenizer, MBartConfig, MBartForConditionalGeneration, NllbTokenizer
+)
+
+from benchmark import ModelBenchmark
+from convert import convert_model
+
+FIXTURE_MODELS = ("opus", "mbart", "nllb")
+SEED = 0
+VOCAB_SIZE = 256  # Upper bound; the corpus yields fewer pieces
+MAX_LENGTH = 32  # Saved generation length limit, for callers that don't pass their own
+
+# Model size shared by all fixtures
+DIMENSIONS = dict(
+    d_model=32,
+    encoder_layers=2,
+    decoder_layers=2,
+    encoder_attention_heads=4,
+    decoder_attention_heads=4,
+    encoder_ffn_dim=64,
+    decoder_ffn_dim=64,
+    max_position_embeddings=512
+)
+
+VIETNAMESE_SENTENCES = [
+    "Xin chào, thế giới!",
+    "Hôm nay thời tiết rất đẹp.",
+    "Tôi thích học tiếng Trung.",
+    "Đây là một câu thử nghiệm.",
+    "Trí tuệ nhân tạo đang thay đổi thế giới.",
+    "Học máy là một lĩnh vực rất thú vị.",
+    "Mô hình học sâu cần rất nhiều dữ liệu để huấn luyện.",
+    "Xử lý ngôn ngữ tự nhiên là một nhánh quan trọng của trí tuệ nhân tạo.",
+    "Hệ thống dịch có thể giúp mọi người vượt qua rào cản ngôn ngữ.",
+    "Hệ thống quản lý phụ đề có thể tự động dịch và đồng bộ tệp phụ đề."
+]
+
+
+def train_sentencepiece(path: str):
+    """Train the shared SentencePiece model on the built-in corpus and save it to path."""
+    model = io.BytesIO()
+    spm.SentencePieceTrainer.train(
+        sentence_iterator=iter(ModelBenchmark.TEST_SENTENCES + VIETNAMESE_SENTENCES),
+        model_writer=model,
+        vocab_size=VOCAB_SIZE,
+        hard_vocab_limit=False,
+        character_coverage=1.0,
+        model_type="unigram",
+        unk_id=0, bos_id=-1, eos_id=1, pad_id=-1,
+        minloglevel=2
+    )
+    with open(path, "wb") as f:
+        f.write(model.getvalue())
+
+
+def build_opus(spm_path: str, work_dir: str):
+    """Marian: separate source/target SentencePiece files and a shared vocab.json (pad last, like opus-mt)."""
+    processor = spm.SentencePieceProcessor(model_file=spm_path)
+    vocab = {"</s>": 0, "<unk>": 1}
+    for i in range(processor.get_piece_size()):
+        vocab.setdefault(processor.id_to_piece(i), len(vocab))
+    vocab["<pad>"] = len(vocab)
+    vocab_path = os.path.join(work_dir, "vocab.json")
+    with open(vocab_path, "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    tokenizer = MarianTokenizer(source_spm=spm_path, target_spm=spm_path, vocab=vocab_path)
+
+    config = MarianConfig(
+        vocab_size=len(vocab),
+        pad_token_id=vocab["<pad>"],
+        eos_token_id=vocab["</s>"],
+        decoder_start_token_id=vocab["<pad>"],
+        forced_eos_token_id=vocab["</s>"],
+        activation_function="swish",
+        scale_embedding=True,
+        share_encoder_decoder_embeddings=True,
+        **DIMENSIONS
+    )
+    return MarianMTModel(config), tokenizer
+
+
+def build_mbart(spm_path: str, work_dir: str):
+    """mBART-50: fairseq ids (<s> <pad> </s> <unk>, then the pieces) followed by language codes."""
+    shutil.copy(spm_path, os.path.join(work_dir, "sentencepiece.bpe.model"))
+    tokenizer = MBart50Tokenizer.from_pretrained(work_dir, src_lang="zh_CN", tgt_lang="vi_VN", bos_token="<s>")
+    vi_token_id = tokenizer.convert_tokens_to_ids("vi_VN")
+
+    config = MBartConfig(
+        vocab_size=len(tokenizer),
+        pad_token_id=tokenizer.pad_token_id,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        decoder_start_token_id=tokenizer.eos_token_id,
+        forced_eos_token_id=tokenizer.eos_token_id,
+        scale_embedding=True,
+        normalize_before=True,  # Read by the CTranslate2 converter
+        tokenizer_class="MBart50Tokenizer",
+        **DIMENSIONS
+    )
+    model = MBartForConditionalGeneration(config)
+    model.generation_config.forced_bos_token_id = vi_token_id
+    return model, tokenizer
+
+
+def build_nllb(spm_path: str, work_dir: str):
+    """NLLB-200 (M2M100 architecture) with its language codes after the pieces."""
+    from transformers.models.nllb.tokenization_nllb import FAIRSEQ_LANGUAGE_CODES
+    shutil.copy(spm_path, os.path.join(work_dir, "sentencepiece.bpe.model"))
+    tokenizer = NllbTokenizer.from_pretrained(work_dir, src_lang="zho_Hans", tgt_lang="vie_Latn",
+                                              extra_special_tokens=FAIRSEQ_LANGUAGE_CODES)
+
+    config = M2M100Config(
+        vocab_size=len(tokenizer),
+        pad_token_id=tokenizer.pad_token_id,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        decoder_start_token_id=tokenizer.eos_token_id,
+        activation_function="relu",
+        scale_embedding=True,
+        **DIMENSIONS
+    )
+    return M2M100ForConditionalGeneration(config), tokenizer
+
+
+BUILDERS = {"opus": build_opus, "mbart": build_mbart, "nllb": build_nllb}
+
+
+def make_fixture(model_id: str, output_dir: str, spm_path: str) -> str:
+    """Build one fixture as <output_dir>/<model_id>/final_model. Returns that path."""
+    torch.manual_seed(SEED)
+    final_model = os.path.join(output_dir, model_id, "final_model")
+    with tempfile.TemporaryDirectory() as work_dir:
+        model, tokenizer = BUILDERS[model_id](spm_path, work_dir)
+        model.generation_config.max_length = MAX_LENGTH
+        if os.path.exists(final_model):
+            shutil.rmtree(final_model)
+        model.save_pretrained(final_model)
+        tokenizer.save_pretrained(final_model)
+    return final_model
+
+
+def make_fixtures(output_dir: str, models=FIXTURE_MODELS, ct2: bool = True,
+                  quantization: str = "int8") -> dict:
+    """
+    Build the fixture models in output_dir (and their CTranslate2 conversions).
+    Returns {model_id: final_model path}. Raises RuntimeError if a conversion fails.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        spm_path = os.path.join(work_dir, "fixture.spm")
+        train_sentencepiece(spm_path)
+        for model_id in models:
+            paths[model_id] = make_fixture(model_id, output_dir, spm_path)
+            print(f"Built {model_id} fixture at {paths[model_id]}")
+            if ct2 and not convert_model(model_id, quantization, force=True, base_models_path=output_dir):
+                raise RuntimeError(f"CTranslate2 conversion of the {model_id} fixture failed")
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build tiny random models for CPU tests")
+    parser.add_argument("--output", required=True, help="Models directory to create (use as MODELS_PATH)")
+    parser.add_argument("--models", default=",".join(FIXTURE_MODELS),
+                        help=f"Comma-separated fixtures to build (default: {','.join(FIXTURE_MODELS)})")
+    parser.add_argument("--no-ct2", action="store_true", help="Skip the CTranslate2 conversions")
+    parser.add_argument("--quantization", default="int8", help="CTranslate2 quantization (default: int8)")
+    args = parser.parse_args()
+
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    unknown = [m for m in models if m not in BUILDERS]
+    if unknown:
+        parser.error(f"Unknown fixtures: {', '.join(unknown)} (choose from {', '.join(FIXTURE_MODELS)})")
+    make_fixtures(args.output, models, ct2=not args.no_ct2, quantization=args.quantization)
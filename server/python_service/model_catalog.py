@@ -0,0 +1,302 @@
+"""
+Cached index of the models in models/ and versions/.
+
+Instead of listing the model folders on every /versions call, the catalog
+keeps one entry per model and rebuilds it only when its files change. An entry
+is stale when its signature changes. The signature is the mtime of the model
+directory and of its _ct2/_onnx siblings, plus the size and mtime of the files
+directly in them. A signature check costs a few stat() calls per model, and
+runs at most once every check_interval seconds.
+
+Each entry records:
+- which backends have files: Transformers weights, a CTranslate2 conversion
+  or an ONNX export
+- the on-disk size and compute type of each backend
+- the backend load_model_bundle() would pick
+Once a model has been loaded, the entry also records the measured load time,
+warm-up time and resident memory of that backend. Until then, the load time
+is estimated from the size on disk.
+
+The index and the measurements are saved as JSON so they survive restarts. A
+backend's measurements are dropped when its files change.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from onnx_backend import METADATA_FILE as ONNX_METADATA_FILE, is_onnx_model
+
+CATALOG_VERSION = 1
+HIDDEN_SUFFIXES = ("_ct2", "_onnx")  # Engine folders shown as backends of their model, not as models
+LOAD_MB_PER_S = 150.0  # Rough read + init rate used to estimate load times that were never measured
+
+logger = logging.getLogger(__name__)
+
+
+def is_model_name(name: str) -> bool:
+    """False for engine folders (*_ct2, *_onnx) and CTranslate2 backups, which aren't models of their own."""
+    return not name.endswith(HIDDEN_SUFFIXES) and "ct2_backup" not in name
+
+
+def dir_signature(path: str) -> Optional[list]:
+    """mtime of path and (name, size, mtime) of the files directly in it; None if it doesn't exist."""
+    try:
+        signature = [os.stat(path).st_mtime_ns]
+        with os.scandir(path) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                if entry.is_file():
+                    st = entry.stat()
+                    signature.append([entry.name, st.st_size, st.st_mtime_ns])
+    except OSError:
+        return None
+    return signature
+
+
+def dir_size_mb(path: str) -> float:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return round(total / (1024 ** 2), 2)
+
+
+def read_json(path: str) -> Dict:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def transformers_path(path: str) -> str:
+    """The directory holding the Transformers files (a nested final_model if there is one)."""
+    nested = os.path.join(path, "final_model")
+    return nested if os.path.isdir(nested) else path
+
+
+def has_transformers_weights(path: str) -> bool:
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return False
+    return "config.json" in names and any(
+        name.endswith(".safetensors") or (name.startswith("pytorch_model") and name.endswith(".bin"))
+        for name in names
+    )
+
+
+class ModelCatalog:
+    def __init__(self, models_path: str, versions_path: str, index_path: Optional[str] = None,
+                 prefer_onnx: bool = True, check_interval: float = 2.0):
+        """
+        Args:
+            index_path: JSON file the index is kept in (None = memory only)
+            prefer_onnx: Whether load_model_bundle() uses ONNX exports (USE_ONNX and no CUDA)
+            check_interval: Minimum seconds between signature checks
+        """
+        self.paths = {"models": models_path, "versions": versions_path}
+        self.index_path = index_path
+        self.prefer_onnx = prefer_onnx
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._entries = {}  # "source/name" -> entry
+        self._measured = {}  # model_id -> backend -> measurement
+        if index_path:
+            saved = read_json(index_path)
+            if saved.get("version") == CATALOG_VERSION:
+                self._entries = saved.get("entries", {})
+                self._measured = saved.get("measured", {})
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rebuild the entries whose files changed. Returns True if anything changed."""
+        with self._lock:
+            if not force and time.time() - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = time.time()
+
+            entries = {}
+            rebuilt = 0
+            for source, base_path in self.paths.items():
+                try:
+                    names = sorted(os.listdir(base_path))
+                except OSError:
+                    continue
+                for name in names:
+                    path = os.path.join(base_path, name)
+                    if not os.path.isdir(path) or not is_model_name(name):
+                        continue
+                    key = f"{source}/{name}"
+                    signature = self._signature(path)
+                    entry = self._entries.get(key)
+                    if entry is None or entry["signature"] != signature:
+                        entry = self._build_entry(name, source, path, signature)
+                        rebuilt += 1
+                    entries[key] = entry
+
+            changed = rebuilt > 0 or entries.keys() != self._entries.keys()
+            self._entries = entries
+            if changed:
+                self._drop_stale_measurements()
+                self._save()
+                logger.info("Model catalog: %d models indexed (%d rebuilt)", len(entries), rebuilt)
+            return changed
+
+    def model_ids(self, source: str = "models") -> List[str]:
+        self.refresh()
+        with self._lock:
+            return sorted(e["model_id"] for e in self._entries.values() if e["source"] == source)
+
+    def get(self, model_id: str, source: str = "models") -> Optional[Dict]:
+        self.refresh()
+        with self._lock:
+            entry = self._entries.get(f"{source}/{model_id}")
+            return self._describe(entry) if entry else None
+
+    def entries(self) -> List[Dict]:
+        self.refresh()
+        with self._lock:
+            return [self._describe(self._entries[key]) for key in sorted(self._entries)]
+
+    def expected_load_s(self, model_id: str, source: str = "models") -> Optional[float]:
+        """Seconds a cold load plus warm-up of model_id is expected to take (None if unknown)."""
+        entry = self.get(model_id, source)
+        return entry["expected_load_s"] if entry else None
+
+    def record_load(self, model_id: str, backend: str, load_time: float, warmup_time: Optional[float],
+                    resident_mb: Optional[float], compute_type: Optional[str]):
+        """Store the measured cost of loading model_id (from models/) with backend."""
+        self.refresh()
+        with self._lock:
+            entry = self._entries.get(f"models/{model_id}")
+            backend_info = entry["backends"].get(backend) if entry else None
+            self._measured.setdefault(model_id, {})[backend] = {
+                "load_time_s": round(load_time, 3),
+                "warmup_time_s": round(warmup_time, 3) if warmup_time is not None else None,
+                "resident_mb": round(resident_mb, 1) if resident_mb is not None else None,
+                "compute_type": compute_type,
+                "measured_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "signature": backend_info["signature"] if backend_info else None
+            }
+            self._save()
+
+    # Internals (called with the lock held)
+
+    def _signature(self, path: str) -> list:
+        base = os.path.dirname(path)
+        name = os.path.basename(path)
+        return [dir_signature(path), dir_signature(os.path.join(path, "final_model")),
+                dir_signature(os.path.join(base, f"{name}_ct2")), dir_signature(os.path.join(base, f"{name}_onnx"))]
+
+    def _build_entry(self, name: str, source: str, path: str, signature: list) -> Dict:
+        base = os.path.dirname(path)
+        backends = {}
+
+        hf_path = transformers_path(path)
+        if has_transformers_weights(hf_path):
+            config = read_json(os.path.join(hf_path, "config.json"))
+            backends["transformers"] = {
+                "path": hf_path,
+                "disk_mb": dir_size_mb(hf_path),
+                "compute_type": config.get("torch_dtype") or config.get("dtype") or "float32",
+                "signature": [signature[0], signature[1]]
+            }
+
+        ct2_path = os.path.join(base, f"{name}_ct2")
+        if os.path.exists(os.path.join(ct2_path, "model.bin")):
+            metadata = read_json(os.path.join(ct2_path, "conversion_metadata.json"))
+            backends["ctranslate2"] = {
+                "path": ct2_path,
+                "disk_mb": dir_size_mb(ct2_path),
+                "compute_type": metadata.get("quantization", "unknown"),
+                "signature": signature[2]
+            }
+
+        onnx_path = os.path.join(base, f"{name}_onnx")
+        if is_onnx_model(onnx_path):
+            metadata = read_json(os.path.join(onnx_path, ONNX_METADATA_FILE))
+            quantization = metadata.get("quantization", "unknown")
+            backends["onnxruntime"] = {
+                "path": onnx_path,
+                "disk_mb": dir_size_mb(onnx_path),
+                "compute_type": "float32" if quantization == "none" else quantization,
+                "signature": signature[3]
+            }
+
+        return {
+            "model_id": name,
+            "source": source,
+            "path": path,
+            "backends": backends,
+            "signature": signature,
+            "indexed_at": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def _preferred_backend(self, entry: Dict) -> Optional[str]:
+        """The backend load_model_bundle() picks for this entry."""
+        backends = entry["backends"]
+        if "ctranslate2" in backends and "mbart" not in entry["model_id"].lower():
+            return "ctranslate2"
+        if "onnxruntime" in backends and self.prefer_onnx:
+            return "onnxruntime"
+        if "transformers" in backends:
+            return "transformers"
+        return None
+
+    def _describe(self, entry: Dict) -> Dict:
+        backend = self._preferred_backend(entry)
+        measured = self._measured.get(entry["model_id"], {}) if entry["source"] == "models" else {}
+        measurement = measured.get(backend)
+        if measurement:
+            expected = measurement["load_time_s"] + (measurement["warmup_time_s"] or 0)
+        elif backend:
+            expected = entry["backends"][backend]["disk_mb"] / LOAD_MB_PER_S
+        else:
+            expected = None
+        return {
+            "model_id": entry["model_id"],
+            "source": entry["source"],
+            "backend": backend,
+            "backends": {
+                name: {k: v for k, v in info.items() if k != "signature"}
+                for name, info in entry["backends"].items()
+            },
+            "disk_mb": entry["backends"][backend]["disk_mb"] if backend else None,
+            "compute_type": (measurement or {}).get("compute_type") or
+                            (entry["backends"][backend]["compute_type"] if backend else None),
+            "resident_mb": (measurement or {}).get("resident_mb"),
+            "measured": {name: {k: v for k, v in m.items() if k != "signature"} for name, m in measured.items()},
+            "expected_load_s": round(expected, 2) if expected is not None else None,
+            "load_estimated": measurement is None,
+            "indexed_at": entry["indexed_at"]
+        }
+
+    def _drop_stale_measurements(self):
+        """Forget measurements of backends whose files changed since they were taken."""
+        for model_id, measured in list(self._measured.items()):
+            entry = self._entries.get(f"models/{model_id}")
+            for backend, measurement in list(measured.items()):
+                info = entry["backends"].get(backend) if entry else None
+                if info is None or measurement.get("signature") != info["signature"]:
+                    del measured[backend]
+            if not measured:
+                del self._measured[model_id]
+
+    def _save(self):
+        if not self.index_path:
+            return
+        data = {"version": CATALOG_VERSION, "entries": self._entries, "measured": self._measured}
+        tmp = self.index_path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.index_path)
+        except OSError as e:
+            logger.warning("Could not save model catalog %s: %s", self.index_path, e)
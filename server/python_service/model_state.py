@@ -0,0 +1,128 @@
+"""
+Loaded model bundles.
+
+A LoadedModel keeps a tokenizer together with the engine that uses it, so a
+request always decodes with a consistent pair even while /set_version swaps
+the active model underneath it.
+
+Idle models can be parked to give their weights back while keeping enough
+state (tokenizer, runtime context) to reactivate much faster than a cold load:
+CTranslate2 translators are unloaded with unload_model() (moved to CPU memory
+when running on CUDA), ONNX Runtime sessions are closed and recreated,
+Transformers models are moved to CPU when on CUDA. Transformers models
+running on CPU are not parked: their weights already live in CPU memory, and
+dropping them would make reactivation a cold load (re-quantizing for int8).
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class LoadedModel:
+    def __init__(self, model_id: str, tokenizer, translator=None, model=None, model_path: str = None, onnx=None):
+        self.model_id = model_id
+        self.tokenizer = tokenizer
+        self.translator = translator  # CTranslate2 Translator
+        self.model = model  # Transformers model
+        self.onnx = onnx  # OnnxTranslator (onnx_backend.py)
+        self.model_path = model_path
+        self.is_ct2 = translator is not None
+        self.is_onnx = onnx is not None
+        self.backend = "ctranslate2" if self.is_ct2 else "onnxruntime" if self.is_onnx else "transformers"
+        self.loaded_at = time.time()
+        self.load_time = None  # Seconds spent loading (set by the loader)
+        self.warmup_time = None  # Seconds spent on the warm-up translation
+        self.max_batch_size = None  # Decode batch limit (from the tuning profile, else the service default)
+        self.batch_type = None  # CTranslate2 batch_type ("examples" or "tokens")
+        self.cpu_mode = None  # Transformers CPU variant (hf_cpu.py), None on CUDA and for CTranslate2
+        self.compute_type = None  # Weight precision the engine runs with (e.g. int8, float32)
+        self.resident_mb = None  # Memory the load added to the process (or to the GPU)
+        self.last_used = time.time()
+
+        self.parked = False
+        self.park_stats = {
+            "park_count": 0,
+            "unpark_count": 0,
+            "last_park_ms": None,
+            "last_unpark_ms": None
+        }
+
+        self._active_requests = 0
+        self._idle = threading.Condition()
+
+    @property
+    def active_requests(self) -> int:
+        return self._active_requests
+
+    @contextmanager
+    def lease(self):
+        """Mark the model as in use for the duration of a decode call, reactivating it if parked."""
+        with self._idle:
+            if self.parked:
+                self._unpark()
+            self._active_requests += 1
+        try:
+            yield self
+        finally:
+            with self._idle:
+                self._active_requests -= 1
+                self.last_used = time.time()
+                if self._active_requests == 0:
+                    self._idle.notify_all()
+
+    def park(self) -> bool:
+        """Release the weights of an idle model. Returns False if it is in use or already parked."""
+        with self._idle:
+            if self.parked or self._active_requests:
+                return False
+            start_time = time.time()
+            if self.is_ct2:
+                self.translator.unload_model(to_cpu=self.translator.device == "cuda")
+            elif self.is_onnx:
+                self.onnx.unload_model()
+            elif self.model.device.type == "cuda":
+                self.model = self.model.to("cpu")
+            else:
+                return False
+            self.parked = True
+            self.park_stats["park_count"] += 1
+            self.park_stats["last_park_ms"] = round((time.time() - start_time) * 1000, 2)
+            return True
+
+    def unpark(self):
+        """Reactivate a parked model ahead of the next request."""
+        with self._idle:
+            if self.parked:
+                self._unpark()
+
+    def _unpark(self):
+        start_time = time.time()
+        if self.is_ct2:
+            self.translator.load_model()
+        elif self.is_onnx:
+            self.onnx.load_model()
+        else:
+            self.model = self.model.to("cuda")
+        self.parked = False
+        self.park_stats["unpark_count"] += 1
+        self.park_stats["last_unpark_ms"] = round((time.time() - start_time) * 1000, 2)
+
+    def describe(self) -> dict:
+        return {
+            "model_id": self.model_id,
+            "backend": self.backend,
+            "cpu_mode": self.cpu_mode,
+            "compute_type": self.compute_type,
+            "resident_mb": round(self.resident_mb, 1) if self.resident_mb is not None else None,
+            "parked": self.parked,
+            "active_requests": self._active_requests,
+            "idle_s": round(time.time() - self.last_used, 1),
+            "load_time_ms": round(self.load_time * 1000, 2) if self.load_time else None,
+            **self.park_stats
+        }
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Block until no decode call is using this model. Returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._active_requests == 0, timeout=timeout)
@@ -0,0 +1,255 @@
+"""
+ONNX Runtime inference backend.
+
+Runs models exported by export_onnx.py: an encoder graph, a decoder graph for
+the first step and a decoder graph for later steps that reads the KV cache of
+the previous ones. OnnxTranslator.translate_batch() takes token ids and
+decodes with greedy or beam search in numpy, with the same forced BOS,
+no-repeat n-gram and repetition penalty options as Transformers' generate().
+Scores are length-normalized log probabilities, as with CTranslate2.
+
+onnxruntime is optional; is_onnx_model() reports whether an export exists and
+OnnxTranslator raises ImportError when the runtime is missing.
+"""
+
+import json
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+ENCODER_FILE = "encoder_model.onnx"
+DECODER_FILE = "decoder_model.onnx"
+DECODER_WITH_PAST_FILE = "decoder_with_past_model.onnx"
+METADATA_FILE = "onnx_metadata.json"
+
+DEFAULT_MAX_BATCH_SIZE = 16  # Sentences per encoder/decoder run
+NEG_INF = -np.inf
+
+
+def is_onnx_model(path: str) -> bool:
+    """True if path holds a complete export (all three graphs and the metadata)."""
+    return all(os.path.exists(os.path.join(path, f))
+               for f in (ENCODER_FILE, DECODER_FILE, DECODER_WITH_PAST_FILE, METADATA_FILE))
+
+
+def cache_names(num_layers: int, prefix: str, cross: bool = True) -> List[str]:
+    """Names of the KV cache tensors: {prefix}.{layer}.{self|cross}.{key|value}."""
+    names = []
+    for i in range(num_layers):
+        names += [f"{prefix}.{i}.self.key", f"{prefix}.{i}.self.value"]
+        if cross:
+            names += [f"{prefix}.{i}.cross.key", f"{prefix}.{i}.cross.value"]
+    return names
+
+
+def log_softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    return shifted - np.log(np.exp(shifted).sum(axis=-1, keepdims=True))
+
+
+def apply_repetition_penalty(scores: np.ndarray, tokens: np.ndarray, penalty: float):
+    """Penalize the scores of tokens already in each sequence, in place (Transformers' RepetitionPenaltyLogitsProcessor)."""
+    for row, sequence in enumerate(tokens):
+        seen = np.unique(sequence)
+        values = scores[row, seen]
+        scores[row, seen] = np.where(values < 0, values * penalty, values / penalty)
+
+
+class OnnxTranslator:
+    def __init__(self, path: str, intra_threads: int = 0, inter_threads: int = 1):
+        if onnxruntime is None:
+            raise ImportError("onnxruntime is not installed")
+        self.path = path
+        self.device = "cpu"
+        self.intra_threads = intra_threads
+        self.inter_threads = inter_threads
+        with open(os.path.join(path, METADATA_FILE), "r") as f:
+            self.metadata = json.load(f)
+        self.num_layers = self.metadata["num_layers"]
+        self.encoder = None
+        self.decoder = None
+        self.decoder_with_past = None
+        self.load_model()
+
+    @property
+    def model_is_loaded(self) -> bool:
+        return self.encoder is not None
+
+    def load_model(self):
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = self.intra_threads
+        options.inter_op_num_threads = self.inter_threads
+
+        def session(name):
+            return onnxruntime.InferenceSession(os.path.join(self.path, name), options,
+                                                providers=["CPUExecutionProvider"])
+        self.encoder = session(ENCODER_FILE)
+        self.decoder = session(DECODER_FILE)
+        self.decoder_with_past = session(DECODER_WITH_PAST_FILE)
+        # The exporter drops unused inputs, so only feed what each graph declares
+        self._decoder_inputs = {i.name for i in self.decoder.get_inputs()}
+        self._past_inputs = {i.name for i in self.decoder_with_past.get_inputs()}
+
+    def unload_model(self, to_cpu: bool = False):
+        """Release the sessions (to_cpu is accepted for the CTranslate2-style interface)."""
+        self.encoder = None
+        self.decoder = None
+        self.decoder_with_past = None
+
+    def translate_batch(self, source_ids: List[List[int]], beam_size: Optional[int] = None,
+                        max_length: Optional[int] = None, forced_bos_token_id: Optional[int] = None,
+                        no_repeat_ngram_size: int = 0, repetition_penalty: float = 1.0,
+                        max_batch_size: Optional[int] = None) -> List[Tuple[List[int], float]]:
+        """
+        Decode tokenized sources (ids including special tokens).
+        Returns (generated ids, length-normalized log probability) per source.
+        """
+        beam_size = beam_size or self.metadata.get("num_beams") or 1
+        max_length = max_length or self.metadata.get("max_length") or 512
+        max_batch_size = max_batch_size or DEFAULT_MAX_BATCH_SIZE
+
+        # Sort by length so each sub-batch needs little padding
+        order = sorted(range(len(source_ids)), key=lambda i: len(source_ids[i]))
+        results = [None] * len(source_ids)
+        for start in range(0, len(order), max_batch_size):
+            indices = order[start:start + max_batch_size]
+            decoded = self._decode([source_ids[i] for i in indices], beam_size, max_length,
+                                   forced_bos_token_id, no_repeat_ngram_size, repetition_penalty)
+            for i, result in zip(indices, decoded):
+                results[i] = result
+        return results
+
+    def _encode(self, source_ids: List[List[int]]) -> Tuple[np.ndarray, np.ndarray]:
+        pad = self.metadata["pad_token_id"]
+        length = max(len(ids) for ids in source_ids)
+        input_ids = np.full((len(source_ids), length), pad, dtype=np.int64)
+        attention_mask = np.zeros((len(source_ids), length), dtype=np.int64)
+        for i, ids in enumerate(source_ids):
+            input_ids[i, :len(ids)] = ids
+            attention_mask[i, :len(ids)] = 1
+        hidden = self.encoder.run(None, {"input_ids": input_ids, "attention_mask": attention_mask})[0]
+        return hidden, attention_mask
+
+    def _process(self, logprobs: np.ndarray, tokens: np.ndarray, step: int, last_step: bool,
+                 forced_bos_token_id: Optional[int], no_repeat_ngram_size: int):
+        """Apply suppressed tokens, forced BOS/EOS and the no-repeat n-gram ban to log probabilities in place."""
+        suppress = self.metadata.get("suppress_token_ids") or []
+        if suppress:
+            logprobs[:, suppress] = NEG_INF
+        forced_eos_token_id = self.metadata.get("forced_eos_token_id")
+        for forced_id, applies in ((forced_bos_token_id, step == 0), (forced_eos_token_id, last_step)):
+            if applies and forced_id is not None:
+                forced = logprobs[:, forced_id].copy()
+                logprobs[:] = NEG_INF
+                logprobs[:, forced_id] = forced
+                return
+        for row, sequence in enumerate(tokens):
+            n = no_repeat_ngram_size
+            if n and len(sequence) >= n:
+                history = sequence.tolist()
+                prefix = history[len(history) - n + 1:]
+                banned = [history[i + n - 1] for i in range(len(history) - n + 1) if history[i:i + n - 1] == prefix]
+                logprobs[row, banned] = NEG_INF
+
+    def _decode(self, source_ids: List[List[int]], beam_size: int, max_length: int,
+                forced_bos_token_id: Optional[int], no_repeat_ngram_size: int,
+                repetition_penalty: float) -> List[Tuple[List[int], float]]:
+        """Beam search over one sub-batch (beam_size 1 is greedy decoding)."""
+        eos = self.metadata["eos_token_id"]
+        pad = self.metadata["pad_token_id"]
+        batch, k = len(source_ids), beam_size
+
+        hidden, attention_mask = self._encode(source_ids)
+        hidden = np.repeat(hidden, k, axis=0)
+        attention_mask = np.repeat(attention_mask, k, axis=0)
+        tokens = np.full((batch * k, 1), self.metadata["decoder_start_token_id"], dtype=np.int64)
+
+        feeds = {"decoder_input_ids": tokens, "encoder_hidden_states": hidden, "encoder_attention_mask": attention_mask}
+        outputs = self.decoder.run(None, {name: value for name, value in feeds.items() if name in self._decoder_inputs})
+        logits, cache = outputs[0], list(outputs[1:])
+        past_names = cache_names(self.num_layers, "past")
+
+        beam_scores = np.zeros((batch, k), dtype=np.float32)
+        beam_scores[:, 1:] = NEG_INF  # All beams start identical: expand from the first one only
+        finished: List[List[Tuple[float, List[int]]]] = [[] for _ in range(batch)]
+        done = np.zeros(batch, dtype=bool)
+
+        # Like generate(), max_length counts the decoder start token
+        steps = max(max_length - 1, 1)
+        for step in range(steps):
+            last_step = step == steps - 1
+            scores = logits.astype(np.float32)
+            # Like generate(): greedy search penalizes the raw logits, beam search the log probabilities
+            if repetition_penalty != 1.0 and k == 1:
+                apply_repetition_penalty(scores, tokens, repetition_penalty)
+            logprobs = log_softmax(scores)
+            if repetition_penalty != 1.0 and k > 1:
+                apply_repetition_penalty(logprobs, tokens, repetition_penalty)
+            self._process(logprobs, tokens, step, last_step, forced_bos_token_id, no_repeat_ngram_size)
+            vocab = logprobs.shape[1]
+            candidates = (beam_scores.reshape(-1, 1) + logprobs).reshape(batch, k * vocab)
+            top = np.argpartition(-candidates, 2 * k - 1, axis=1)[:, :2 * k]
+
+            next_scores = np.full((batch, k), NEG_INF, dtype=np.float32)
+            next_beams = np.tile(np.arange(k), (batch, 1))
+            next_tokens = np.full((batch, k), pad, dtype=np.int64)
+            for b in range(batch):
+                if done[b]:
+                    continue
+                alive = 0
+                ranked = top[b][np.argsort(-candidates[b, top[b]])]
+                for rank, index in enumerate(ranked):
+                    beam, token = divmod(int(index), vocab)
+                    score = float(candidates[b, index])
+                    if score == NEG_INF:
+                        break
+                    if token == eos or last_step:
+                        # Only hypotheses among the best k may finish (as in Transformers' beam search)
+                        if rank < k:
+                            generated = tokens[b * k + beam, 1:].tolist() + [token]
+                            finished[b].append((score / len(generated), generated))
+                        continue
+                    next_scores[b, alive] = score
+                    next_beams[b, alive] = beam
+                    next_tokens[b, alive] = token
+                    alive += 1
+                    if alive == k:
+                        break
+                if len(finished[b]) >= k or alive == 0:
+                    done[b] = True
+            if done.all() or last_step:
+                break
+
+            # Reorder the self-attention cache to follow the surviving beams
+            source_rows = (np.arange(batch)[:, None] * k + next_beams).reshape(-1)
+            tokens = np.concatenate([tokens[source_rows], next_tokens.reshape(-1, 1)], axis=1)
+            beam_scores = next_scores
+            for layer in range(self.num_layers):
+                cache[4 * layer] = cache[4 * layer][source_rows]
+                cache[4 * layer + 1] = cache[4 * layer + 1][source_rows]
+
+            feeds = {"decoder_input_ids": next_tokens.reshape(-1, 1), "encoder_attention_mask": attention_mask,
+                     "encoder_hidden_states": hidden, **dict(zip(past_names, cache))}
+            outputs = self.decoder_with_past.run(None, {name: value for name, value in feeds.items()
+                                                        if name in self._past_inputs})
+            logits = outputs[0]
+            for layer in range(self.num_layers):
+                cache[4 * layer], cache[4 * layer + 1] = outputs[1 + 2 * layer], outputs[2 + 2 * layer]
+
+        results = []
+        for b in range(batch):
+            if finished[b]:
+                score, generated = max(finished[b], key=lambda h: h[0])
+            else:
+                generated = tokens[b * k, 1:].tolist()
+                score = float(beam_scores[b, 0]) / max(1, len(generated))
+            results.append((generated, score))
+        return results
+
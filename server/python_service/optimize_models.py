@@ -8,7 +8,10 @@ import os
 import sys
 import argparse
 import json
-from convert import convert_model, validate_model
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from convert import convert_model, validate_model, needs_conversion
+from artifact_store import ArtifactStore, model_dirs
 
 # Optimal quantization settings for each model
 MODEL_CONFIGS = {
@@ -30,14 +33,39 @@ MODEL_CONFIGS = {
     }
 }
 
-def optimize_all_models(force=False, validate=False, models=None):
+DEFAULT_THREADS_PER_JOB = 4  # Threads per conversion; --jobs defaults to cpu_count // this
+
+def limit_threads(threads):
+    """Process pool initializer: cap the math libraries of a conversion worker."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+
+def run_conversion(model_id, quantization, validate):
+    """Convert one model in a worker process. Returns (success, seconds)."""
+    start = time.time()
+    try:
+        success = convert_model(model_id=model_id, quantization=quantization, force=True, validate=validate)
+    except Exception as e:
+        print(f"✗ {model_id}: {e}")
+        success = False
+    return success, time.time() - start
+
+def optimize_all_models(force=False, validate=False, models=None, jobs=None, threads_per_job=None):
     """
     Convert all models to optimized CTranslate2 format.
     
+    Models whose source files and conversion settings match the hash stored
+    with their last conversion are skipped; the rest are converted in a pool
+    of worker processes.
+    
     Args:
-        force: Overwrite existing conversions
+        force: Reconvert even if a conversion is up to date
         validate: Run validation after each conversion
         models: List of specific models to convert (None = all)
+        jobs: Conversions running at once (None = cpu_count // threads_per_job)
+        threads_per_job: Threads each conversion may use (None = cpu_count // jobs)
     """
     results = {}
     
@@ -52,43 +80,68 @@ def optimize_all_models(force=False, validate=False, models=None):
     print(f"Validation: {validate}")
     print(f"\n{'='*70}\n")
     
+    pending = []
     for model_id in models_to_process:
         if model_id not in MODEL_CONFIGS:
             print(f"⚠ Warning: Unknown model '{model_id}', skipping...")
             continue
-            
-        config = MODEL_CONFIGS[model_id]
-        print(f"\n{'─'*70}")
-        print(f"Processing: {model_id}")
-        print(f"Description: {config['description']}")
-        print(f"Quantization: {config['quantization']}")
-        print(f"{'─'*70}\n")
-        
-        success = convert_model(
-            model_id=model_id,
-            quantization=config['quantization'],
-            force=force,
-            validate=validate
-        )
         
-        results[model_id] = {
-            "success": success,
-            "quantization": config['quantization']
-        }
-        
-        if success:
-            print(f"\n✓ {model_id} optimization completed successfully\n")
+        quantization = MODEL_CONFIGS[model_id]['quantization']
+        if force:
+            convert, reason = True, "forced"
+        else:
+            convert, reason = needs_conversion(model_id, quantization)
+        print(f"{model_id:10} | {quantization:12} | {reason}")
+        if convert:
+            pending.append(model_id)
         else:
-            print(f"\n✗ {model_id} optimization failed\n")
+            results[model_id] = {"success": True, "quantization": quantization, "status": "skipped"}
+    
+    if pending:
+        cpus = os.cpu_count() or 1
+        if jobs is None:
+            jobs = max(1, cpus // (threads_per_job or DEFAULT_THREADS_PER_JOB))
+        jobs = min(jobs, len(pending))
+        if threads_per_job is None:
+            threads_per_job = max(1, cpus // jobs)
+        print(f"\nConverting {len(pending)} model(s): {jobs} job(s) x {threads_per_job} thread(s)\n")
+        
+        with ProcessPoolExecutor(max_workers=jobs, initializer=limit_threads,
+                                 initargs=(threads_per_job,)) as pool:
+            futures = {
+                pool.submit(run_conversion, model_id, MODEL_CONFIGS[model_id]['quantization'], validate): model_id
+                for model_id in pending
+            }
+            for future in as_completed(futures):
+                model_id = futures[future]
+                try:
+                    success, seconds = future.result()
+                except Exception as e:
+                    # The worker died (e.g. out of memory)
+                    print(f"✗ {model_id}: worker failed: {e}")
+                    success, seconds = False, 0.0
+                results[model_id] = {
+                    "success": success,
+                    "quantization": MODEL_CONFIGS[model_id]['quantization'],
+                    "status": "converted" if success else "failed",
+                    "time_s": round(seconds, 2)
+                }
+                
+                if success:
+                    print(f"\n✓ {model_id} optimization completed successfully in {seconds:.1f}s\n")
+                else:
+                    print(f"\n✗ {model_id} optimization failed\n")
     
     # Print summary
     print(f"\n{'='*70}")
     print(f"  Optimization Summary")
     print(f"{'='*70}\n")
     
-    for model_id, result in results.items():
-        status = "✓ SUCCESS" if result['success'] else "✗ FAILED"
-        print(f"{status:12} | {model_id:10} | {result['quantization']}")
+    labels = {"converted": "✓ CONVERTED", "skipped": "○ UNCHANGED", "failed": "✗ FAILED"}
+    for model_id in models_to_process:
+        result = results.get(model_id)
+        if result:
+            print(f"{labels[result['status']]:12} | {model_id:10} | {result['quantization']}")
     
     print(f"\n{'='*70}\n")
     
@@ -122,9 +175,11 @@ def check_models_status():
     if not os.path.exists(base_path):
         base_path = "../../models"
     
+    store = ArtifactStore()
+    
     for model_id in MODEL_CONFIGS.keys():
-        original_path = os.path.join(base_path, model_id)
-        ct2_path = os.path.join(base_path, f"{model_id}_ct2")
+        original_path = store.resolve(os.path.join(base_path, model_id))
+        ct2_path = store.resolve(os.path.join(base_path, f"{model_id}_ct2"))
         
         original_exists = os.path.exists(original_path)
         ct2_exists = os.path.exists(ct2_path)
@@ -142,7 +197,27 @@ def check_models_status():
                 print(f"{'':20} | Quantization: {metadata.get('quantization', 'unknown')}")
                 print(f"{'':20} | Size: {metadata.get('converted_size_mb', 0):.2f} MB")
                 print(f"{'':20} | Converted: {metadata.get('timestamp', 'unknown')}")
+            if model_id in MODEL_CONFIGS:
+                _, reason = needs_conversion(model_id, MODEL_CONFIGS[model_id]['quantization'])
+                print(f"{'':20} | Source: {reason}")
+            if store.has(store.name_for(ct2_path)):
+                print(f"{'':20} | Artifact store: yes")
         print()
+    
+    stats = store.stats()
+    if stats["manifests"]:
+        print(f"Artifact store: {stats['manifests']} directories, {stats['stored_mb']:.2f} MB stored, "
+              f"{stats['saved_mb']:.2f} MB saved by deduplication\n")
+
+def dedupe_all_models():
+    """Add every directory in models/ and versions/ to the artifact store."""
+    store = ArtifactStore()
+    for path in model_dirs():
+        manifest = store.ingest(path)
+        print(f"✓ {manifest['name']}: {len(manifest['files'])} files")
+    stats = store.stats()
+    print(f"\nStored {stats['stored_mb']:.2f} MB for {stats['logical_mb']:.2f} MB of model files "
+          f"(saved {stats['saved_mb']:.2f} MB)\n")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -159,11 +234,17 @@ Examples:
   # Force re-conversion with validation
   python optimize_models.py --all --force --validate
   
+  # Two conversions at a time, 8 threads each
+  python optimize_models.py --all --jobs 2 --threads-per-job 8
+  
   # Check conversion status
   python optimize_models.py --status
   
   # List available models
   python optimize_models.py --list
+  
+  # Deduplicate models/ and versions/ into the artifact store
+  python optimize_models.py --dedupe
         """
     )
     
@@ -180,7 +261,17 @@ Examples:
     parser.add_argument(
         "--force",
         action="store_true",
-        help="Force re-conversion even if already exists"
+        help="Force re-conversion even if source and settings are unchanged"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help=f"Conversions to run in parallel (default: CPU count / {DEFAULT_THREADS_PER_JOB})"
+    )
+    parser.add_argument(
+        "--threads-per-job",
+        type=int,
+        help="Threads per conversion (default: CPU count / jobs)"
     )
     parser.add_argument(
         "--validate",
@@ -197,6 +288,11 @@ Examples:
         action="store_true",
         help="Check conversion status of all models"
     )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Store models/ and versions/ in the content-addressed artifact store"
+    )
     
     args = parser.parse_args()
     
@@ -205,11 +301,15 @@ Examples:
         list_models()
     elif args.status:
         check_models_status()
+    elif args.dedupe:
+        dedupe_all_models()
     elif args.all or args.models:
         optimize_all_models(
             force=args.force,
             validate=args.validate,
-            models=args.models
+            models=args.models,
+            jobs=args.jobs,
+            threads_per_job=args.threads_per_job
         )
     else:
         parser.print_help()
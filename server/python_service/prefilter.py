@@ -0,0 +1,146 @@
+"""
+Pre-filter for lines that need no model inference.
+
+Subtitle files contain many lines the model has nothing to do with: music
+notes, ellipses, timestamps, numbers, sound cues like （笑） and lines that are
+already Vietnamese or English. Lines are classified in one vectorized pass over
+the code points of the whole batch; only lines with CJK text go to the model.
+
+Kinds:
+  empty   - blank line, returned unchanged
+  symbols - no letters (♪, ..., 12:30, numbers), full-width punctuation normalized
+  latin   - Latin script only (already Vietnamese/English), returned unchanged
+  rule    - a known bracketed sound cue, translated from a table
+  model   - needs translation
+"""
+
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+KIND_EMPTY = "empty"
+KIND_SYMBOLS = "symbols"
+KIND_LATIN = "latin"
+KIND_RULE = "rule"
+KIND_MODEL = "model"
+
+CJK_RANGES = [
+    (0x3040, 0x30FF),  # Kana
+    (0x3400, 0x4DBF),  # CJK extension A
+    (0x4E00, 0x9FFF),  # CJK unified ideographs
+    (0xAC00, 0xD7AF),  # Hangul
+    (0xF900, 0xFAFF),  # CJK compatibility ideographs
+    (0x20000, 0x2FA1F)  # CJK extensions B-F
+]
+
+LATIN_RANGES = [
+    (0x41, 0x5A),
+    (0x61, 0x7A),
+    (0xC0, 0x24F),  # Latin-1 supplement and extended A/B (minus symbols below)
+    (0x1E00, 0x1EFF)  # Latin extended additional (Vietnamese ạ, ế, ữ...)
+]
+
+# Full-width punctuation in symbol-only lines is written the way the model would
+PUNCTUATION = str.maketrans({
+    "！": "!", "？": "?", "，": ",", "。": ".", "：": ":", "；": ";",
+    "～": "~", "（": "(", "）": ")", "【": "[", "】": "]", "…": "..."
+})
+
+SOUND_CUE = re.compile(r"^[（(【\[]\s*([^）)】\]]+?)\s*[）)】\]]$")
+SOUND_CUES = {
+    "笑": "cười",
+    "大笑": "cười lớn",
+    "哭": "khóc",
+    "叹气": "thở dài",
+    "咳嗽": "ho",
+    "掌声": "vỗ tay",
+    "欢呼": "reo hò",
+    "尖叫": "la hét",
+    "音乐": "nhạc",
+    "歌声": "tiếng hát",
+    "枪声": "tiếng súng",
+    "敲门声": "tiếng gõ cửa",
+    "电话铃声": "tiếng chuông điện thoại",
+    "沉默": "im lặng"
+}
+
+
+def _line_counts(mask: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Number of True values of mask in each [start, end) line span."""
+    cumulative = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+    return cumulative[ends] - cumulative[starts]
+
+
+def _in_ranges(codes: np.ndarray, ranges) -> np.ndarray:
+    mask = np.zeros(len(codes), dtype=bool)
+    for low, high in ranges:
+        mask |= (codes >= low) & (codes <= high)
+    return mask
+
+
+def classify(texts: List[str]) -> List[str]:
+    """Kind of every line, computed over the whole batch at once."""
+    if not texts:
+        return []
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32)
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+
+    cjk = _line_counts(_in_ranges(codes, CJK_RANGES), starts, ends)
+    latin = _line_counts(_in_ranges(codes, LATIN_RANGES) & (codes != 0xD7) & (codes != 0xF7), starts, ends)
+    blank = _line_counts(~np.isin(codes, [0x20, 0x09, 0x0D, 0x0A, 0x3000]), starts, ends) == 0
+
+    kinds = np.full(len(texts), KIND_MODEL, dtype=object)
+    no_cjk = cjk == 0
+    kinds[no_cjk & (latin == 0)] = KIND_SYMBOLS
+    kinds[no_cjk & (latin > 0)] = KIND_LATIN
+    kinds[blank] = KIND_EMPTY
+
+    # Only short CJK lines can be sound cues; check those against the table
+    for i in np.flatnonzero((cjk > 0) & (lengths <= 12)):
+        if _sound_cue(texts[i]) is not None:
+            kinds[i] = KIND_RULE
+    return kinds.tolist()
+
+
+def _sound_cue(text: str) -> Optional[str]:
+    match = SOUND_CUE.match(text.strip())
+    if match and match.group(1) in SOUND_CUES:
+        return f"({SOUND_CUES[match.group(1)]})"
+    return None
+
+
+def prefilter(texts: List[str]) -> Tuple[List[Optional[str]], List[int], Counter]:
+    """
+    Resolve every line that doesn't need the model.
+
+    Returns:
+        outputs: Final text per line, None where the model is needed
+        model_indices: Positions of the lines to translate
+        counts: Number of lines per kind
+    """
+    kinds = classify(texts)
+    outputs = []
+    model_indices = []
+    for i, (text, kind) in enumerate(zip(texts, kinds)):
+        if kind == KIND_MODEL:
+            outputs.append(None)
+            model_indices.append(i)
+        elif kind == KIND_SYMBOLS:
+            outputs.append(text.translate(PUNCTUATION))
+        elif kind == KIND_RULE:
+            outputs.append(_sound_cue(text))
+        else:
+            outputs.append(text)
+    return outputs, model_indices, Counter(kinds)
+
+
+def merge(outputs: List[Optional[str]], model_indices: List[int], translated: List[str]) -> List[str]:
+    """Fill the model's translations back into the pre-filtered outputs."""
+    merged = list(outputs)
+    for i, text in zip(model_indices, translated):
+        merged[i] = text
+    return merged
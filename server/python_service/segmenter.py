@@ -0,0 +1,82 @@
+"""
+Splitting of long subtitle blocks into decode-friendly segments.
+
+Multi-line blocks are split at their line breaks, and lines longer than a
+limit are split after sentence punctuation (。！？), then clause punctuation
+(，；) if a sentence is still too long. Short neighbouring pieces are merged
+back up to the limit so lines are not over-fragmented. The segments of a whole
+batch are translated together and reassembled per block with the original
+line breaks.
+"""
+
+import re
+from typing import List, Tuple
+
+SENTENCE_END = re.compile(r"(?<=[。！？!?])")
+CLAUSE_END = re.compile(r"(?<=[，；,;])")
+
+# Per block: list of lines, each line a (first segment index, segment count) span
+Layout = List[List[Tuple[int, int]]]
+
+
+def _split_at(text: str, pattern: re.Pattern) -> List[str]:
+    return [piece for piece in pattern.split(text) if piece]
+
+
+def _merge(pieces: List[str], max_chars: int) -> List[str]:
+    """Greedily join adjacent pieces while they fit in max_chars."""
+    merged = []
+    for piece in pieces:
+        if merged and len(merged[-1]) + len(piece) <= max_chars:
+            merged[-1] += piece
+        else:
+            merged.append(piece)
+    return merged
+
+
+def split_line(line: str, max_chars: int) -> List[str]:
+    """Split one line into segments of at most max_chars where punctuation allows."""
+    if len(line) <= max_chars:
+        return [line]
+    pieces = []
+    for sentence in _split_at(line, SENTENCE_END):
+        if len(sentence) > max_chars:
+            pieces.extend(_split_at(sentence, CLAUSE_END))
+        else:
+            pieces.append(sentence)
+    return [segment.strip() for segment in _merge(pieces, max_chars) if segment.strip()]
+
+
+def needs_segmentation(text: str, max_chars: int) -> bool:
+    return "\n" in text or len(text) > max_chars
+
+
+def segment_texts(texts: List[str], max_chars: int) -> Tuple[List[str], Layout]:
+    """
+    Flatten blocks into segments for one batched decode.
+
+    Empty lines get no segment and come back empty.
+    """
+    segments = []
+    layout = []
+    for text in texts:
+        lines = []
+        for line in text.split("\n"):
+            pieces = split_line(line.strip(), max_chars) if line.strip() else []
+            lines.append((len(segments), len(pieces)))
+            segments.extend(pieces)
+        layout.append(lines)
+    return segments, layout
+
+
+def reassemble(translated: List[str], layout: Layout) -> List[str]:
+    """Rebuild each block from its translated segments, keeping line breaks."""
+    blocks = []
+    for lines in layout:
+        blocks.append("\n".join(" ".join(translated[start:start + count]) for start, count in lines))
+    return blocks
+
+
+def group(values: List, layout: Layout) -> List[List]:
+    """Per-segment values (e.g. decode pass) gathered per block."""
+    return [[value for start, count in lines for value in values[start:start + count]] for lines in layout]
@@ -0,0 +1,167 @@
+"""
+Leveled, structured logging for the service, written off the request path.
+
+setup_logging() sends every record of the root logger through a QueueHandler.
+Logging a line only puts the record on an in-memory queue. A QueueListener
+thread formats it and writes it to stdout, so a slow console or pipe no longer
+stalls the request that logged.
+
+Records can carry structured fields (extra={"model_id": ..., "lines": ...}).
+They are written after the message as key=value pairs (LOG_FORMAT=text) or as
+keys of one JSON object per line (LOG_FORMAT=json). Records logged while a
+request is served also get its request_id.
+
+Per-request debug lines (batch sizes, language settings, token dumps) are
+sampled per request. RequestContextMiddleware picks a request with probability
+LOG_SAMPLE_RATE when it starts. Debug records are kept only for picked
+requests, so a sampled request has all of its lines. Debug records logged
+outside a request (startup, model loading) are always kept. Token dumps are
+off unless LOG_TOKENS=1 because they contain user text.
+"""
+
+import atexit
+import contextvars
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from contextlib import contextmanager
+from typing import Optional
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")  # text | json
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "0.01"))  # Requests whose debug lines are kept
+LOG_TOKENS = int(os.environ.get("LOG_TOKENS", "0"))  # 1 = log source tokens (debug level, sampled)
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Attributes every LogRecord has; anything else on a record is a structured field
+STANDARD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+# (request id, sampled) of the request being served; copied into worker threads by asyncio.to_thread
+_request = contextvars.ContextVar("log_request", default=None)
+_request_ids = itertools.count(1)
+_listener = None
+_handler = None
+
+
+def fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in record.__dict__.items() if k not in STANDARD_ATTRIBUTES and not k.startswith("_")}
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = fields(record)
+        if extra:
+            # Keep traceback lines last
+            message, sep, traceback = line.partition("\n")
+            line = message + " " + " ".join(f"{k}={v}" for k, v in extra.items()) + sep + traceback
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **fields(record)
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RequestFilter(logging.Filter):
+    """Drops debug records of unsampled requests and tags the rest with the request id."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        state = _request.get()
+        if state is None:
+            return True
+        request_id, sampled = state
+        if record.levelno <= logging.DEBUG and not sampled:
+            return False
+        record.request_id = request_id
+        return True
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener thread formats; only make the record safe to hand over (args may be mutated later)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def sampled() -> bool:
+    """Whether debug lines of the current request are kept (True outside requests)."""
+    state = _request.get()
+    return state is None or state[1]
+
+
+def log_tokens(logger: logging.Logger) -> bool:
+    """Whether token dumps should be built and logged right now."""
+    return bool(LOG_TOKENS) and logger.isEnabledFor(logging.DEBUG) and sampled()
+
+
+@contextmanager
+def request_context(sample_rate: Optional[float] = None):
+    """Tag log records with a new request id and decide whether its debug lines are kept."""
+    rate = LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+    token = _request.set((f"{next(_request_ids):x}", random.random() < rate))
+    try:
+        yield
+    finally:
+        _request.reset(token)
+
+
+class RequestContextMiddleware:
+    """ASGI middleware running each HTTP request in a request_context()."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with request_context():
+            await self.app(scope, receive, send)
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None) -> logging.handlers.QueueListener:
+    """
+    Route the root logger through a queue to a listener thread writing to
+    stream (default stdout). Safe to call again: the existing listener is kept.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return _listener
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT))
+
+    _handler = QueueHandler(queue.SimpleQueue())
+    _handler.addFilter(RequestFilter())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_handler)
+
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Write out queued records and stop the listener thread."""
+    global _listener, _handler
+    if _listener is not None:
+        logging.getLogger().removeHandler(_handler)
+        _listener.stop()
+        _listener = _handler = None
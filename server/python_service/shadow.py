@@ -0,0 +1,128 @@
+"""
+Shadow evaluation of a candidate model on live traffic.
+
+A configurable fraction of production requests is mirrored to a candidate
+model after the primary response has been produced. The candidate runs in a
+low-priority background lane: samples wait while primary requests are queued
+and are dropped (not delayed) when the lane falls behind, so the primary path
+never waits on the shadow.
+"""
+
+import asyncio
+import difflib
+import logging
+import random
+import time
+from collections import deque
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowEvaluator:
+    def __init__(self, candidate, translate: Callable, is_busy: Callable[[], bool],
+                 sample_rate: float = 0.1, max_pending: int = 16, max_examples: int = 20):
+        """
+        Args:
+            candidate: LoadedModel to evaluate
+            translate: Blocking translate(texts, loaded) function, run in a worker thread
+            is_busy: Returns True while primary requests are waiting; the lane yields to them
+            sample_rate: Fraction of requests mirrored to the candidate (0-1)
+            max_pending: Samples buffered before new ones are dropped
+            max_examples: Number of recent differing outputs kept for inspection
+        """
+        self.candidate = candidate
+        self.translate = translate
+        self.is_busy = is_busy
+        self.sample_rate = sample_rate
+        self._queue = asyncio.Queue(maxsize=max_pending)
+        self._task = None
+
+        self.examples = deque(maxlen=max_examples)
+        self.stats = {
+            "mirrored_requests": 0,
+            "dropped_requests": 0,
+            "evaluated_requests": 0,
+            "failed_requests": 0,
+            "lines": 0,
+            "identical_lines": 0,
+            "similarity_sum": 0.0,
+            "primary_time_s": 0.0,
+            "candidate_time_s": 0.0
+        }
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def offer(self, texts: List[str], primary_texts: List[str], primary_time: float):
+        """Maybe mirror a finished request. Never blocks."""
+        if not texts or random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((texts, primary_texts, primary_time))
+            self.stats["mirrored_requests"] += 1
+        except asyncio.QueueFull:
+            self.stats["dropped_requests"] += 1
+
+    async def _run(self):
+        while True:
+            texts, primary_texts, primary_time = await self._queue.get()
+            # Low priority: only use the CPU when no primary request is waiting
+            while self.is_busy():
+                await asyncio.sleep(0.05)
+            try:
+                start_time = time.time()
+                candidate_texts = await asyncio.to_thread(self.translate, texts, self.candidate)
+                self._record(texts, primary_texts, candidate_texts, primary_time, time.time() - start_time)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["failed_requests"] += 1
+                logger.warning("Shadow translation error (%s): %s", self.candidate.model_id, e)
+
+    def _record(self, texts, primary_texts, candidate_texts, primary_time, candidate_time):
+        self.stats["evaluated_requests"] += 1
+        self.stats["lines"] += len(texts)
+        self.stats["primary_time_s"] += primary_time
+        self.stats["candidate_time_s"] += candidate_time
+        for source, primary, candidate in zip(texts, primary_texts, candidate_texts):
+            if primary == candidate:
+                self.stats["identical_lines"] += 1
+                self.stats["similarity_sum"] += 1.0
+                continue
+            similarity = difflib.SequenceMatcher(None, primary, candidate).ratio()
+            self.stats["similarity_sum"] += similarity
+            self.examples.append({
+                "source": source,
+                "primary": primary,
+                "candidate": candidate,
+                "similarity": round(similarity, 3)
+            })
+
+    def report(self) -> Dict:
+        s = self.stats
+        evaluated = s["evaluated_requests"]
+        lines = s["lines"]
+        return {
+            "candidate": self.candidate.model_id,
+            "backend": self.candidate.backend,
+            "sample_rate": self.sample_rate,
+            "pending": self._queue.qsize(),
+            "mirrored_requests": s["mirrored_requests"],
+            "dropped_requests": s["dropped_requests"],
+            "evaluated_requests": evaluated,
+            "failed_requests": s["failed_requests"],
+            "lines": lines,
+            "identical_rate": round(s["identical_lines"] / lines, 4) if lines else None,
+            "mean_similarity": round(s["similarity_sum"] / lines, 4) if lines else None,
+            "primary_avg_ms": round(s["primary_time_s"] / evaluated * 1000, 2) if evaluated else None,
+            "candidate_avg_ms": round(s["candidate_time_s"] / evaluated * 1000, 2) if evaluated else None,
+            "primary_lines_per_s": round(lines / s["primary_time_s"], 2) if s["primary_time_s"] else None,
+            "candidate_lines_per_s": round(lines / s["candidate_time_s"], 2) if s["candidate_time_s"] else None,
+            "recent_differences": list(self.examples)
+        }
@@ -0,0 +1,102 @@
+"""
+Token streaming for interactive single-line translation.
+
+The decode loop (CTranslate2's generate_tokens(), or Transformers' generate()
+with a TokenStreamer) hands each generated token id to a TextDeltas, which
+detokenizes the ids so far and returns the text added since the last call.
+Decoding the whole prefix again keeps SentencePiece spacing right. A character
+split over several byte tokens decodes to U+FFFD until its last byte arrives,
+so text is held back while it ends with one.
+
+Streaming decodes greedily: beam search only knows its best hypothesis at the
+end. LatencyStats keeps the time to the first text chunk and the total latency
+of recent streams, for /metrics.
+"""
+
+import statistics
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import torch
+from transformers import StoppingCriteria
+from transformers.generation.streamers import BaseStreamer
+
+INCOMPLETE = "\ufffd"  # Replacement character of an incomplete byte sequence
+
+
+class TextDeltas:
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.ids: List[int] = []
+        self.text = ""  # Text returned so far
+
+    def push(self, token_id: int) -> str:
+        """Add a generated token; returns the new text (may be empty)."""
+        self.ids.append(token_id)
+        text = self.tokenizer.decode(self.ids, skip_special_tokens=True)
+        # Already returned text can't be taken back: wait until the decode extends it again
+        if text.endswith(INCOMPLETE) or not text.startswith(self.text):
+            return ""
+        delta, self.text = text[len(self.text):], text
+        return delta
+
+    def finish(self) -> str:
+        """Full text of the generated tokens."""
+        return self.tokenizer.decode(self.ids, skip_special_tokens=True)
+
+
+class TokenStreamer(BaseStreamer):
+    """generate(streamer=...) adapter calling on_token(id) for each generated token (batch of one)."""
+
+    def __init__(self, on_token: Callable[[int], None]):
+        self.on_token = on_token
+        self.prompt_seen = False
+
+    def put(self, value):
+        # generate() first passes the decoder start token(s)
+        if not self.prompt_seen:
+            self.prompt_seen = True
+            return
+        for token_id in value.reshape(-1).tolist():
+            self.on_token(token_id)
+
+    def end(self):
+        pass
+
+
+class StopOnEvent(StoppingCriteria):
+    """Stops generate() once event is set (e.g. the client disconnected)."""
+
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def __call__(self, input_ids: torch.LongTensor, scores, **kwargs) -> torch.BoolTensor:
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+def summarize(values) -> Optional[Dict]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        "mean": round(statistics.fmean(ordered) * 1000, 2),
+        "p50": round(ordered[len(ordered) // 2] * 1000, 2),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2)
+    }
+
+
+class LatencyStats:
+    """Time to first chunk and total latency (seconds) of the last window streams."""
+
+    def __init__(self, window: int = 100):
+        self.first_chunk = deque(maxlen=window)
+        self.total = deque(maxlen=window)
+
+    def record(self, first_chunk_s: Optional[float], total_s: float):
+        if first_chunk_s is not None:
+            self.first_chunk.append(first_chunk_s)
+        self.total.append(total_s)
+
+    def snapshot(self) -> Dict:
+        return {"ttft_ms": summarize(self.first_chunk), "total_ms": summarize(self.total)}
@@ -0,0 +1,65 @@
+"""
+pytest setup: python -m pytest server/python_service/tests
+
+The suite runs on the tiny random models of make_fixtures.py, built once per
+session in a temporary directory, so it needs neither the real checkpoints nor
+a GPU. The other scripts in this folder are manual checks against the real
+models and are not collected.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+collect_ignore = [
+    "debug_mbart.py",
+    "simple_test.py",
+    "test_ct2_mbart.py",
+    "test_mbart.py",
+    "test_mbart2.py",
+    "test_repetition.py"
+]
+
+# main.py reads its settings on import: point everything it reads or writes at the session directory
+FIXTURE_ROOT = tempfile.mkdtemp(prefix="subtitle-service-tests-")
+MODELS_PATH = os.path.join(FIXTURE_ROOT, "models")
+os.environ.update({
+    "CUDA_VISIBLE_DEVICES": "",
+    "MODELS_PATH": MODELS_PATH,
+    "VERSIONS_PATH": os.path.join(FIXTURE_ROOT, "versions"),
+    "ARTIFACT_STORE_PATH": os.path.join(FIXTURE_ROOT, "artifacts"),
+    "MODEL_CATALOG_PATH": os.path.join(FIXTURE_ROOT, "model_catalog.json"),
+    "TUNING_PROFILE_PATH": os.path.join(FIXTURE_ROOT, "tuning_profile.json"),
+    "JOB_DB_PATH": os.path.join(FIXTURE_ROOT, "jobs.db"),
+    "GLOSSARY_DIR": os.path.join(FIXTURE_ROOT, "glossaries"),
+    "TM_DB_PATH": os.path.join(FIXTURE_ROOT, "tm.db"),
+    "HF_CPU_MODE": "fp32",
+    "MODEL_IDLE_TIMEOUT": "0"
+})
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(FIXTURE_ROOT, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def fixture_models():
+    """models/ with the opus, mbart and nllb fixtures and their _ct2 conversions."""
+    from make_fixtures import make_fixtures
+    make_fixtures(MODELS_PATH)
+    return MODELS_PATH
+
+
+@pytest.fixture(scope="session")
+def client(fixture_models):
+    """TestClient of the service, started (default model loaded) on the fixtures."""
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as test_client:
+        yield test_client
@@ -0,0 +1,63 @@
+"""Artifact store: model directories rebuilt from blobs without losing newer files."""
+
+import os
+import stat
+
+import pytest
+
+import artifact_store
+from artifact_store import ArtifactStore, auto_ingest, hash_file
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    """models/model in a service directory of its own, with the store in artifacts/."""
+    monkeypatch.setattr(artifact_store, "SCRIPT_DIR", str(tmp_path))
+    path = tmp_path / "models" / "model"
+    path.mkdir(parents=True)
+    return path
+
+
+def write(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def test_resolve_relinks_missing_files(tmp_path, model_dir):
+    store = ArtifactStore(str(tmp_path / "artifacts"))
+    write(model_dir / "vocab.json", "{}")
+    manifest = store.ingest(str(model_dir))
+
+    os.remove(model_dir / "vocab.json")
+    store.resolve(str(model_dir))
+    assert os.path.samefile(model_dir / "vocab.json", store.blob_path(manifest["files"]["vocab.json"]["sha256"]))
+
+
+def test_resolve_keeps_retrained_files(tmp_path, model_dir):
+    store = ArtifactStore(str(tmp_path / "artifacts"))
+    write(model_dir / "model.bin", "old weights")
+    old_digest = store.ingest(str(model_dir), link_in_place=False)["files"]["model.bin"]["sha256"]
+    # Storing without linking leaves the file writable: retrain in place
+    assert os.stat(model_dir / "model.bin").st_mode & stat.S_IWUSR
+
+    write(model_dir / "model.bin", "retrained weights")
+    store.resolve(str(model_dir))
+    assert (model_dir / "model.bin").read_text() == "retrained weights"
+    # The manifest follows the new file; the old blob is untouched
+    new_digest = store.manifest(store.name_for(str(model_dir)))["files"]["model.bin"]["sha256"]
+    assert new_digest == hash_file(str(model_dir / "model.bin")) != old_digest
+    assert hash_file(store.blob_path(old_digest)) == old_digest
+
+
+def test_only_model_directories_are_stored(tmp_path, model_dir, monkeypatch):
+    store = ArtifactStore(str(tmp_path / "artifacts"))
+    other = tmp_path / "scratch"
+    other.mkdir()
+    with pytest.raises(ValueError):
+        store.ingest(str(other))
+
+    # Conversions and exports are stored only when ARTIFACT_STORE=1
+    assert auto_ingest(str(model_dir), store=store) is None
+    monkeypatch.setattr(artifact_store, "AUTO_INGEST", True)
+    assert auto_ingest(str(other), store=store) is None
+    assert auto_ingest(str(model_dir), store=store) is not None
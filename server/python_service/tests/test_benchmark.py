@@ -0,0 +1,36 @@
+"""benchmark.py end to end on the fixture models (see conftest.py)."""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmark import ModelBenchmark
+from conftest import SERVICE_DIR
+
+
+@pytest.mark.parametrize("model_dir, backend", [
+    ("opus_ct2", "ctranslate2"),
+    ("nllb_ct2", "ctranslate2"),
+    ("mbart", "transformers")
+])
+def test_run_full_benchmark(fixture_models, model_dir, backend):
+    benchmark = ModelBenchmark(os.path.join(fixture_models, model_dir), model_dir)
+    assert benchmark.backend == backend
+    results = benchmark.run_full_benchmark(latency_iterations=3, throughput_iterations=2)
+    assert results["model_id"] == model_dir
+    assert results["latency"]["mean_ms"] > 0
+    assert results["throughput"]["sentences_per_second"] > 0
+
+
+def test_cli(fixture_models, tmp_path):
+    output = tmp_path / "results.json"
+    subprocess.run(
+        [sys.executable, "benchmark.py", "--model", "opus_ct2", "--models-path", fixture_models,
+         "--latency-iterations", "2", "--throughput-iterations", "1", "--output", str(output)],
+        cwd=SERVICE_DIR, check=True
+    )
+    results = json.loads(output.read_text())
+    assert [(r["model_id"], r["backend"]) for r in results] == [("opus_ct2", "ctranslate2")]
@@ -0,0 +1,25 @@
+"""Quality checks that decide whether a greedy line is decoded again with beam search."""
+
+import pytest
+
+from decoding import REASON_ENGLISH, contains_english, suspect_reason
+
+
+@pytest.mark.parametrize("text", [
+    "Xin chào thế giới",
+    "Cảm ơn bạn rất nhiều",
+    "Anh yêu em",
+    "Không sao đâu, em đừng lo"
+])
+def test_vietnamese_is_not_english(text):
+    assert not contains_english(text)
+
+
+@pytest.mark.parametrize("text", ["Hello world", "I love you", "This is a test"])
+def test_english_is_detected(text):
+    assert contains_english(text)
+
+
+def test_vietnamese_greedy_output_is_kept():
+    assert suspect_reason("谢谢你", "Cảm ơn bạn rất nhiều", None, -1.0) is None
+    assert suspect_reason("谢谢你", "Thank you very much", None, -1.0) == REASON_ENGLISH
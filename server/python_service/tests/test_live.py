@@ -0,0 +1,89 @@
+"""Live-caption sessions: prefix reuse, revisions and coalescing of updates."""
+
+import threading
+import time
+
+import pytest
+
+import main
+from live_captions import LiveSession, LiveSessionStore
+
+GROWING = ["今天", "今天天气", "今天天气很好", "今天天气很好。"]
+
+
+def test_prefix_follows_source_revisions():
+    session = LiveSession("s", "opus", mask_tokens=2)
+    assert session.reusable_prefix("今天") == []
+    session.record("今天", "Hôm nay", ["▁Hôm", "▁nay", "▁là"], 0)
+    # Extending the source reuses the translation minus its last mask_tokens tokens
+    assert session.reusable_prefix("今天天气") == ["▁Hôm"]
+    session.record("今天天气", "Hôm nay trời đẹp", ["▁Hôm", "▁nay", "▁trời", "▁đẹp", "▁quá"], 1)
+    assert session.reusable_prefix("今天天气很好") == ["▁Hôm", "▁nay", "▁trời"]
+    # A revision after "今天" falls back to the prefix that was valid for "今天"
+    assert session.reusable_prefix("今天晚上") == ["▁Hôm"]
+    assert session.reusable_prefix("明天") == []
+
+
+def test_store_expires_idle_sessions():
+    store = LiveSessionStore(ttl=60, max_sessions=2)
+    first, second = store.create("opus"), store.create("opus")
+    store.create("opus")
+    assert store.get(first.session_id) is None  # Oldest closed when full
+    second.last_used -= 120
+    assert store.get(second.session_id) is None
+    assert len(store) == 1
+
+
+@pytest.mark.parametrize("model_id", ["opus", "mbart"])
+def test_partial_updates_reuse_previous_translation(client, model_id):
+    session_id = client.post("/live/sessions", json={"model_id": model_id}).json()["session_id"]
+    responses = [client.post(f"/live/sessions/{session_id}", json={"text": t}).json() for t in GROWING]
+    assert responses[0]["reused_tokens"] == 0
+    assert all(r["reused_tokens"] > 0 for r in responses[1:])
+    assert [r["source_text"] for r in responses] == GROWING
+
+    final = client.post(f"/live/sessions/{session_id}", json={"text": GROWING[-1], "final": True}).json()
+    assert final["final"]
+    assert final["translated_text"] == main.translate_texts([GROWING[-1]], main.model_pool[model_id])[0]
+    assert client.get(f"/live/sessions/{session_id}").json()["source_text"] == ""
+
+
+def test_unchanged_update_is_not_decoded(client):
+    session_id = client.post("/live/sessions", json={"model_id": "opus"}).json()["session_id"]
+    first = client.post(f"/live/sessions/{session_id}", json={"text": "你好"}).json()
+    again = client.post(f"/live/sessions/{session_id}", json={"text": "你好"}).json()
+    assert again["decoded_tokens"] == 0
+    assert again["translated_text"] == first["translated_text"]
+
+
+def test_updates_arriving_during_a_decode_are_coalesced(client, monkeypatch):
+    translate_live = main.translate_live
+
+    def slow_translate_live(*args):
+        time.sleep(0.3)
+        return translate_live(*args)
+
+    monkeypatch.setattr(main, "translate_live", slow_translate_live)
+    session_id = client.post("/live/sessions", json={"model_id": "opus"}).json()["session_id"]
+    responses = {}
+
+    def send(text):
+        responses[text] = client.post(f"/live/sessions/{session_id}", json={"text": text}).json()
+
+    threads = []
+    for text in GROWING[:3]:
+        threads.append(threading.Thread(target=send, args=(text,)))
+        threads[-1].start()
+        time.sleep(0.1)
+    for thread in threads:
+        thread.join()
+    # The middle update was replaced by the last one while the first was decoding
+    assert [responses[t]["superseded"] for t in GROWING[:3]] == [False, True, False]
+    assert client.get(f"/live/sessions/{session_id}").json()["source_text"] == GROWING[2]
+
+
+def test_unknown_session(client):
+    assert client.post("/live/sessions/missing", json={"text": "你好"}).status_code == 404
+    session_id = client.post("/live/sessions", json={"model_id": "opus"}).json()["session_id"]
+    assert client.delete(f"/live/sessions/{session_id}").status_code == 200
+    assert client.get(f"/live/sessions/{session_id}").status_code == 404
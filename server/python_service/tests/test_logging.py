@@ -0,0 +1,63 @@
+"""service_logging: per-request sampling and the structured formats."""
+
+import io
+import json
+import logging
+
+import pytest
+
+import service_logging
+
+
+@pytest.fixture
+def capture():
+    """A logger whose records go through RequestFilter to a JSON stream."""
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(service_logging.JsonFormatter())
+    handler.addFilter(service_logging.RequestFilter())
+    logger = logging.getLogger("tests.logging")
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    yield logger, lambda: [json.loads(line) for line in stream.getvalue().splitlines()]
+    logger.removeHandler(handler)
+
+
+def test_debug_lines_follow_request_sampling(capture):
+    logger, records = capture
+    with service_logging.request_context(sample_rate=1.0):
+        logger.debug("kept")
+    with service_logging.request_context(sample_rate=0.0):
+        logger.debug("dropped")
+        logger.info("info is never sampled")
+    logger.debug("outside a request")
+    assert [r["message"] for r in records()] == ["kept", "info is never sampled", "outside a request"]
+
+
+def test_json_fields_and_request_id(capture):
+    logger, records = capture
+    with service_logging.request_context(sample_rate=0.0):
+        logger.warning("Model %s active", "opus", extra={"model_id": "opus", "lines": 3})
+    record = records()[0]
+    assert record["message"] == "Model opus active"
+    assert record["level"] == "WARNING"
+    assert (record["model_id"], record["lines"]) == ("opus", 3)
+    assert "request_id" in record
+
+
+def test_text_format_appends_fields():
+    record = logging.LogRecord("main", logging.INFO, __file__, 1, "Loaded %s", ("opus",), None)
+    record.backend = "ctranslate2"
+    line = service_logging.TextFormatter(service_logging.TEXT_FORMAT).format(record)
+    assert line.endswith("INFO main: Loaded opus backend=ctranslate2")
+
+
+def test_token_dumps_off_by_default(capture, monkeypatch):
+    logger, _ = capture
+    assert not service_logging.log_tokens(logger)
+    monkeypatch.setattr(service_logging, "LOG_TOKENS", 1)
+    with service_logging.request_context(sample_rate=1.0):
+        assert service_logging.log_tokens(logger)
+    with service_logging.request_context(sample_rate=0.0):
+        assert not service_logging.log_tokens(logger)
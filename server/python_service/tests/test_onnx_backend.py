@@ -0,0 +1,18 @@
+"""onnx_backend.py decoding helpers against their Transformers counterparts."""
+
+import numpy as np
+import torch
+from transformers import RepetitionPenaltyLogitsProcessor
+
+from onnx_backend import apply_repetition_penalty
+
+
+def test_repetition_penalty_matches_transformers():
+    rng = np.random.default_rng(0)
+    logits = rng.normal(size=(2, 50)).astype(np.float32)
+    tokens = np.array([[0, 3, 7, 3], [0, 12, 40, 41]])
+    expected = RepetitionPenaltyLogitsProcessor(1.5)(torch.from_numpy(tokens), torch.from_numpy(logits.copy())).numpy()
+
+    scores = logits.copy()
+    apply_repetition_penalty(scores, tokens, 1.5)
+    np.testing.assert_allclose(scores, expected)
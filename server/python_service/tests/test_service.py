@@ -0,0 +1,208 @@
+"""Model loading and the translation endpoints, on the fixture models (see conftest.py)."""
+
+import os
+import shutil
+import time
+
+import pytest
+
+import main
+
+LINES = ["你好，世界！", "今天天气很好。", "♪ ♪", "", "我喜欢学习中文。"]
+
+
+@pytest.mark.parametrize("model_id, backend", [
+    ("opus", "ctranslate2"),
+    ("nllb", "ctranslate2"),
+    ("mbart", "transformers")  # CT2 mBART has repetition issues, so the conversion is never used
+])
+def test_load_model_bundle(fixture_models, model_id, backend):
+    loaded = main.load_model_bundle(model_id)
+    assert loaded.model_id == model_id
+    assert loaded.backend == backend
+    assert loaded.load_time > 0
+    assert isinstance(main.translate_texts(["你好"], loaded)[0], str)
+
+
+def test_parking_keeps_cpu_transformers_weights(fixture_models):
+    loaded = main.load_model_bundle("mbart")
+    # Dropping CPU weights would make reactivation a cold load
+    assert not loaded.park()
+    assert not loaded.parked and loaded.model is not None
+
+
+def test_cpu_mode_is_validated_once(fixture_models, monkeypatch, tmp_path):
+    from transformers import AutoTokenizer
+
+    calls = []
+    validate = main.validate_cpu_mode
+
+    def counting_validate(path, mode, *args, **kwargs):
+        calls.append(mode)
+        return validate(path, mode, *args, **kwargs)
+
+    monkeypatch.setattr(main, "validate_cpu_mode", counting_validate)
+    monkeypatch.setattr(main, "tuning_profile", {})
+    monkeypatch.setattr(main, "TUNING_PROFILE_PATH", str(tmp_path / "tuning_profile.json"))
+    path = str(tmp_path / "mbart")
+    shutil.copytree(os.path.join(fixture_models, "mbart", "final_model"), path)
+    tokenizer = AutoTokenizer.from_pretrained(path)
+    modes = {main.load_cpu_variant("mbart", path, tokenizer, "sdpa")[1] for _ in range(2)}
+    # The second load reads the agreement recorded by the first
+    assert calls == ["sdpa"]
+    assert len(modes) == 1
+    assert "sdpa" in main.load_profile(str(tmp_path / "tuning_profile.json"))["models"]["mbart"]["cpu_mode_agreement"]
+
+    # Retrained weights are validated again
+    weights = next(os.path.join(path, f) for f in os.listdir(path) if f.endswith((".safetensors", ".bin")))
+    os.utime(weights, ns=(0, os.stat(weights).st_mtime_ns + 10 ** 9))
+    main.load_cpu_variant("mbart", path, tokenizer, "sdpa")
+    assert calls == ["sdpa", "sdpa"]
+
+
+def test_load_missing_model(fixture_models):
+    with pytest.raises(main.HTTPException) as excinfo:
+        main.load_model_bundle("missing")
+    assert excinfo.value.status_code == 404
+
+
+def test_startup_loads_default_model(client):
+    versions = client.get("/versions").json()
+    assert versions["available_versions"] == ["mbart", "nllb", "opus"]
+    assert versions["current_version"] == "mbart"
+    states = {m["model_id"]: m["state"] for m in versions["models"]}
+    assert states["mbart"] == "active"
+
+
+def test_translate(client):
+    response = client.post("/translate", json={"text": "你好，世界！", "model_id": "opus"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["model_used"] == "opus"
+    assert data["backend"] == "ctranslate2"
+    assert data["skipped_lines"] == 0
+    assert isinstance(data["translated_text"], str)
+
+
+def test_translate_skips_lines_without_text(client):
+    data = client.post("/translate", json={"text": "♪ ♪"}).json()
+    assert data["skipped_lines"] == 1
+    assert data["translated_text"] == "♪ ♪"
+
+
+@pytest.mark.parametrize("model_id", ["opus", "nllb", "mbart"])
+def test_translate_batch(client, model_id):
+    response = client.post("/translate_batch", json={"texts": LINES, "model_id": model_id, "memory": False})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["model_used"] == model_id
+    assert len(data["translated_texts"]) == len(LINES)
+    assert data["skipped_lines"] == 2
+    assert data["translated_texts"][2:4] == ["♪ ♪", ""]
+    assert data["decode_passes"][2:4] == ["skipped", "skipped"]
+    assert client.get("/versions").json()["current_version"] == model_id
+
+
+def test_translate_batch_reuses_memory(client):
+    texts = ["这是一个测试句子。", "机器学习是一个非常有趣的领域。"]
+    first = client.post("/translate_batch", json={"texts": texts, "model_id": "opus"}).json()
+    second = client.post("/translate_batch", json={"texts": texts, "model_id": "opus"}).json()
+    assert second["memory_lines"] == len(texts)
+    assert second["translated_texts"] == first["translated_texts"]
+
+
+def test_unknown_model(client):
+    response = client.post("/translate_batch", json={"texts": ["你好"], "model_id": "missing"})
+    assert response.status_code == 404
+
+
+
+def test_cancellable_batch_follows_model_batch(client, monkeypatch):
+    calls = []
+
+    def translate(texts):
+        calls.append(len(texts))
+        return texts
+
+    loaded = main.model_pool["opus"]
+    monkeypatch.setattr(loaded, "max_batch_size", 16)
+    monkeypatch.setattr(loaded, "batch_type", "examples")
+    texts = ["你好"] * 40
+    assert main.cancellable_batch(texts, translate, loaded).run() == texts
+    assert calls == [16, 16, 8]
+
+    # Token batches: 4 estimated tokens per line, 16 per batch
+    calls.clear()
+    monkeypatch.setattr(loaded, "batch_type", "tokens")
+    main.cancellable_batch(["你好你好"] * 10, translate, loaded).run()
+    assert calls == ([4, 4, 2] if loaded.is_ct2 else [10])
+
+
+def test_switching_back_keeps_the_model(client):
+    first = main.current_model_id
+    other = "nllb" if first != "nllb" else "opus"
+    model = main.active_model
+    # A request still running on the first model holds back its retirement past the switch back
+    with model.lease():
+        for model_id in (other, first):
+            response = client.post("/translate_batch", json={"texts": ["你好"], "model_id": model_id, "memory": False})
+            assert response.json()["model_used"] == model_id
+    # Give both retirements time to run
+    for _ in range(50):
+        time.sleep(0.1)
+        if other not in main.model_pool:
+            break
+    time.sleep(0.5)
+    assert main.active_model is model
+    assert main.model_pool[first] is model
+    assert not model.parked
+
+
+def test_job_for_another_model_keeps_the_active_model(client):
+    active = main.current_model_id
+    other = "nllb" if active != "nllb" else "opus"
+    job = client.post("/jobs", json={"texts": ["你好", "今天天气很好。"], "model_id": other}).json()
+    for _ in range(100):
+        status = client.get(f"/jobs/{job['id']}").json()["status"]
+        if status in ("completed", "failed"):
+            break
+        time.sleep(0.1)
+    assert status == "completed"
+    assert main.current_model_id == active
+    assert len(client.get(f"/jobs/{job['id']}/result").json()["translated_texts"]) == 2
+
+
+def test_set_version_loads_a_published_version(client, fixture_models):
+    version = os.path.join(main.VERSIONS_PATH, "v-test")
+    shutil.copytree(os.path.join(fixture_models, "opus"), version)
+    previous = main.current_model_id
+    try:
+        response = client.post("/set_version", json={"version": "v-test"})
+        assert response.status_code == 200
+        assert response.json()["current_version"] == "v-test"
+        assert main.active_model.model_path.startswith(version)
+    finally:
+        client.post("/set_version", json={"version": previous})
+        shutil.rmtree(version)
+
+
+def test_glossary_edit_invalidates_memory(client):
+    texts = ["小明今天很高兴。"]
+    body = {"texts": texts, "model_id": "opus", "project_id": "tm-glossary"}
+    client.put("/glossaries/tm-glossary", json={"entries": [{"source": "小明", "target": "Minh"}]})
+    client.post("/translate_batch", json=body)
+    assert client.post("/translate_batch", json=body).json()["memory_lines"] == 1
+
+    client.put("/glossaries/tm-glossary", json={"entries": [{"source": "小明", "target": "Tiểu Minh"}]})
+    assert client.post("/translate_batch", json=body).json()["memory_lines"] == 0
+
+
+def test_autotune_matches_what_the_service_loads(monkeypatch):
+    import autotune
+    from model_catalog import is_model_name
+
+    assert is_model_name("opus") and not is_model_name("opus_ct2_backup") and not is_model_name("opus_onnx")
+    monkeypatch.setenv("HF_CPU_MODE", "int8")
+    assert autotune.service_cpu_mode("mbart", {"int8": 1.0}) == "int8"
+    assert autotune.service_cpu_mode("mbart", {"int8": 0.5}) == "fp32"
+    assert autotune.service_cpu_mode("mbart", {"int8": None}) == "fp32"
@@ -0,0 +1,60 @@
+"""/translate/stream: streamed chunks, the done event and latency metrics."""
+
+import json
+
+import pytest
+
+import main
+from streaming import TextDeltas
+
+LINE = "今天天气很好，我们一起去公园散步吧。我喜欢学习中文。"
+
+
+def stream(client, body):
+    with client.stream("POST", "/translate/stream", json=body) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        return [json.loads(line[len("data: "):]) for line in response.iter_lines() if line.startswith("data: ")]
+
+
+@pytest.mark.parametrize("model_id", ["opus", "nllb"])
+def test_chunks_add_up_to_translation(client, model_id):
+    events = stream(client, {"text": LINE, "model_id": model_id})
+    chunks, done = events[:-1], events[-1]
+    assert len(chunks) > 1
+    assert done["done"] and done["model_used"] == model_id
+    assert "".join(c["text"] for c in chunks) == done["translated_text"]
+    assert done["translated_text"] == main.translate_text(LINE, main.model_pool[model_id])
+    assert 0 < done["ttft_ms"] <= done["total_ms"]
+
+
+def test_two_pass_model_reports_final_pass(client):
+    done = stream(client, {"text": LINE, "model_id": "mbart"})[-1]
+    assert done["decode_pass"] in ("greedy", "beam")
+    assert done["translated_text"] == main.translate_text(LINE, main.model_pool["mbart"])
+
+
+def test_skipped_line_is_sent_whole(client):
+    events = stream(client, {"text": "♪ ♪"})
+    assert events[0] == {"text": "♪ ♪"}
+    assert events[1]["decode_pass"] == "skipped"
+
+
+def test_metrics_report_latencies(client):
+    stream(client, {"text": "你好，世界！", "model_id": "opus"})
+    metrics = client.get("/metrics").json()["streaming"]
+    assert metrics["requests"] >= 1
+    assert metrics["ttft_ms"]["mean"] <= metrics["total_ms"]["mean"]
+
+
+def test_text_deltas_hold_back_incomplete_characters():
+    class ByteTokenizer:
+        def decode(self, ids, skip_special_tokens=True):
+            return bytes(ids).decode("utf-8", errors="replace")
+
+    deltas = TextDeltas(ByteTokenizer())
+    encoded = "Việt".encode("utf-8")
+    chunks = [deltas.push(b) for b in encoded]
+    assert "".join(chunks) == "Việt"
+    assert "�" not in "".join(chunks)
+    assert deltas.finish() == "Việt"
@@ -0,0 +1,218 @@
+"""
+Fuzzy translation memory for near-duplicate lines.
+
+Subtitles repeat with small differences (punctuation, a particle, a name).
+Each translated line is stored with its source in SQLite. An in-memory
+MinHash/LSH index over the characters and character bigrams of the normalized
+source finds earlier lines that are almost the same:
+
+- normalize() applies NFKC, lowercases and drops whitespace and punctuation.
+  Lines that differ only in those have the same key and match with score 1.0.
+- Every line gets NUM_BANDS x ROWS_PER_BAND MinHash values. Lines sharing all
+  values of at least one band are candidates. A lookup costs a few dict
+  lookups, whatever the number of stored lines.
+- Candidates are ranked by shared bands. At most max_candidates of them are
+  scored with difflib's ratio on the normalized text, which is the score
+  reported.
+
+Entries are scoped (by model and project, see main.py) so a translation is
+only reused where it was produced. Storing the same normalized source again
+replaces its translation.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from array import array
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+NUM_BANDS = 8
+ROWS_PER_BAND = 2
+MAX_BUCKET_SCAN = 64  # Newest ids read from one bucket (very common bands are not scanned fully)
+PRIME = 4294967311  # Smallest prime above 2**32
+INDEX_CHUNK = 4096  # Lines hashed per vectorized MinHash call when (re)building the index
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    scope TEXT NOT NULL,
+    normalized TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (scope, normalized)
+);
+"""
+
+# Sentence-final punctuation, full-width forms written the way the model outputs them
+FINAL_PUNCTUATION = {"。": ".", "！": "!", "？": "?", "…": "...", ".": ".", "!": "!", "?": "?"}
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).lower()
+    return "".join(c for c in text if not unicodedata.category(c).startswith(("P", "Z", "C")))
+
+
+def shingles(normalized: str) -> List[str]:
+    return list(set(normalized) | {normalized[i:i + 2] for i in range(len(normalized) - 1)})
+
+
+def final_punctuation(text: str) -> str:
+    text = text.rstrip()
+    if text.endswith(("...", "…")):
+        return "..."
+    return FINAL_PUNCTUATION.get(text[-1:], "") if text else ""
+
+
+def adapt_punctuation(query: str, source: str, target: str) -> str:
+    """Give target the sentence-final punctuation of query when the stored source ended differently."""
+    wanted, stored = final_punctuation(query), final_punctuation(source)
+    if wanted == stored:
+        return target
+    return target.rstrip().rstrip("".join(FINAL_PUNCTUATION)).rstrip() + wanted
+
+
+class TranslationMemory:
+    def __init__(self, db_path: str, max_candidates: int = 32, seed: int = 1):
+        """Open (or create) the memory and index every stored line."""
+        self.db_path = db_path
+        self.max_candidates = max_candidates
+        self._lock = threading.Lock()
+
+        rng = np.random.default_rng(seed)
+        num_hashes = NUM_BANDS * ROWS_PER_BAND
+        self._a = rng.integers(1, 2 ** 32, num_hashes, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, 2 ** 32, num_hashes, dtype=np.uint64)[:, None]
+
+        self._buckets = [dict() for _ in range(NUM_BANDS)]  # band key -> array of ids
+        self._normalized = {}  # id -> normalized source
+        self._scopes = {}  # id -> scope
+        self._exact = {}  # (scope, normalized) -> id
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            cursor = self._conn.execute("SELECT id, scope, normalized FROM segments")
+            while True:
+                rows = cursor.fetchmany(INDEX_CHUNK)
+                if not rows:
+                    break
+                self._index([(row["id"], row["scope"], row["normalized"]) for row in rows])
+
+    def __len__(self) -> int:
+        return len(self._normalized)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _band_keys(self, texts: List[str]) -> List[List[int]]:
+        """LSH band keys of normalized texts (non-empty), MinHashed together in one vectorized pass."""
+        hashes = []
+        starts = []
+        for normalized in texts:
+            starts.append(len(hashes))
+            hashes.extend(zlib.crc32(s.encode("utf-8")) for s in shingles(normalized))
+        values = (self._a * np.array(hashes, dtype=np.uint64)[None, :] + self._b) % PRIME
+        signatures = np.minimum.reduceat(values, starts, axis=1).T.reshape(len(texts), NUM_BANDS, ROWS_PER_BAND)
+        return [[hash(tuple(band)) for band in signature.tolist()] for signature in signatures]
+
+    def _index(self, segments: List[Tuple[int, str, str]]):
+        """Add (id, scope, normalized) segments to the in-memory index."""
+        for start in range(0, len(segments), INDEX_CHUNK):
+            chunk = segments[start:start + INDEX_CHUNK]
+            for (segment_id, scope, normalized), keys in zip(chunk, self._band_keys([s[2] for s in chunk])):
+                self._normalized[segment_id] = normalized
+                self._scopes[segment_id] = scope
+                self._exact[(scope, normalized)] = segment_id
+                for band, key in enumerate(keys):
+                    bucket = self._buckets[band].get(key)
+                    if bucket is None:
+                        bucket = self._buckets[band][key] = array("I")
+                    bucket.append(segment_id)
+
+    def add(self, scope: str, pairs: List[Tuple[str, str]]) -> int:
+        """Store (source, translation) pairs. Returns how many were stored."""
+        now = time.time()
+        stored = 0
+        new_segments = []
+        with self._lock, self._conn:
+            for source, target in pairs:
+                normalized = normalize(source)
+                if not normalized or not target or not target.strip():
+                    continue
+                existing = self._exact.get((scope, normalized))
+                if existing is not None:
+                    self._conn.execute(
+                        "UPDATE segments SET source = ?, target = ?, updated_at = ? WHERE id = ?",
+                        (source, target, now, existing)
+                    )
+                else:
+                    cur = self._conn.execute(
+                        "INSERT INTO segments (scope, normalized, source, target, updated_at) VALUES (?, ?, ?, ?, ?)",
+                        (scope, normalized, source, target, now)
+                    )
+                    # Indexed right away so later pairs of the same batch see it in _exact
+                    self._exact[(scope, normalized)] = cur.lastrowid
+                    new_segments.append((cur.lastrowid, scope, normalized))
+                stored += 1
+            self._index(new_segments)
+        return stored
+
+    def lookup(self, scope: str, text: str, min_score: float) -> Optional[Dict]:
+        """
+        Best stored line similar to text in scope, if it scores at least min_score.
+        Returns {"source", "target", "score"}; the target gets text's final punctuation.
+        """
+        normalized = normalize(text)
+        if not normalized:
+            return None
+        with self._lock:
+            segment_id = self._exact.get((scope, normalized))
+            score = 1.0
+            if segment_id is None:
+                segment_id, score = self._best_candidate(scope, normalized, min_score)
+            if segment_id is None:
+                return None
+            row = self._conn.execute("SELECT source, target FROM segments WHERE id = ?", (segment_id,)).fetchone()
+        return {
+            "source": row["source"],
+            "target": adapt_punctuation(text, row["source"], row["target"]),
+            "score": round(score, 4)
+        }
+
+    def lookup_batch(self, scope: str, texts: List[str], min_score: float) -> List[Optional[Dict]]:
+        return [self.lookup(scope, text, min_score) for text in texts]
+
+    def _best_candidate(self, scope: str, normalized: str, min_score: float) -> Tuple[Optional[int], float]:
+        shared = Counter()
+        for band, key in enumerate(self._band_keys([normalized])[0]):
+            bucket = self._buckets[band].get(key)
+            if bucket:
+                shared.update(bucket[-MAX_BUCKET_SCAN:])
+
+        best_id, best_score = None, min_score
+        length = len(normalized)
+        for segment_id, _ in shared.most_common(self.max_candidates):
+            if self._scopes[segment_id] != scope:
+                continue
+            candidate = self._normalized[segment_id]
+            # ratio() is at most 2 * shorter / (sum of lengths)
+            if 2 * min(length, len(candidate)) / (length + len(candidate)) < best_score:
+                continue
+            score = SequenceMatcher(None, normalized, candidate, autojunk=False).ratio()
+            if score >= best_score:
+                best_id, best_score = segment_id, score
+        return best_id, best_score
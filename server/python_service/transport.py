@@ -0,0 +1,127 @@
+"""
+Body encoding for the batch endpoints.
+
+Requests and responses are negotiated from the Content-Type / Accept headers:
+MessagePack (application/msgpack) when msgpack is installed, JSON otherwise,
+parsed and written with orjson when available. Large bodies can be gzip or
+zstd compressed in both directions (Content-Encoding / Accept-Encoding); zstd
+needs the zstandard package.
+"""
+
+import gzip
+import json
+from typing import Any, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+COMPRESS_MIN_BYTES = 16 * 1024  # Smaller responses are sent uncompressed
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+
+class UnsupportedMediaType(Exception):
+    """Raised for a Content-Type or Content-Encoding this service can't read."""
+
+
+def available_formats() -> dict:
+    return {
+        "json": "orjson" if orjson else "json",
+        "msgpack": msgpack is not None,
+        "encodings": ["gzip"] + (["zstd"] if zstandard else [])
+    }
+
+
+# JSON
+
+def dumps_json(data: Any) -> bytes:
+    if orjson:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads_json(body: bytes) -> Any:
+    if orjson:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+# Requests
+
+def _media_type(header: Optional[str]) -> str:
+    return (header or "").split(";")[0].strip().lower()
+
+
+def decompress(body: bytes, content_encoding: Optional[str]) -> bytes:
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "identity":
+        return body
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "zstd" and zstandard:
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    raise UnsupportedMediaType(f"Unsupported Content-Encoding: {encoding}")
+
+
+def decode_body(body: bytes, content_type: Optional[str], content_encoding: Optional[str]) -> Any:
+    """
+    Decompress and parse a request body.
+    Raises UnsupportedMediaType, or ValueError for a malformed body.
+    """
+    body = decompress(body, content_encoding)
+    media_type = _media_type(content_type)
+    if media_type in MSGPACK_TYPES:
+        if not msgpack:
+            raise UnsupportedMediaType("MessagePack support is not installed")
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except Exception as e:
+            raise ValueError(str(e))
+    if media_type in ("", JSON_TYPE) or media_type.endswith("+json"):
+        return loads_json(body)  # json/orjson decode errors are ValueErrors
+    raise UnsupportedMediaType(f"Unsupported Content-Type: {media_type}")
+
+
+# Responses
+
+def _accepts(header: Optional[str], value: str) -> bool:
+    """True if value is listed in an Accept/Accept-Encoding header without q=0."""
+    for item in (header or "").lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip() == value:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def encode_body(data: Any, accept: Optional[str]) -> Tuple[bytes, str]:
+    """Serialize data in the format the client asked for. Returns (body, media type)."""
+    if msgpack and any(_accepts(accept, media_type) for media_type in MSGPACK_TYPES):
+        return msgpack.packb(data, use_bin_type=True), MSGPACK_TYPE
+    return dumps_json(data), JSON_TYPE
+
+
+def compress(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Compress a large body with the best encoding the client accepts. Returns (body, encoding)."""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    if zstandard and _accepts(accept_encoding, "zstd"):
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), "zstd"
+    if _accepts(accept_encoding, "gzip"):
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
@@ -1,7 +1,7 @@
 import { useState, useEffect, useRef } from 'react';
 import { SubtitleFile, SubtitleEntry } from '../types';
 import { Download, Sparkles, Globe, Clock, Save, ArrowRight, Video, FileText, CheckCircle2, RefreshCw } from 'lucide-react';
-import { translateText } from '../services/libreTranslate';
+import { translateTexts } from '../services/libreTranslate';
 import { translateWithCustomModel, translateBatchWithCustomModel } from '../services/customNLP';
 import { TranslationCard } from './ui/TranslationCard';
 import { useSettings } from '../contexts/SettingsContext';
@@ -170,21 +170,27 @@ export function SubtitleEditor({ file, onUpdate }: SubtitleEditorProps) {
     };
 
     try {
-      // 1. Process LibreTranslate (External API - keep sequential/parallel for now as it's external)
-      const librePromises = currentEntries.map(async (entry, index) => {
-        if (!entry.libreTranslation && !entry.googleTranslation) {
-          try {
-            const text = await translateText(entry.text, 'vi', 'auto');
-            currentEntries[index] = { ...currentEntries[index], libreTranslation: text, libreError: undefined };
-          } catch (e) {
-            console.error("Libre failed", e);
-            currentEntries[index] = { ...currentEntries[index], libreError: "Failed" };
-          }
-          updateProgress();
+      // 1. Process LibreTranslate (one request per chunk, q as an array)
+      const LIBRE_CHUNK_SIZE = 32;
+      const libreIndices = currentEntries
+        .map((entry, index) => (!entry.libreTranslation && !entry.googleTranslation ? index : -1))
+        .filter(index => index !== -1);
+
+      for (const chunk of chunkArray(libreIndices, LIBRE_CHUNK_SIZE)) {
+        try {
+          const translations = await translateTexts(chunk.map(idx => currentEntries[idx].text), 'vi', 'auto');
+          chunk.forEach((entryIdx, i) => {
+            currentEntries[entryIdx] = { ...currentEntries[entryIdx], libreTranslation: translations[i], libreError: undefined };
+          });
+        } catch (e) {
+          console.error("Libre chunk failed", e);
+          chunk.forEach(entryIdx => {
+            currentEntries[entryIdx] = { ...currentEntries[entryIdx], libreError: "Failed" };
+          });
         }
-      });
-      await Promise.all(librePromises);
-      setEditedEntries([...currentEntries]);
+        updateProgress(chunk.length);
+        setEditedEntries([...currentEntries]);
+      }
 
       // 2. Custom Models (Batch Processing)
       const BATCH_SIZE = 32;
@@ -198,7 +204,7 @@ export function SubtitleEditor({ file, onUpdate }: SubtitleEditorProps) {
         for (const chunk of chunks) {
           const textsToTranslate = chunk.map(idx => currentEntries[idx].text);
           try {
-            const translations = await translateBatchWithCustomModel(textsToTranslate, modelId);
+            const translations = await translateBatchWithCustomModel(textsToTranslate, modelId, file.projectId);
 
             // Update entries
             chunk.forEach((entryIdx, i) => {
@@ -9,7 +9,7 @@ import { Input } from '../components/ui/input';
 import { Switch } from '../components/ui/switch';
 import { useTranslation } from '../hooks/useTranslation';
 import { translateText } from '../services/libreTranslate';
-import { translateWithCustomModel } from '../services/customNLP';
+import { streamWithCustomModel } from '../services/customNLP';
 
 export function QuickTranslate() {
   const { t } = useTranslation();
@@ -77,8 +77,8 @@ export function QuickTranslate() {
           setGoogleResult("Translation failed. Please check if LibreTranslate is running.");
         });
 
-      // 2. Call Custom NLP Model (Parallel)
-      const nlpPromise = translateWithCustomModel(sourceText, selectedModel)
+      // 2. Call Custom NLP Model (Parallel), showing the translation as it is decoded
+      const nlpPromise = streamWithCustomModel(sourceText, selectedModel, chunk => setNlpResult(prev => prev + chunk))
         .then(res => setNlpResult(res))
         .catch(err => {
           console.error("Custom NLP failed", err);
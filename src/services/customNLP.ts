@@ -40,16 +40,67 @@ export async function translateWithCustomModel(
     }
 }
 
+// Translate one line through /translate/stream: onChunk receives the text as it is decoded.
+// Resolves with the final translation, which replaces the streamed text (it can differ when
+// the service re-decodes a suspect line with beam search).
+export async function streamWithCustomModel(
+    text: string,
+    modelId: string | undefined,
+    onChunk: (chunk: string) => void
+): Promise<string> {
+    const response = await fetch(`${CUSTOM_NLP_API_URL}/translate/stream`, {
+        method: "POST",
+        body: JSON.stringify({
+            text: text,
+            model_id: modelId
+        }),
+        headers: { "Content-Type": "application/json" }
+    });
+
+    if (!response.ok || !response.body) {
+        try {
+            const errData = await response.json();
+            if (errData.detail) throw new Error(errData.detail);
+        } catch (e) {
+            // ignore
+        }
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    // Server-sent events: "data: {...}" lines separated by blank lines
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop() ?? "";
+        for (const event of events) {
+            if (!event.startsWith("data: ")) continue;
+            const data = JSON.parse(event.slice("data: ".length));
+            if (data.error) throw new Error(data.error);
+            if (data.done) return data.translated_text;
+            onChunk(data.text);
+        }
+    }
+    throw new Error("Translation stream ended early");
+}
+
 export async function translateBatchWithCustomModel(
     texts: string[],
-    modelId?: string
+    modelId?: string,
+    projectId?: string
 ): Promise<string[]> {
     try {
         const response = await fetch(`${CUSTOM_NLP_API_URL}/translate_batch`, {
             method: "POST",
             body: JSON.stringify({
                 texts: texts,
-                model_id: modelId
+                model_id: modelId,
+                // The service applies the project's glossary (names, recurring terms) if it has one
+                project_id: projectId
             }),
             headers: { "Content-Type": "application/json" }
         });
@@ -6,6 +6,11 @@ export interface TranslateResponse {
     error?: string;
 }
 
+export interface BatchTranslateResponse {
+    translatedText: string[];
+    error?: string;
+}
+
 export async function translateText(
     text: string,
     targetLang: string = 'vi',
@@ -35,3 +40,33 @@ export async function translateText(
         return `Error: ${error instanceof Error ? error.message : 'Unknown error'}`;
     }
 }
+
+// Translates a whole chunk in one request (q as an array). Throws on failure so
+// the caller can mark the chunk as failed.
+export async function translateTexts(
+    texts: string[],
+    targetLang: string = 'vi',
+    sourceLang: string = 'auto'
+): Promise<string[]> {
+    const response = await fetch(`${LIBRE_TRANSLATE_API_URL}/translate`, {
+        method: "POST",
+        body: JSON.stringify({
+            q: texts,
+            source: sourceLang,
+            target: targetLang,
+            format: "text",
+            api_key: ""
+        }),
+        headers: { "Content-Type": "application/json" }
+    });
+
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const data: BatchTranslateResponse = await response.json();
+    if (!Array.isArray(data.translatedText) || data.translatedText.length !== texts.length) {
+        throw new Error("Unexpected response shape");
+    }
+    return data.translatedText;
+}